@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Any, Dict
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.check_schedule import add_check_job, job_id_for_service  # noqa: E402
+from core.check_scheduler import CheckScheduler  # noqa: E402
+
+
+INTERVALS = ("10s", "30s", "1m", "5m")
+
+
+def _noop(service_id: str) -> None:
+    return None
+
+
+def _bench(make_scheduler: Any, n: int, run_s: float, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    sids = [f"svc-{i:06d}" for i in range(n)]
+    scheduler = make_scheduler()
+
+    t0 = time.perf_counter()
+    for sid in sids:
+        add_check_job(scheduler, _noop, sid, rng.choice(INTERVALS))
+    register_s = time.perf_counter() - t0
+
+    scheduler.start()
+    sample = rng.sample(sids, max(n // 10, 1))
+    t0 = time.perf_counter()
+    for sid in sample:
+        add_check_job(scheduler, _noop, sid, rng.choice(INTERVALS))
+    reschedule_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for sid in sample:
+        scheduler.pause_job(job_id_for_service(sid))
+    for sid in sample:
+        scheduler.resume_job(job_id_for_service(sid))
+    pause_resume_s = time.perf_counter() - t0
+
+    cpu0 = time.process_time()
+    time.sleep(run_s)
+    cpu_s = time.process_time() - cpu0
+    out: Dict[str, Any] = {
+        "services": n,
+        "register_us_per_job": round(register_s / n * 1e6, 1),
+        "reschedule_us_per_job": round(reschedule_s / len(sample) * 1e6, 1),
+        "pause_resume_us_per_job": round(pause_resume_s / len(sample) * 1e6, 1),
+        "cpu_pct_while_running": round(cpu_s / run_s * 100.0, 1),
+    }
+    stats = getattr(scheduler, "stats", None)
+    if callable(stats):
+        st = stats()
+        out.update(
+            {
+                "dispatched_per_s": round(st["dispatched"] / run_s, 1),
+                "cpu_us_per_dispatch": round(cpu_s / max(st["dispatched"], 1) * 1e6, 1),
+                "lag_ms_p50": st["lag_ms_p50"],
+                "lag_ms_p99": st["lag_ms_p99"],
+                "lag_ms_max": st["lag_ms_max"],
+                "skipped": st["skipped_running"] + st["misfired"],
+            }
+        )
+    scheduler.shutdown(wait=False)
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="检测调度器派发开销基准（空检测函数，只衡量调度本身）")
+    parser.add_argument("--services", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--seconds", type=float, default=20.0, help="每轮运行时长（至少覆盖一个 10s 周期）")
+    parser.add_argument("--apscheduler", action="store_true", help="同时测 APScheduler BackgroundScheduler 作对比")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    makers = [("CheckScheduler", CheckScheduler)]
+    if args.apscheduler:
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        makers.append(("APScheduler", BackgroundScheduler))
+    for name, maker in makers:
+        for n in args.services:
+            result = _bench(maker, n, args.seconds, args.seed)
+            print(name, " ".join(f"{k}={v}" for k, v in result.items()), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,12 +3,12 @@ from __future__ import annotations
 from pathlib import Path
 import shutil
 import sys
+import time
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-from apscheduler.schedulers.background import BackgroundScheduler
-
 from core.check_schedule import job_id_for_service, parse_check_schedule
+from core.check_scheduler import CheckScheduler
 from core.monitor_engine import MonitorEngine
 from core.user_store import verify_login
 from monitor.webapp import create_app
@@ -128,7 +128,7 @@ def _build_engine() -> MonitorEngine:
     return MonitorEngine([target, other])
 
 
-def _seed_scheduler(engine: MonitorEngine, scheduler: BackgroundScheduler) -> None:
+def _seed_scheduler(engine: MonitorEngine, scheduler: CheckScheduler) -> None:
     scheduler.start()
     for sid, svc in engine.services.items():
         if bool(getattr(svc, "config", {}).get("_disabled", False)):
@@ -148,6 +148,15 @@ def _seed_scheduler(engine: MonitorEngine, scheduler: BackgroundScheduler) -> No
         )
 
 
+def _wait_status(client, service_id: str, status: str, timeout_s: float = 5.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if _service_map(client)[service_id]["status"] == status:
+            return
+        time.sleep(0.1)
+    raise AssertionError(f"{service_id} status != {status}")
+
+
 def _login(client, username: str, password: str) -> None:
     resp = client.get("/login")
     assert resp.status_code == 200, resp.data
@@ -159,7 +168,7 @@ def main() -> int:
     backup_paths = STATE_FILES + ARTIFACT_FILES
     with BackupFiles(backup_paths):
         engine = _build_engine()
-        scheduler = BackgroundScheduler()
+        scheduler = CheckScheduler()
         app = create_app(engine, scheduler=scheduler)
         app.testing = True
         _seed_scheduler(engine, scheduler)
@@ -201,7 +210,7 @@ def main() -> int:
                 services = _service_map(admin)
                 assert services[TARGET_SERVICE_ID]["disabled"] is True
                 assert scheduler.get_job(job_id_for_service(TARGET_SERVICE_ID)) is None
-                blocked = admin.post(f"/api/control/{TARGET_SERVICE_ID}/check")
+                blocked = admin.post(f"/api/control/{TARGET_SERVICE_ID}/check?wait=30")
                 assert blocked.status_code == 400, blocked.data
                 assert blocked.get_json()["message"] == "Disabled"
 
@@ -211,18 +220,20 @@ def main() -> int:
                 assert services[TARGET_SERVICE_ID]["disabled"] is False
                 assert scheduler.get_job(job_id_for_service(TARGET_SERVICE_ID)) is not None
 
-                started = admin.post(f"/api/control/{TARGET_SERVICE_ID}/start")
+                started = admin.post(f"/api/control/{TARGET_SERVICE_ID}/start?wait=30")
                 payload = _json_ok(started)
                 assert payload["success"] is True
+                # 启动后的复检是延时任务（post_control_check_delay_s=0.5），等它跑完再手工检测
+                _wait_status(admin, TARGET_SERVICE_ID, "Running")
 
-                checked = admin.post(f"/api/control/{TARGET_SERVICE_ID}/check")
+                checked = admin.post(f"/api/control/{TARGET_SERVICE_ID}/check?wait=30")
                 payload = _json_ok(checked)
                 assert payload["success"] is True
 
                 services = _service_map(admin)
                 assert services[TARGET_SERVICE_ID]["status"] == "Running"
 
-                stopped = admin.post(f"/api/control/{TARGET_SERVICE_ID}/stop")
+                stopped = admin.post(f"/api/control/{TARGET_SERVICE_ID}/stop?wait=30")
                 payload = _json_ok(stopped)
                 assert payload["success"] is True
 
@@ -39,11 +39,17 @@ def main() -> int:
     r = engine.check_one(sid, allow_fix=True)
     print("check_one:", r.ok, r.message)
 
-    time.sleep(0.2)
-    items, _ = query_events(service_id=sid, limit=30, page=1, page_size=30, retention_days=1)
-    actions = [str(x.get("action") or "") for x in items]
-    print("actions_tail:", actions[:12])
+    # 自动重启在控制任务队列中执行，复检为延时任务（post_auto_restart_check_delay_s=1），轮询等它们执行完
     need = {"auto_restart", "restart_wait", "check_after_restart"}
+    deadline = time.time() + 15
+    actions = []
+    while time.time() < deadline:
+        items, _ = query_events(service_id=sid, limit=30, page=1, page_size=30, retention_days=1)
+        actions = [str(x.get("action") or "") for x in items]
+        if need.issubset(set(actions)):
+            break
+        time.sleep(0.5)
+    print("actions_tail:", actions[:12])
     if not need.issubset(set(actions)):
         raise RuntimeError(f"missing events: {need - set(actions)}")
     return 0
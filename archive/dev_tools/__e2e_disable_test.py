@@ -26,7 +26,7 @@ def main() -> int:
     m = {x["id"]: x for x in services}
     print("status_after_disable:", m[sid]["status"], "disabled=", m[sid].get("disabled"))
 
-    r = s.post(base + f"/api/control/{sid}/check", timeout=5)
+    r = s.post(base + f"/api/control/{sid}/check?wait=4", timeout=5)
     try:
         payload = r.json()
     except Exception:
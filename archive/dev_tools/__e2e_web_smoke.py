@@ -17,11 +17,11 @@ def main() -> int:
     services = s.get(base + "/api/services?page=1&page_size=20", timeout=3).json()["services"]
     print("services:", [x.get("id") for x in services])
 
-    r = s.post(base + "/api/control/local_restart_demo/start", timeout=10).json()
+    r = s.post(base + "/api/control/local_restart_demo/start?wait=8", timeout=10).json()
     print("start:", r)
 
     time.sleep(1)
-    r = s.post(base + "/api/control/local_restart_demo/check", timeout=10).json()
+    r = s.post(base + "/api/control/local_restart_demo/check?wait=8", timeout=10).json()
     print("check:", r)
 
     events = s.get(base + "/api/events?n=10&days=7", timeout=3).json()["events"]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from core.check_schedule import interval_seconds, parse_check_schedule
+
+
+STABLE_CHECKS_DEFAULT = 5
+BACKOFF_FACTOR_DEFAULT = 2.0
+FAST_INTERVAL_MIN_S = 5
+
+
+@dataclass(frozen=True)
+class AdaptivePolicy:
+    fast_s: int
+    max_s: int
+    stable_checks: int
+    backoff_factor: float
+
+
+def parse_adaptive_policy(value: Any, base_s: int) -> Optional[AdaptivePolicy]:
+    """
+    解析服务 YAML 中的 adaptive_schedule（未配置/false 返回 None，即不启用）。
+
+    - true：全部取默认值（快速间隔为基础间隔的 1/4，最长间隔为基础间隔的 4 倍）
+    - dict：fast_interval / max_interval（写法同 check_schedule 的间隔格式）、stable_checks、backoff_factor
+    """
+    if value is None or value is False:
+        return None
+    cfg: Dict[str, Any] = value if isinstance(value, dict) else {}
+    if not isinstance(value, dict) and value is not True:
+        return None
+    if cfg.get("enabled") is False:
+        return None
+    base_s = max(int(base_s), 1)
+    fast_s = _interval_s(cfg.get("fast_interval")) or max(base_s // 4, FAST_INTERVAL_MIN_S)
+    max_s = _interval_s(cfg.get("max_interval")) or base_s * 4
+    try:
+        stable_checks = max(int(cfg.get("stable_checks") or STABLE_CHECKS_DEFAULT), 1)
+    except Exception:
+        stable_checks = STABLE_CHECKS_DEFAULT
+    try:
+        factor = max(float(cfg.get("backoff_factor") or BACKOFF_FACTOR_DEFAULT), 1.0)
+    except Exception:
+        factor = BACKOFF_FACTOR_DEFAULT
+    return AdaptivePolicy(
+        fast_s=min(max(fast_s, 1), base_s),
+        max_s=max(max_s, base_s),
+        stable_checks=stable_checks,
+        backoff_factor=factor,
+    )
+
+
+def next_interval(policy: AdaptivePolicy, state: Dict[str, Any], base_s: int, ok: bool) -> int:
+    """
+    根据本次结果更新 state（原地修改）并返回下一次检测间隔（秒）。
+
+    - 失败（含慢响应）：立即切到 fast_s，直到恢复健康。
+    - 从失败恢复：回到基础间隔，连续健康计数从 0 重新开始。
+    - 连续 stable_checks 次健康：间隔乘以 backoff_factor，不超过 max_s。
+    """
+    base_s = max(int(base_s), 1)
+    if state.get("base_s") != base_s:
+        state.clear()
+        state.update({"base_s": base_s, "interval_s": base_s, "mode": "base", "healthy_streak": 0})
+    if not ok:
+        state["mode"] = "fast"
+        state["healthy_streak"] = 0
+        state["interval_s"] = policy.fast_s
+        return policy.fast_s
+    if state.get("mode") == "fast":
+        state["mode"] = "base"
+        state["healthy_streak"] = 0
+        state["interval_s"] = base_s
+        return base_s
+    streak = int(state.get("healthy_streak") or 0) + 1
+    interval = int(state.get("interval_s") or base_s)
+    if streak >= policy.stable_checks and interval < policy.max_s:
+        interval = min(int(round(interval * policy.backoff_factor)), policy.max_s)
+        streak = 0
+        state["mode"] = "backoff"
+    state["healthy_streak"] = streak
+    state["interval_s"] = interval
+    return interval
+
+
+def _interval_s(value: Any) -> Optional[int]:
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        return interval_seconds(parse_check_schedule(value, strict=True))
+    except ValueError:
+        return None
@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from datetime import datetime
 import threading
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
+from core.dependency import parse_dependencies
+from core.event_bus import get_event_bus
+from core.probe_timing import PhaseStats
 
 class BaseService(ABC):
     def __init__(self, service_id, name, description, config, config_path: Optional[str] = None):
@@ -19,13 +23,37 @@ class BaseService(ABC):
         self.failure_count = 0
         self.total_checks = 0
         self.lock = threading.Lock()
+        self._probe_local = threading.local()
+        self.probe_timings = PhaseStats()
+
+    def probe_timeout_s(self, default: float) -> float:
+        """本次探测的超时秒数：确认重试期间取 probe_timeout() 指定的值，否则取 YAML timeout_s。"""
+        override = getattr(self._probe_local, "timeout_s", None)
+        if override is not None:
+            return float(override)
+        return float(self.config.get("timeout_s") or default)
+
+    @contextmanager
+    def probe_timeout(self, timeout_s: Optional[float]) -> Iterator[None]:
+        """在当前线程内临时覆盖探测超时（None 表示不覆盖）。"""
+        prev = getattr(self._probe_local, "timeout_s", None)
+        self._probe_local.timeout_s = timeout_s
+        try:
+            yield
+        finally:
+            self._probe_local.timeout_s = prev
 
     def update_status(self, is_healthy: bool, error_msg: str = "", detail: Optional[Dict[str, Any]] = None):
         with self.lock:
+            prev_status = self.status
             self.total_checks += 1
             self.last_check = datetime.now()
             if detail is not None:
                 self.last_test_detail = detail
+                # HTTP 探测的分阶段耗时（detail.timings）计入滚动统计；分级探测的轻量探测与功能探测不可比，不计入
+                cheap_tier = (detail.get("probe_tier") or {}).get("tier") == "cheap"
+                if isinstance(detail.get("timings"), dict) and not cheap_tier:
+                    self.probe_timings.add(detail["timings"])
 
             if is_healthy:
                 self.status = "Running"
@@ -37,6 +65,41 @@ class BaseService(ABC):
                 self.last_error = error_msg
                 self.failure_count += 1
                 self.uptime_start = None
+            status = self.status
+            last_check = self.last_check.strftime("%Y-%m-%d %H:%M:%S")
+        if status != prev_status:
+            self._publish_status(status, prev_status, str(error_msg or "") if not is_healthy else "", last_check)
+
+    def mark_blocked(self, message: str, detail: Optional[Dict[str, Any]] = None) -> str:
+        """
+        上游依赖故障时标记为 Blocked：不计入检测次数与故障率，不写错误日志，不触发自动重启。返回之前的状态。
+        """
+        with self.lock:
+            prev_status = self.status
+            self.last_check = datetime.now()
+            if detail is not None:
+                self.last_test_detail = detail
+            self.status = "Blocked"
+            self.last_error = message
+            self.uptime_start = None
+            last_check = self.last_check.strftime("%Y-%m-%d %H:%M:%S")
+        if prev_status != "Blocked":
+            self._publish_status("Blocked", prev_status, message, last_check)
+        return prev_status
+
+    def _publish_status(self, status: str, prev_status: str, last_error: str, last_check: str) -> None:
+        # 状态变化推送给 /api/stream 的订阅者（页面据此即时刷新，不必等轮询）。
+        get_event_bus().publish(
+            "status",
+            {
+                "service_id": self.service_id,
+                "service_name": self.name,
+                "status": status,
+                "prev_status": prev_status,
+                "last_error": last_error,
+                "last_check": last_check,
+            },
+        )
 
     def get_info(self):
         uptime_str = "0s"
@@ -70,6 +133,10 @@ class BaseService(ABC):
         auto_restart = (on_failure == "restart") and bool(config.get("auto_fix", True))
         check_schedule = str(config.get("check_schedule") or "").strip()
         base_check_schedule = str(config.get("_base_check_schedule") or "").strip()
+        # 自适应检测频率：未启用为 None；启用后含当前间隔 interval_s、模式 mode（base/backoff/fast）与连续健康次数
+        adaptive_schedule = {"enabled": True, **dict(config.get("_adaptive_schedule") or {})} if config.get("adaptive_schedule") else None
+        # 分级探测：未启用为 None；启用后含上次功能探测时间与结果、轻量探测目标与耗时基线（cheap_ms）
+        probe_tiers = {"enabled": True, **dict(config.get("_probe_tiers") or {})} if config.get("probe_tiers") else None
         disabled = bool(config.get("_disabled", False))
         ops_enabled = bool(config.get("_ops_enabled", False))
         auto_restart_effective = auto_restart and has_restart and ops_enabled and (not disabled)
@@ -91,6 +158,9 @@ class BaseService(ABC):
             "auto_restart_effective": auto_restart_effective,
             "check_schedule": check_schedule,
             "base_check_schedule": base_check_schedule,
+            "adaptive_schedule": adaptive_schedule,
+            "probe_tiers": probe_tiers,
+            "depends_on": [d.label for d in parse_dependencies(config)],
             "disabled": disabled,
             "ops_enabled": ops_enabled,
             "ops_capable": ops_capable,
@@ -104,6 +174,7 @@ class BaseService(ABC):
             "test_api": config.get("test_api") or "",
             "config_path": self.config_path or "",
             "last_test_detail": self.last_test_detail,
+            "probe_timings": self.probe_timings.summary(),
             "ops_doc": ops_doc,
             "start_cmds": _collect_cmds("start_cmd", "start_cmds"),
             "stop_cmds": _collect_cmds("stop_cmd", "stop_cmds"),
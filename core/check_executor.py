@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.probe_pools import ProbePool
+
+
+CHECK_CONCURRENCY_DEFAULT = 8
+CHECK_PER_HOST_DEFAULT = 2
+CHECK_DEADLINE_GRACE_S = 10.0
+
+log = logging.getLogger("heartbeat_monitor.check_executor")
+
+
+@dataclass(frozen=True)
+class CheckTask:
+    key: str
+    host: str
+    deadline_s: float
+    func: Callable[[], Any]
+
+
+class CheckExecutor:
+    """
+    并行执行一批检测。
+
+    - 检测在固定大小（max_workers）的 check 线程池中执行；同一主机同时进行的检测不超过 per_host，避免一台机器同时挨 20 个探测。
+    - 每个检测有独立截止时间：超时后调用 on_deadline 记一次失败，但它占用的并发名额与主机名额要等线程真正结束才释放，
+      超时的检测再多也不会突破并发上限（线程无法强杀，会在请求自身超时后自然结束）。
+    - run() 阻塞到全部检测完成，或剩下的都已超时且没有待发任务，返回 {key: "done" | "error" | "deadline"}。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = CHECK_CONCURRENCY_DEFAULT,
+        per_host: int = CHECK_PER_HOST_DEFAULT,
+        pool: Optional[ProbePool] = None,
+    ):
+        self.max_workers = max(int(max_workers), 1)
+        self.per_host = max(int(per_host), 1)
+        self.pool = pool or ProbePool("check", self.max_workers)
+
+    def run(self, tasks: List[CheckTask], on_deadline: Optional[Callable[[CheckTask], None]] = None) -> Dict[str, str]:
+        pending: Deque[CheckTask] = deque(tasks)
+        running: Dict[str, Tuple[CheckTask, float]] = {}
+        host_busy: Dict[str, int] = {}
+        done_q: "queue.Queue[Tuple[str, bool]]" = queue.Queue()
+        results: Dict[str, str] = {}
+
+        def _waiting() -> List[float]:
+            return [deadline for task, deadline in running.values() if task.key not in results]
+
+        while pending or _waiting():
+            self._launch(pending, running, host_busy, done_q)
+            deadlines = _waiting()
+            timeout = min(deadlines) - time.monotonic() if deadlines else None
+            try:
+                key, ok = done_q.get(timeout=None if timeout is None else max(timeout, 0.0))
+            except queue.Empty:
+                key = None
+            if key is not None and key in running:
+                task = running.pop(key)[0]
+                host_busy[task.host] = host_busy.get(task.host, 1) - 1
+                results.setdefault(key, "done" if ok else "error")
+            now = time.monotonic()
+            for task, deadline in [v for v in running.values() if v[1] <= now and v[0].key not in results]:
+                results[task.key] = "deadline"
+                log.warning("check %s exceeded deadline %.1fs", task.key, task.deadline_s)
+                if on_deadline is not None:
+                    try:
+                        on_deadline(task)
+                    except Exception:
+                        log.exception("on_deadline failed for %s", task.key)
+        return results
+
+    def _launch(
+        self,
+        pending: Deque[CheckTask],
+        running: Dict[str, Tuple[CheckTask, float]],
+        host_busy: Dict[str, int],
+        done_q: "queue.Queue[Tuple[str, bool]]",
+    ) -> None:
+        # 按提交顺序挑选主机仍有空位的任务；主机已满的任务留在队列里，等该主机有检测结束再发。
+        skipped: List[CheckTask] = []
+        while pending and len(running) < self.max_workers:
+            task = pending.popleft()
+            if host_busy.get(task.host, 0) >= self.per_host:
+                skipped.append(task)
+                continue
+            host_busy[task.host] = host_busy.get(task.host, 0) + 1
+            running[task.key] = (task, time.monotonic() + max(float(task.deadline_s), 0.1))
+            self.pool.submit(_run_task, task, done_q)
+        pending.extendleft(reversed(skipped))
+
+
+def _run_task(task: CheckTask, done_q: "queue.Queue[Tuple[str, bool]]") -> None:
+    try:
+        task.func()
+        done_q.put((task.key, True))
+    except Exception:
+        log.exception("check %s failed", task.key)
+        done_q.put((task.key, False))
+
+
+def service_host(config: Dict[str, Any]) -> str:
+    """检测目标主机：优先 host/ip 配置，其次 test_api 的主机名。"""
+    host = str(config.get("host") or config.get("ip") or "").strip()
+    if host:
+        return host.lower()
+    try:
+        return (urlparse(str(config.get("test_api") or "")).hostname or "").lower()
+    except Exception:
+        return ""
+
+
+def check_deadline_s(config: Dict[str, Any], default_timeout_s: float = 30.0) -> float:
+    """单次检测截止时间：服务 timeout_s 加固定余量（覆盖连接、重启判断等额外耗时）。"""
+    try:
+        timeout_s = float(config.get("timeout_s") or default_timeout_s)
+    except Exception:
+        timeout_s = default_timeout_s
+    return max(timeout_s, 1.0) + CHECK_DEADLINE_GRACE_S
+
+
+_executor: Optional[CheckExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_check_executor() -> CheckExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = CheckExecutor(
+                max_workers=_env_int("HBM_CHECK_CONCURRENCY", CHECK_CONCURRENCY_DEFAULT),
+                per_host=_env_int("HBM_CHECK_PER_HOST", CHECK_PER_HOST_DEFAULT),
+            )
+        return _executor
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not str(raw).strip():
+        return int(default)
+    try:
+        return int(str(raw).strip())
+    except Exception:
+        return int(default)
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import os
+import time
+import zlib
 from dataclasses import dataclass
-from typing import Any, Dict, Tuple
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -10,6 +14,9 @@ class ScheduleSpec:
     kwargs: Dict[str, Any]
 
 
+_INTERVAL_UNITS = {"seconds": 1, "minutes": 60, "hours": 3600}
+
+
 def job_id_for_service(service_id: str) -> str:
     sid = str(service_id or "")
     safe = "".join((c if c.isalnum() or c in ("_", "-") else "_") for c in sid)
@@ -64,6 +71,83 @@ def parse_check_schedule(value: Any, default_minutes: int = 30, strict: bool = F
     return ScheduleSpec("interval", {"minutes": int(default_minutes)})
 
 
+def interval_seconds(spec: ScheduleSpec) -> Optional[int]:
+    """interval 触发器的间隔秒数；cron 触发器返回 None。"""
+    if spec.trigger != "interval":
+        return None
+    return sum(int(spec.kwargs.get(k) or 0) * unit for k, unit in _INTERVAL_UNITS.items()) or None
+
+
+def schedule_phase(service_id: str, period_s: int) -> int:
+    """按 service_id 的稳定哈希得到 [0, period_s) 内的相位，同一服务每次启动/重新登记都落在同一位置。"""
+    return zlib.crc32(str(service_id or "").encode("utf-8")) % max(int(period_s), 1)
+
+
+def placement_kwargs(service_id: str, spec: ScheduleSpec, jitter_s: Optional[float] = None, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    把服务的检测时刻错开，避免同频率服务同时触发。
+
+    - interval：首次触发时间取“绝对时间轴上 ≡ 相位 (mod 间隔)”的下一个时刻，相位由 service_id 哈希决定；
+      因此无论何时登记（启动、改频率、解除禁用），同一服务的触发时刻都一致。
+    - cron（daily@/weekly@）：在指定分钟内按哈希错开秒数。
+    - jitter_s（默认取环境变量 HBM_SCHEDULE_JITTER_S，0 表示不加）：每次触发再随机偏移，interval 时不超过间隔的一半。
+    """
+    if jitter_s is None:
+        jitter_s = _env_float("HBM_SCHEDULE_JITTER_S", 0.0)
+    out: Dict[str, Any] = {}
+    period = interval_seconds(spec)
+    if period:
+        now = time.time() if now is None else float(now)
+        phase = schedule_phase(service_id, period)
+        start = now - ((now - phase) % period) + period
+        out["start_date"] = datetime.fromtimestamp(start)
+        jitter_s = min(float(jitter_s), period / 2.0)
+    elif spec.trigger == "cron" and "second" not in spec.kwargs:
+        out["second"] = schedule_phase(service_id, 60)
+    if jitter_s and jitter_s >= 1:
+        out["jitter"] = int(jitter_s)
+    return out
+
+
+def add_check_job(
+    scheduler: Any,
+    func: Callable[..., Any],
+    service_id: str,
+    schedule_value: Any,
+    default_minutes: int = 30,
+    executor: str = "default",
+) -> ScheduleSpec:
+    """
+    登记（或替换）服务的定时检测任务；main.py 启动与管理接口重新登记都走这里，保证错峰位置一致。
+    executor 为探测类别（core/probe_pools.probe_class），决定检测在哪个线程池执行。
+    """
+    spec = parse_check_schedule(schedule_value, default_minutes=default_minutes)
+    scheduler.add_job(
+        func=func,
+        trigger=spec.trigger,
+        id=job_id_for_service(service_id),
+        args=[service_id],
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=60,
+        replace_existing=True,
+        executor=executor,
+        **spec.kwargs,
+        **placement_kwargs(service_id, spec),
+    )
+    return spec
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or not str(raw).strip():
+        return float(default)
+    try:
+        return max(float(str(raw).strip()), 0.0)
+    except Exception:
+        return float(default)
+
+
 def _parse_hhmm(hhmm: str) -> Tuple[int, int]:
     hhmm = str(hhmm or "").strip()
     parts = hhmm.split(":")
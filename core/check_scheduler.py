@@ -0,0 +1,453 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from datetime import time as dtime
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from core.check_schedule import ScheduleSpec, interval_seconds
+from core.probe_pools import POOL_FAST, ProbePools, get_probe_pools
+
+
+LAG_SAMPLES_MAX = 10000
+
+_WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+log = logging.getLogger("heartbeat_monitor.check_scheduler")
+
+
+@dataclass(frozen=True)
+class CheckTrigger:
+    """任务触发配置；interval 类带 interval（timedelta），与 APScheduler IntervalTrigger 的同名属性一致。"""
+
+    kind: str
+    kwargs: Dict[str, Any]
+    interval: Optional[timedelta] = None
+
+
+@dataclass(frozen=True)
+class CheckJob:
+    """get_job()/get_jobs() 返回的只读快照（暂停时 next_run_time 为 None）。"""
+
+    id: str
+    args: Tuple[Any, ...]
+    trigger: CheckTrigger
+    next_run_time: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class _Cron:
+    days: FrozenSet[int]
+    hour: int
+    minute: int
+    second: int
+
+
+class _Entry:
+    __slots__ = (
+        "id",
+        "func",
+        "args",
+        "trigger",
+        "period",
+        "cron",
+        "jitter",
+        "misfire_grace_time",
+        "max_instances",
+        "anchor",
+        "due",
+        "paused",
+        "gen",
+        "executor",
+    )
+
+    def __init__(self, job_id: str, func: Callable[..., Any], args: Tuple[Any, ...]):
+        self.id = job_id
+        self.func = func
+        self.args = args
+        self.trigger = CheckTrigger("interval", {})
+        self.period: Optional[float] = None
+        self.cron: Optional[_Cron] = None
+        self.jitter = 0.0
+        self.misfire_grace_time: Optional[float] = 60.0
+        self.max_instances = 1
+        self.anchor = 0.0
+        self.due = 0.0
+        self.paused = False
+        self.gen = 0
+        self.executor = POOL_FAST
+
+
+class CheckScheduler:
+    """
+    专用的服务检测调度器：最小堆保存各任务的下一次触发时间，单个调度线程把到期任务交给探测线程池。
+
+    - 接口与 main.py/管理接口用到的 APScheduler BackgroundScheduler 子集一致（add_job/remove_job/get_job/
+      reschedule_job/pause_job/resume_job/get_jobs/start/shutdown），可直接替换。
+    - 登记、改期、暂停、恢复均为 O(log n)：旧的堆条目不删除，按代号 gen 失效，到堆顶时丢弃；失效条目过多时整体重建。
+    - 触发语义与 parse_check_schedule 一致：interval（秒/分/时）与 cron（daily@/weekly@ 产生的 hour/minute/second/day_of_week）；
+      支持 start_date（interval 的相位）、jitter、max_instances（仍在执行时跳过本次）与 misfire_grace_time（过期太久跳过本次），
+      落后多个周期时只补跑一次（coalesce）。
+    - add_job(executor=...) 指定探测类别（fast/heavy，见 core/probe_pools.py），到期任务交给对应线程池，
+      慢探测占满 heavy 池时不影响 fast 池里的轻量检测；"default" 或未知类别归入 fast。
+    """
+
+    def __init__(self, pools: Optional[ProbePools] = None):
+        self.pools = pools or get_probe_pools()
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._entries: Dict[str, _Entry] = {}
+        # 按任务 id 记录执行中的实例数：replace_existing 替换或删除后重建的任务与仍在执行的旧实例共用计数
+        self._inflight: Dict[str, int] = {}
+        self._seq = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._closing = False
+        self._dispatched = 0
+        self._skipped_running = 0
+        self._misfired = 0
+        self._lag_samples: Deque[float] = deque(maxlen=LAG_SAMPLES_MAX)
+        self._lag_max = 0.0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name="check-scheduler", daemon=True)
+            self._thread.start()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """停止调度线程；探测线程池为进程共享，不在这里关闭（已派发的检测会执行完）。"""
+        with self._cond:
+            self._closing = True
+            self._running = False
+            self._cond.notify_all()
+        thread = self._thread
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def add_job(
+        self,
+        func: Callable[..., Any],
+        trigger: str = "interval",
+        id: Optional[str] = None,
+        args: Optional[Sequence[Any]] = None,
+        max_instances: int = 1,
+        coalesce: bool = True,
+        misfire_grace_time: Optional[float] = 60,
+        replace_existing: bool = False,
+        start_date: Optional[datetime] = None,
+        jitter: Optional[float] = None,
+        executor: str = "default",
+        **trigger_args: Any,
+    ) -> CheckJob:
+        job_id = str(id or f"job_{next(self._seq)}")
+        entry = _Entry(job_id, func, tuple(args or ()))
+        entry.executor = POOL_FAST if executor == "default" else str(executor)
+        entry.max_instances = max(int(max_instances), 1)
+        entry.misfire_grace_time = None if misfire_grace_time is None else float(misfire_grace_time)
+        _configure(entry, trigger, trigger_args, start_date, jitter, time.time())
+        with self._cond:
+            if job_id in self._entries and not replace_existing:
+                raise ValueError(f"job id already exists: {job_id!r}")
+            self._entries[job_id] = entry
+            self._push(entry)
+            return _snapshot(entry)
+
+    def remove_job(self, job_id: str) -> None:
+        with self._cond:
+            entry = self._entries.pop(str(job_id), None)
+            if entry is None:
+                raise KeyError(f"no such job: {job_id!r}")
+            entry.gen = 0
+            self._maybe_compact()
+
+    def get_job(self, job_id: str) -> Optional[CheckJob]:
+        with self._cond:
+            entry = self._entries.get(str(job_id))
+            return _snapshot(entry) if entry is not None else None
+
+    def get_jobs(self) -> List[CheckJob]:
+        with self._cond:
+            return [_snapshot(e) for e in self._entries.values()]
+
+    def reschedule_job(
+        self,
+        job_id: str,
+        trigger: str = "interval",
+        start_date: Optional[datetime] = None,
+        jitter: Optional[float] = None,
+        **trigger_args: Any,
+    ) -> CheckJob:
+        """更换触发配置（保留函数与参数），下一次触发按新配置重新计算。"""
+        with self._cond:
+            entry = self._entries.get(str(job_id))
+            if entry is None:
+                raise KeyError(f"no such job: {job_id!r}")
+            _configure(entry, trigger, trigger_args, start_date, jitter, time.time())
+            if not entry.paused:
+                self._push(entry)
+            return _snapshot(entry)
+
+    def pause_job(self, job_id: str) -> CheckJob:
+        with self._cond:
+            entry = self._entries.get(str(job_id))
+            if entry is None:
+                raise KeyError(f"no such job: {job_id!r}")
+            entry.paused = True
+            entry.gen = 0
+            self._maybe_compact()
+            return _snapshot(entry)
+
+    def resume_job(self, job_id: str) -> CheckJob:
+        """恢复暂停的任务；interval 类沿原相位取当前时刻之后的下一个触发点。"""
+        with self._cond:
+            entry = self._entries.get(str(job_id))
+            if entry is None:
+                raise KeyError(f"no such job: {job_id!r}")
+            if entry.paused:
+                entry.paused = False
+                _advance(entry, time.time())
+                self._push(entry)
+            return _snapshot(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """调度统计：任务数、堆大小、已派发/跳过次数与派发延迟（到期到交给线程池的时间差）。"""
+        with self._cond:
+            lags = sorted(self._lag_samples)
+            return {
+                "jobs": len(self._entries),
+                "heap": len(self._heap),
+                "dispatched": self._dispatched,
+                "skipped_running": self._skipped_running,
+                "misfired": self._misfired,
+                "lag_ms_p50": _pct_ms(lags, 0.50),
+                "lag_ms_p99": _pct_ms(lags, 0.99),
+                "lag_ms_max": round(self._lag_max * 1000.0, 3),
+            }
+
+    def _push(self, entry: _Entry) -> None:
+        # 代号全局递增：同一 id 被删除后重新登记，旧堆条目也不会被误认为有效
+        entry.gen = next(self._seq)
+        heapq.heappush(self._heap, (entry.due, next(self._seq), entry.id, entry.gen))
+        if self._heap[0][2] == entry.id:
+            self._cond.notify_all()
+
+    def _maybe_compact(self) -> None:
+        if len(self._heap) <= 2 * len(self._entries) + 64:
+            return
+        self._heap = [
+            (e.due, next(self._seq), e.id, e.gen) for e in self._entries.values() if not e.paused
+        ]
+        heapq.heapify(self._heap)
+
+    def _is_live(self, item: Tuple[float, int, str, int]) -> bool:
+        entry = self._entries.get(item[2])
+        return entry is not None and entry.gen == item[3] and not entry.paused
+
+    def _run(self) -> None:
+        while True:
+            batch: List[_Entry] = []
+            with self._cond:
+                while not self._closing:
+                    while self._heap and not self._is_live(self._heap[0]):
+                        heapq.heappop(self._heap)
+                    if self._heap and self._heap[0][0] <= time.time():
+                        break
+                    self._cond.wait(None if not self._heap else max(self._heap[0][0] - time.time(), 0.0))
+                if self._closing:
+                    return
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    item = heapq.heappop(self._heap)
+                    if not self._is_live(item):
+                        continue
+                    entry = self._entries[item[2]]
+                    lag = now - entry.due
+                    if entry.misfire_grace_time is not None and lag > entry.misfire_grace_time:
+                        self._misfired += 1
+                        log.warning("check job %s missed by %.1fs, skipped", entry.id, lag)
+                    elif self._inflight.get(entry.id, 0) >= entry.max_instances:
+                        self._skipped_running += 1
+                        log.warning("check job %s still running, skipped", entry.id)
+                    else:
+                        self._inflight[entry.id] = self._inflight.get(entry.id, 0) + 1
+                        self._dispatched += 1
+                        self._lag_samples.append(lag)
+                        self._lag_max = max(self._lag_max, lag)
+                        batch.append(entry)
+                    _advance(entry, now)
+                    self._push(entry)
+            for i, entry in enumerate(batch):
+                try:
+                    self.pools.submit(entry.executor, self._call, entry)
+                except RuntimeError:
+                    # 线程池已关闭：进程退出时属正常，其余情况记错误；未派发的任务归还执行计数
+                    with self._cond:
+                        closing = self._closing
+                        self._running = False
+                        for rest in batch[i:]:
+                            self._release(rest.id)
+                    if closing:
+                        log.info("probe pool closed during shutdown, %d check job(s) not dispatched", len(batch) - i)
+                    else:
+                        log.error("probe pool %s rejected check job %s, scheduler stopped", entry.executor, entry.id)
+                    return
+
+    def _call(self, entry: _Entry) -> None:
+        try:
+            entry.func(*entry.args)
+        except Exception:
+            log.exception("check job %s failed", entry.id)
+        finally:
+            with self._cond:
+                self._release(entry.id)
+
+    def _release(self, job_id: str) -> None:
+        left = self._inflight.get(job_id, 0) - 1
+        if left > 0:
+            self._inflight[job_id] = left
+        else:
+            self._inflight.pop(job_id, None)
+
+
+def _configure(
+    entry: _Entry,
+    trigger: str,
+    trigger_args: Dict[str, Any],
+    start_date: Optional[datetime],
+    jitter: Optional[float],
+    now: float,
+) -> None:
+    kind = str(trigger or "").lower()
+    entry.jitter = max(float(jitter or 0), 0.0)
+    if kind == "interval":
+        period = interval_seconds(ScheduleSpec("interval", trigger_args))
+        if not period:
+            raise ValueError(f"invalid interval trigger: {trigger_args!r}")
+        entry.trigger = CheckTrigger("interval", dict(trigger_args), timedelta(seconds=period))
+        entry.period = float(period)
+        entry.cron = None
+        first = start_date.timestamp() if start_date is not None else now + period
+        if first <= now:
+            first += math.ceil((now - first) / period) * period
+            if first <= now:
+                first += period
+        entry.anchor = first
+    elif kind == "cron":
+        entry.trigger = CheckTrigger("cron", dict(trigger_args))
+        entry.period = None
+        entry.cron = _parse_cron(trigger_args)
+        entry.anchor = _next_cron(entry.cron, now)
+    else:
+        raise ValueError(f"unsupported trigger: {trigger!r}")
+    entry.due = _jittered(entry)
+
+
+def _advance(entry: _Entry, now: float) -> None:
+    """计算当前时刻之后的下一次触发；落后多个周期时直接跳到 now 之后（只补跑一次）。"""
+    if entry.period:
+        anchor = entry.anchor + entry.period
+        if anchor <= now:
+            anchor += math.ceil((now - anchor) / entry.period) * entry.period
+            if anchor <= now:
+                anchor += entry.period
+        entry.anchor = anchor
+    elif entry.cron is not None:
+        entry.anchor = _next_cron(entry.cron, max(now, entry.anchor))
+    entry.due = _jittered(entry)
+
+
+def _jittered(entry: _Entry) -> float:
+    if entry.jitter <= 0:
+        return entry.anchor
+    return entry.anchor + random.uniform(0.0, entry.jitter)
+
+
+def _parse_cron(kwargs: Dict[str, Any]) -> _Cron:
+    unknown = set(kwargs) - {"hour", "minute", "second", "day_of_week"}
+    if unknown:
+        raise ValueError(f"unsupported cron fields: {sorted(unknown)}")
+    return _Cron(
+        days=_parse_days(kwargs.get("day_of_week")),
+        hour=_cron_int(kwargs.get("hour", 0), 23),
+        minute=_cron_int(kwargs.get("minute", 0), 59),
+        second=_cron_int(kwargs.get("second", 0), 59),
+    )
+
+
+def _cron_int(value: Any, upper: int) -> int:
+    try:
+        n = int(str(value).strip())
+    except Exception:
+        raise ValueError(f"invalid cron value: {value!r}") from None
+    if not 0 <= n <= upper:
+        raise ValueError(f"cron value out of range: {value!r}")
+    return n
+
+
+def _parse_days(value: Any) -> FrozenSet[int]:
+    """day_of_week：星期名（mon..sun）或数字（0=周一），支持逗号列表与 a-b 区间，* 或缺省表示每天。"""
+    if value is None or str(value).strip() in ("", "*"):
+        return frozenset(range(7))
+    days = set()
+    for part in str(value).lower().split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = (_weekday(x) for x in part.split("-", 1))
+            days.update(range(lo, hi + 1) if lo <= hi else [*range(lo, 7), *range(0, hi + 1)])
+        else:
+            days.add(_weekday(part))
+    return frozenset(days)
+
+
+def _weekday(token: str) -> int:
+    token = token.strip()
+    if token[:3] in _WEEKDAYS:
+        return _WEEKDAYS.index(token[:3])
+    if token.isdigit() and 0 <= int(token) <= 6:
+        return int(token)
+    raise ValueError(f"invalid day_of_week: {token!r}")
+
+
+def _next_cron(cron: _Cron, after: float) -> float:
+    start = datetime.fromtimestamp(after).date()
+    for d in range(8):
+        day = start + timedelta(days=d)
+        if day.weekday() not in cron.days:
+            continue
+        ts = _at(day, cron)
+        if ts > after:
+            return ts
+    raise ValueError("cron trigger never fires")
+
+
+def _at(day: date, cron: _Cron) -> float:
+    return datetime.combine(day, dtime(cron.hour, cron.minute, cron.second)).timestamp()
+
+
+def _snapshot(entry: _Entry) -> CheckJob:
+    return CheckJob(
+        id=entry.id,
+        args=entry.args,
+        trigger=entry.trigger,
+        next_run_time=None if entry.paused else datetime.fromtimestamp(entry.due),
+    )
+
+
+def _pct_ms(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(int(len(sorted_values) * q), len(sorted_values) - 1)
+    return round(sorted_values[idx] * 1000.0, 3)
+
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.event_bus import get_event_bus
+from core.probe_pools import POOL_OPS, ProbePool, get_probe_pools
+
+
+JOB_HISTORY_MAX = 500
+JOB_OUTPUT_MAX_CHARS = 2000
+
+log = logging.getLogger("heartbeat_monitor.control_jobs")
+
+
+@dataclass
+class ControlJob:
+    id: str
+    service_id: str
+    action: str
+    submitted_by: str = ""
+    options: Dict[str, Any] = field(default_factory=dict)
+    state: str = "queued"
+    ok: Optional[bool] = None
+    message: str = ""
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    steps: List[Dict[str, Any]] = field(default_factory=list)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def coalesce_key(self) -> Tuple[str, str, Tuple[Tuple[str, str], ...]]:
+        return _coalesce_key(self.service_id, self.action, self.options)
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "service_id": self.service_id,
+            "action": self.action,
+            "submitted_by": self.submitted_by,
+            "options": dict(self.options),
+            "state": self.state,
+            "ok": self.ok,
+            "message": self.message,
+            "created_at": _fmt_ts(self.created_at),
+            "started_at": _fmt_ts(self.started_at),
+            "finished_at": _fmt_ts(self.finished_at),
+            "queue_ms": _elapsed_ms(self.created_at, self.started_at),
+            "elapsed_ms": _elapsed_ms(self.started_at, self.finished_at),
+            "steps": [{k: v for k, v in s.items() if k != "_t"} for s in self.steps],
+        }
+
+
+class ControlJobQueue:
+    """
+    服务启停/重启/检测的异步任务队列。
+
+    - submit() 立即返回任务；任务在 ops 线程池（core/probe_pools.py）中执行，不占用 Web 请求线程与检测线程。
+    - 同一服务的任务串行执行（按提交顺序）；同一服务同一动作、选项（如 allow_fix）也相同的任务已在排队或执行时
+      直接返回那个任务（合并重复提交），选项不同则另建任务排在后面，不会沿用先提交者的选项。
+    - 执行过程中记录步骤耗时（由 run 回调通过 step() 上报），结束后保留最近 JOB_HISTORY_MAX 个任务供查询。
+    """
+
+    def __init__(self, pool: Optional[ProbePool] = None):
+        self._lock = threading.Lock()
+        self._pool = pool or get_probe_pools().get(POOL_OPS)
+        self._jobs: "OrderedDict[str, ControlJob]" = OrderedDict()
+        self._active: Dict[Tuple[str, str, Tuple[Tuple[str, str], ...]], ControlJob] = {}
+        self._running: Dict[str, ControlJob] = {}
+        self._waiting: Dict[str, Deque[Tuple[ControlJob, Callable[..., Tuple[bool, str]]]]] = {}
+        self._seq = itertools.count(1)
+
+    def submit(
+        self,
+        service_id: str,
+        action: str,
+        run: Callable[[Callable[[str], None]], Tuple[bool, str]],
+        submitted_by: str = "",
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[ControlJob, bool]:
+        """
+        提交任务，返回 (任务, 是否新建)。run(step) 执行实际动作，step(name) 标记新步骤开始；
+        options 为影响执行结果的参数（记入任务信息），只有选项相同的提交才会合并。
+        """
+        options = dict(options or {})
+        key = _coalesce_key(service_id, action, options)
+        with self._lock:
+            existing = self._active.get(key)
+            if existing is not None:
+                return existing, False
+            job = ControlJob(
+                id=f"{int(time.time())}-{next(self._seq)}",
+                service_id=key[0],
+                action=key[1],
+                submitted_by=str(submitted_by or ""),
+                options=options,
+            )
+            self._jobs[job.id] = job
+            self._active[key] = job
+            while len(self._jobs) > JOB_HISTORY_MAX:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if not oldest.finished:
+                    break
+                del self._jobs[oldest_id]
+            if key[0] in self._running:
+                self._waiting.setdefault(key[0], deque()).append((job, run))
+            elif not self._dispatch(job, run):
+                # 线程池已关闭：撤销登记，避免后续提交合并到或排在一个永远不会执行的任务后面
+                del self._jobs[job.id]
+        _publish(job)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[ControlJob]:
+        with self._lock:
+            return self._jobs.get(str(job_id))
+
+    def wait(self, job: ControlJob, timeout: Optional[float]) -> bool:
+        return job.done.wait(timeout)
+
+    def _execute(self, job: ControlJob, run: Callable[[Callable[[str], None]], Tuple[bool, str]]) -> None:
+        job.started_at = time.time()
+        job.state = "running"
+        _publish(job)
+
+        def step(name: str) -> None:
+            now = time.time()
+            if job.steps and job.steps[-1].get("elapsed_ms") is None:
+                job.steps[-1]["elapsed_ms"] = _elapsed_ms(job.steps[-1]["_t"], now)
+            job.steps.append({"name": str(name), "started_at": _fmt_ts(now), "elapsed_ms": None, "_t": now})
+
+        try:
+            ok, msg = run(step)
+        except Exception as e:
+            log.exception("control job %s failed", job.id)
+            ok, msg = False, f"control_exception: {type(e).__name__}: {e}"
+        now = time.time()
+        if job.steps and job.steps[-1].get("elapsed_ms") is None:
+            job.steps[-1]["elapsed_ms"] = _elapsed_ms(job.steps[-1]["_t"], now)
+        for s in job.steps:
+            s.pop("_t", None)
+        job.ok = bool(ok)
+        job.message = str(msg or "")[:JOB_OUTPUT_MAX_CHARS]
+        job.finished_at = now
+        job.state = "succeeded" if ok else "failed"
+        with self._lock:
+            if self._active.get(job.coalesce_key) is job:
+                del self._active[job.coalesce_key]
+            self._running.pop(job.service_id, None)
+            rejected: List[ControlJob] = []
+            waiting = self._waiting.get(job.service_id)
+            while waiting:
+                nxt, nxt_run = waiting.popleft()
+                if self._dispatch(nxt, nxt_run):
+                    break
+                rejected.append(nxt)
+            if waiting is not None and not waiting:
+                del self._waiting[job.service_id]
+        job.done.set()
+        _publish(job)
+        for nxt in rejected:
+            _publish(nxt)
+
+    def _dispatch(self, job: ControlJob, run: Callable[[Callable[[str], None]], Tuple[bool, str]]) -> bool:
+        """（持锁调用）把任务交给线程池；线程池拒绝时撤销执行登记并把任务标记为失败，返回 False。"""
+        self._running[job.service_id] = job
+        try:
+            self._pool.submit(self._execute, job, run)
+            return True
+        except RuntimeError as e:
+            log.error("control job %s not started: %s", job.id, e)
+            self._running.pop(job.service_id, None)
+            if self._active.get(job.coalesce_key) is job:
+                del self._active[job.coalesce_key]
+            job.ok = False
+            job.message = f"control_not_started: {e}"
+            job.finished_at = time.time()
+            job.state = "failed"
+            job.done.set()
+            return False
+
+
+def _coalesce_key(service_id: str, action: str, options: Dict[str, Any]) -> Tuple[str, str, Tuple[Tuple[str, str], ...]]:
+    return str(service_id), str(action), tuple(sorted((str(k), repr(v)) for k, v in options.items()))
+
+
+def _publish(job: ControlJob) -> None:
+    get_event_bus().publish("job", job.to_dict())
+
+
+def _fmt_ts(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _elapsed_ms(start: Optional[float], end: Optional[float]) -> Optional[int]:
+    if start is None or end is None:
+        return None
+    return int((end - start) * 1000)
+
+
+_queue: Optional[ControlJobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_control_jobs() -> ControlJobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = ControlJobQueue()
+        return _queue
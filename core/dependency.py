@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+TCP_TIMEOUT_DEFAULT_S = 3.0
+TCP_CACHE_TTL_S = 10.0
+BLOCKED_PROBE_EVERY_DEFAULT = 5
+
+
+@dataclass(frozen=True)
+class Dependency:
+    """服务的上游依赖：kind=service 时 target 为服务 id；kind=tcp 时为 host，port 为端口。"""
+
+    kind: str
+    target: str
+    port: int = 0
+    timeout_s: float = TCP_TIMEOUT_DEFAULT_S
+
+    @property
+    def label(self) -> str:
+        return self.target if self.kind == "service" else f"tcp://{self.target}:{self.port}"
+
+
+def parse_dependencies(config: Dict[str, Any]) -> List[Dependency]:
+    """
+    解析 depends_on（字符串、字典或二者组成的列表）：
+    - "other_service_id" / {service: "other_service_id"}：依赖另一个服务的当前状态
+    - {tcp: "host:port"} 或 {host: "...", port: 22}：依赖主机端口可连通（如 SSH），可加 timeout_s
+    无法识别的条目忽略。
+    """
+    raw = config.get("depends_on")
+    if raw is None or raw == "":
+        return []
+    items = raw if isinstance(raw, list) else [raw]
+    out: List[Dependency] = []
+    for item in items:
+        if isinstance(item, str) and item.strip():
+            out.append(Dependency("service", item.strip()))
+            continue
+        if not isinstance(item, dict):
+            continue
+        if str(item.get("service") or "").strip():
+            out.append(Dependency("service", str(item["service"]).strip()))
+            continue
+        host, port = _tcp_target(item)
+        if not host or not port:
+            continue
+        try:
+            timeout_s = min(max(float(item.get("timeout_s") or TCP_TIMEOUT_DEFAULT_S), 0.1), 30.0)
+        except Exception:
+            timeout_s = TCP_TIMEOUT_DEFAULT_S
+        out.append(Dependency("tcp", host, port, timeout_s))
+    return out
+
+
+def dependency_cycles(graph: Dict[str, Iterable[str]]) -> Set[str]:
+    """返回处于循环依赖中的服务 id（沿 service 依赖能回到自身）；graph 为 服务 id -> 上游服务 id 列表。"""
+    out: Set[str] = set()
+    for start in graph:
+        seen: Set[str] = set()
+        frontier = list(graph.get(start) or [])
+        while frontier:
+            sid = frontier.pop()
+            if sid == start:
+                out.add(start)
+                break
+            if sid in seen or sid not in graph:
+                continue
+            seen.add(sid)
+            frontier.extend(graph.get(sid) or [])
+    return out
+
+
+def blocked_probe_every(config: Dict[str, Any]) -> int:
+    """blocked_probe_every：处于 Blocked 时每 N 次检测仍做一次真实探测（默认 5，0 表示不做）。"""
+    try:
+        return max(int(config.get("blocked_probe_every", BLOCKED_PROBE_EVERY_DEFAULT)), 0)
+    except Exception:
+        return BLOCKED_PROBE_EVERY_DEFAULT
+
+
+def _tcp_target(item: Dict[str, Any]) -> Tuple[str, int]:
+    raw = str(item.get("tcp") or "").strip()
+    if raw:
+        host, _, port = raw.rpartition(":")
+        host = host.strip("[]")
+    else:
+        host, port = str(item.get("host") or "").strip(), str(item.get("port") or "")
+    try:
+        return host, int(port)
+    except Exception:
+        return host, 0
+
+
+class TcpReachability:
+    """
+    主机端口连通性检测，结果按 (host, port) 缓存 ttl_s 秒。
+
+    同一主机上的多个服务共用一次检测；检测进行中的其他调用等待同一结果，而不是各自再连一次。
+    """
+
+    def __init__(self, ttl_s: float = TCP_CACHE_TTL_S):
+        self.ttl_s = float(ttl_s)
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, int], Tuple[float, bool, str]] = {}
+        self._inflight: Dict[Tuple[str, int], threading.Event] = {}
+
+    def check(self, host: str, port: int, timeout_s: float = TCP_TIMEOUT_DEFAULT_S) -> Tuple[bool, str]:
+        key = (str(host), int(port))
+        while True:
+            with self._lock:
+                hit = self._cache.get(key)
+                if hit is not None and time.monotonic() - hit[0] < self.ttl_s:
+                    return hit[1], hit[2]
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._inflight[key] = threading.Event()
+                    break
+            waiter.wait(timeout_s + 1.0)
+        ok, msg = _tcp_connect(key[0], key[1], timeout_s)
+        with self._lock:
+            self._cache[key] = (time.monotonic(), ok, msg)
+            self._inflight.pop(key).set()
+        return ok, msg
+
+
+def _tcp_connect(host: str, port: int, timeout_s: float) -> Tuple[bool, str]:
+    try:
+        with socket.create_connection((host, port), timeout=timeout_s):
+            return True, ""
+    except socket.timeout:
+        return False, "timeout"
+    except OSError as e:
+        return False, str(e) or type(e).__name__
+
+
+_reachability: Optional[TcpReachability] = None
+_reachability_lock = threading.Lock()
+
+
+def get_tcp_reachability() -> TcpReachability:
+    global _reachability
+    with _reachability_lock:
+        if _reachability is None:
+            _reachability = TcpReachability()
+        return _reachability
@@ -1,22 +1,27 @@
 from __future__ import annotations
 
-import json
 import os
 import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.log_writer import LOG_MAINTENANCE_INTERVAL_S, get_log_writer
+from core.log_store import create_log_store, scope_service_ids
 
 
 LOG_DIR = os.path.join("data", "logs")
 ERROR_LOG_PATH = os.path.join(LOG_DIR, "errors.jsonl")
+ERROR_SEGMENT_DIR = os.path.join(LOG_DIR, "errors")
 RETENTION_DAYS_DEFAULT = 7
 
-_last_prune_day: Optional[str] = None
+# 错误日志与事件日志一样按小时分段（data/logs/errors/），旧版 errors.jsonl 只读参与查询，过期后整体删除。
+# 设置 HBM_LOG_BACKEND=sqlite 时改存 data/logs/logs.db 的 errors 表。
+_STORE = create_log_store("errors", ERROR_SEGMENT_DIR, legacy_path=ERROR_LOG_PATH)
+_WRITER = get_log_writer()
+_WRITER.register("errors", _STORE)
 
 
 def append_error(service_id: str, service_name: str, reason: str) -> None:
-    os.makedirs(LOG_DIR, exist_ok=True)
-    _prune_if_needed(RETENTION_DAYS_DEFAULT)
     now = datetime.now()
     record = {
         "ts": now.strftime("%Y-%m-%d %H:%M:%S"),
@@ -25,13 +30,18 @@ def append_error(service_id: str, service_name: str, reason: str) -> None:
         "service_name": service_name,
         "reason": reason,
     }
-    with open(ERROR_LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    _WRITER.submit("errors", record)
 
 
-def tail_errors(limit: int = 10, retention_days: int = RETENTION_DAYS_DEFAULT) -> List[Dict[str, Any]]:
-    items, _ = query_errors(limit=limit, page=1, page_size=limit, retention_days=retention_days)
-    return items
+def tail_errors(
+    limit: int = 10,
+    retention_days: int = RETENTION_DAYS_DEFAULT,
+    service_ids: Optional[Iterable[str]] = None,
+) -> List[Dict[str, Any]]:
+    # 从最新分段末尾倒读，凑够 limit 条即停，不再解析/排序整个保留期。
+    _WRITER.flush()
+    cutoff = int(time.time()) - int(retention_days) * 86400
+    return _STORE.tail(int(limit), cutoff=cutoff, service_ids=scope_service_ids(None, service_ids))
 
 
 def query_errors(
@@ -40,90 +50,52 @@ def query_errors(
     page: int = 1,
     page_size: int = 20,
     limit: Optional[int] = None,
+    service_ids: Optional[Iterable[str]] = None,
 ) -> Tuple[List[Dict[str, Any]], int]:
-    if not os.path.exists(ERROR_LOG_PATH):
-        return [], 0
-
+    """
+    页码分页查询（新→旧）。service_ids 为允许的服务集合（普通用户的可见范围），在存储层按索引过滤，total 为过滤后的准确条数。
+    """
+    _WRITER.flush()
     cutoff = int(time.time()) - int(retention_days) * 86400
-    records: List[Dict[str, Any]] = []
-    with open(ERROR_LOG_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rec = json.loads(line)
-            except Exception:
-                continue
-            ts_epoch = _record_ts_epoch(rec)
-            if ts_epoch < cutoff:
-                continue
-            if service_id and str(rec.get("service_id") or "") != service_id:
-                continue
-            rec["ts_epoch"] = ts_epoch
-            if not rec.get("ts"):
-                rec["ts"] = datetime.fromtimestamp(ts_epoch).strftime("%Y-%m-%d %H:%M:%S")
-            records.append(rec)
-
-    records.sort(key=lambda r: int(r.get("ts_epoch") or 0), reverse=True)
-    total = len(records)
+    service_ids = scope_service_ids(service_id, service_ids)
     if limit is not None:
-        records = records[: int(limit)]
+        records, total = _STORE.query(service_ids=service_ids, cutoff=cutoff, offset=0, limit=int(limit))
         return records, min(total, int(limit))
 
     page = max(int(page), 1)
     page_size = max(int(page_size), 1)
     start = (page - 1) * page_size
-    end = start + page_size
-    return records[start:end], total
+    return _STORE.query(service_ids=service_ids, cutoff=cutoff, offset=start, limit=page_size)
+
+
+def page_errors(
+    service_ids: Optional[Iterable[str]] = None,
+    retention_days: int = RETENTION_DAYS_DEFAULT,
+    limit: int = 10,
+    before: Optional[Tuple[int, int]] = None,
+    after: Optional[Tuple[int, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    游标分页（新→旧）：before 取游标之后更旧的一页，after 取更新的一页；都不传即第一页。
+
+    每条记录带 seq 字段，与 ts_epoch 组成下一页的游标；开销只与返回条数有关，不随翻页深度增长。
+    """
+    _WRITER.flush()
+    cutoff = int(time.time()) - int(retention_days) * 86400
+    return _STORE.page(service_ids=service_ids, cutoff=cutoff, limit=int(limit), before=before, after=after)
+
+
+def count_errors(service_ids: Optional[Iterable[str]] = None, retention_days: int = RETENTION_DAYS_DEFAULT) -> int:
+    """近似总数：JSONL 后端按分段摘要统计（保留期边界所在分段整段计入），SQLite 后端为精确值。"""
+    _WRITER.flush()
+    cutoff = int(time.time()) - int(retention_days) * 86400
+    return _STORE.approx_count(service_ids=service_ids, cutoff=cutoff)
 
 
-def prune_errors(retention_days: int = RETENTION_DAYS_DEFAULT) -> None:
-    if not os.path.exists(ERROR_LOG_PATH):
-        return
+def prune_errors(retention_days: int = RETENTION_DAYS_DEFAULT) -> int:
+    """整段删除过期分段，保留期内的记录不会被重写。返回删除的分段数。"""
     cutoff = int(time.time()) - int(retention_days) * 86400
-    kept: List[str] = []
-    with open(ERROR_LOG_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            raw = line.strip()
-            if not raw:
-                continue
-            try:
-                rec = json.loads(raw)
-            except Exception:
-                continue
-            if _record_ts_epoch(rec) >= cutoff:
-                kept.append(json.dumps(rec, ensure_ascii=False))
-
-    tmp = ERROR_LOG_PATH + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        for line in kept:
-            f.write(line + "\n")
-    os.replace(tmp, ERROR_LOG_PATH)
-
-
-def _prune_if_needed(retention_days: int) -> None:
-    global _last_prune_day
-    today = datetime.now().strftime("%Y-%m-%d")
-    if _last_prune_day == today:
-        return
-    prune_errors(retention_days)
-    _last_prune_day = today
-
-
-def _record_ts_epoch(rec: Dict[str, Any]) -> int:
-    v = rec.get("ts_epoch")
-    if isinstance(v, int):
-        return v
-    if isinstance(v, float):
-        return int(v)
-    if isinstance(v, str) and v.strip().isdigit():
-        return int(v.strip())
-    ts = rec.get("ts")
-    if isinstance(ts, str) and ts.strip():
-        try:
-            return int(datetime.strptime(ts.strip(), "%Y-%m-%d %H:%M:%S").timestamp())
-        except Exception:
-            return 0
-    return 0
+    return _STORE.prune(cutoff)
+
 
+_WRITER.add_maintenance("prune_errors", lambda: prune_errors(RETENTION_DAYS_DEFAULT), LOG_MAINTENANCE_INTERVAL_S)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class Subscription:
+    """
+    单个订阅者的消息队列。
+
+    队列满时丢弃新消息并置 overflowed，消费方据此通知前端整体重新拉取一次，而不是阻塞发布方。
+    """
+
+    def __init__(self, maxsize: int):
+        self._queue: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue(maxsize=max(int(maxsize), 1))
+        self.overflowed = False
+
+    def put(self, topic: str, payload: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait((topic, payload))
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """
+    进程内发布/订阅：事件日志与服务状态变化在这里发布，/api/stream 为每个连接订阅一份。
+
+    publish() 只做非阻塞入队，检测线程不会因为慢连接被拖住。
+    """
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = int(queue_size)
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Subscription] = {}
+
+    def subscribe(self) -> Subscription:
+        sub = Subscription(self.queue_size)
+        with self._lock:
+            self._subscribers[id(sub)] = sub
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.pop(id(sub), None)
+
+    def publish(self, topic: str, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            subs = list(self._subscribers.values())
+        for sub in subs:
+            sub.put(str(topic), payload)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    return _bus
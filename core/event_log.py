@@ -1,17 +1,173 @@
 from __future__ import annotations
 
-import json
+import heapq
+import itertools
 import os
+import threading
 import time
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.event_bus import get_event_bus
+from core.log_writer import LOG_MAINTENANCE_INTERVAL_S, get_log_writer
+from core.log_store import create_log_store, scope_service_ids
 
 
 LOG_DIR = os.path.join("data", "logs")
 EVENT_LOG_PATH = os.path.join(LOG_DIR, "events.jsonl")
+EVENT_SEGMENT_DIR = os.path.join(LOG_DIR, "events")
 RETENTION_DAYS_DEFAULT = 7
+COMPACTION_WINDOW_S_DEFAULT = 300
+RING_SIZE_DEFAULT = 2000
+RING_PER_SERVICE_DEFAULT = 200
+
+# 事件日志按小时分段落盘（data/logs/events/），旧版 events.jsonl 只读参与查询，过期后整体删除。
+# 设置 HBM_LOG_BACKEND=sqlite 时改存 data/logs/logs.db 的 events 表。
+_STORE = create_log_store("events", EVENT_SEGMENT_DIR, legacy_path=EVENT_LOG_PATH)
+_WRITER = get_log_writer()
+_WRITER.register("events", _STORE)
+
+
+class _RecentEvents:
+    """
+    最近事件的内存环形缓冲：一个全局 deque + 每服务一个 deque，元素为 (序号, 记录)，记录对象在两者间共享。
+
+    只收录已提交给写入器的记录（与磁盘内容一致）。能凑够条数（或已覆盖到保留期边界）时直接从内存返回，
+    否则返回 None，由调用方回落到磁盘查询。
+    """
+
+    def __init__(self, size: int, per_service: int):
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self._all: deque = deque(maxlen=max(int(size), 1))
+        self._per_service: Dict[str, deque] = {}
+        self._per_service_size = max(int(per_service), 1)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        sid = str(record.get("service_id") or "")
+        with self._lock:
+            item = (next(self._seq), record)
+            self._all.append(item)
+            dq = self._per_service.get(sid)
+            if dq is None:
+                dq = self._per_service[sid] = deque(maxlen=self._per_service_size)
+            dq.append(item)
+
+    def latest(self, limit: int, cutoff: int, service_ids: Optional[Iterable[str]] = None) -> Optional[List[Dict[str, Any]]]:
+        limit = int(limit)
+        with self._lock:
+            floor = 0
+            if service_ids is None:
+                candidates: Iterable[Tuple[int, Dict[str, Any]]] = reversed(self._all)
+            else:
+                dqs = [self._per_service[sid] for sid in {str(x) for x in service_ids} if sid in self._per_service]
+                candidates = heapq.merge(*[reversed(dq) for dq in dqs], key=lambda x: x[0], reverse=True)
+                # 已满的服务队列可能丢过更早的记录：序号低于它最旧一条的记录之间可能缺它的事件，到此只能回落磁盘
+                floor = max((dq[0][0] for dq in dqs if len(dq) >= self._per_service_size), default=0)
+            out: List[Dict[str, Any]] = []
+            for seq, rec in candidates:
+                if seq < floor:
+                    return None
+                if int(rec.get("ts_epoch") or 0) < cutoff:
+                    return out
+                out.append(dict(rec))
+                if len(out) >= limit:
+                    return out
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._all.clear()
+            self._per_service.clear()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name) or default)
+    except Exception:
+        return int(default)
+
+
+_RECENT = _RecentEvents(_env_int("HBM_EVENT_RING_SIZE", RING_SIZE_DEFAULT), _env_int("HBM_EVENT_RING_PER_SERVICE", RING_PER_SERVICE_DEFAULT))
+
+
+def _submit(record: Dict[str, Any]) -> None:
+    _WRITER.submit("events", record)
+    _RECENT.add(record)
+    get_event_bus().publish("event", _expand([dict(record)])[0])
+
+
+def compaction_enabled() -> bool:
+    """HBM_EVENT_COMPACTION=1 时开启“连续健康检测合并”。"""
+    return str(os.getenv("HBM_EVENT_COMPACTION") or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _compaction_window_s() -> float:
+    try:
+        return max(float(os.getenv("HBM_EVENT_COMPACTION_WINDOW_S") or COMPACTION_WINDOW_S_DEFAULT), 1.0)
+    except Exception:
+        return float(COMPACTION_WINDOW_S_DEFAULT)
+
+
+@dataclass
+class _HealthyRun:
+    """某服务当前的“连续相同健康检测”段：首条已完整写入，其后的检测只在这里累计。"""
+
+    key: Tuple[str, Any]
+    service_name: str
+    count: int = 0
+    first_ts: int = 0
+    last_ts: int = 0
+    last_ts_text: str = ""
+    elapsed: List[int] = field(default_factory=list)
+    detail: Dict[str, Any] = field(default_factory=dict)
+
+    def add(self, ts_epoch: int, ts_text: str, detail: Dict[str, Any]) -> None:
+        if self.count == 0:
+            self.first_ts = ts_epoch
+            self.elapsed = []
+        self.count += 1
+        self.last_ts = ts_epoch
+        self.last_ts_text = ts_text
+        self.detail = {k: v for k, v in detail.items() if k != "response_excerpt"}
+        try:
+            self.elapsed.append(int(detail["elapsed_ms"]))
+        except Exception:
+            pass
+
+    def take(self, service_id: str) -> Optional[Dict[str, Any]]:
+        if self.count <= 0:
+            return None
+        run: Dict[str, Any] = {"first_ts": self.first_ts, "last_ts": self.last_ts, "count": self.count}
+        if self.elapsed:
+            run["elapsed_ms"] = {
+                "min": min(self.elapsed),
+                "avg": int(round(sum(self.elapsed) / len(self.elapsed))),
+                "max": max(self.elapsed),
+            }
+        record: Dict[str, Any] = {
+            "ts": self.last_ts_text,
+            "ts_epoch": self.last_ts,
+            "service_id": service_id,
+            "service_name": self.service_name,
+            "level": "info",
+            "action": "check",
+            "message": self.key[0],
+            "run": run,
+            "detail": self.detail,
+        }
+        self.count = 0
+        self.elapsed = []
+        return record
 
-_last_prune_day: Optional[str] = None
+
+# 合并模式下：状态变化（以及每段连续健康的第一条）完整记录，之后相同的健康检测合并为一条 run 记录，
+# 在状态变化、超过合并窗口或进程退出时写出。
+_COMPACTION = compaction_enabled()
+_RUNS: Dict[str, _HealthyRun] = {}
+_RUNS_LOCK = threading.Lock()
 
 
 def append_event(
@@ -22,8 +178,6 @@ def append_event(
     message: str,
     detail: Optional[Dict[str, Any]] = None,
 ) -> None:
-    os.makedirs(LOG_DIR, exist_ok=True)
-    _prune_if_needed(RETENTION_DAYS_DEFAULT)
     now = datetime.now()
     record: Dict[str, Any] = {
         "ts": now.strftime("%Y-%m-%d %H:%M:%S"),
@@ -36,13 +190,74 @@ def append_event(
     }
     if detail is not None:
         record["detail"] = detail
-    with open(EVENT_LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    if not _COMPACTION:
+        _submit(record)
+        return
+    sid = str(service_id or "")
+    with _RUNS_LOCK:
+        run = _RUNS.get(sid)
+        if record["level"] == "info" and record["action"] == "check":
+            key = (record["message"], (detail or {}).get("status_code"))
+            if run is not None and run.key == key:
+                if run.count and record["ts_epoch"] - run.first_ts >= _compaction_window_s():
+                    _submit_run(sid, run)
+                run.add(record["ts_epoch"], record["ts"], detail or {})
+                return
+            if run is not None:
+                _submit_run(sid, run)
+            _RUNS[sid] = _HealthyRun(key=key, service_name=str(service_name or ""))
+        elif run is not None:
+            _submit_run(sid, run)
+            del _RUNS[sid]
+        _submit(record)
+
+
+def _submit_run(service_id: str, run: _HealthyRun) -> None:
+    record = run.take(service_id)
+    if record is not None:
+        _submit(record)
 
 
-def tail_events(limit: int = 30, retention_days: int = RETENTION_DAYS_DEFAULT) -> List[Dict[str, Any]]:
-    items, _ = query_events(limit=limit, page=1, page_size=limit, retention_days=retention_days)
-    return items
+def flush_event_runs(max_age_s: Optional[float] = None) -> int:
+    """写出合并中的健康检测段；max_age_s 不为空时只写出累计时间超过该秒数的段。返回写出的条数。"""
+    now = int(time.time())
+    n = 0
+    with _RUNS_LOCK:
+        for sid, run in _RUNS.items():
+            if run.count and (max_age_s is None or now - run.first_ts >= max_age_s):
+                _submit_run(sid, run)
+                n += 1
+    return n
+
+
+def _expand(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # 合并记录在读取时展开为可读文本：“Healthy ×N”，并给出首次检测时间。
+    for rec in records:
+        run = rec.get("run")
+        if not isinstance(run, dict):
+            continue
+        count = int(run.get("count") or 0)
+        rec["message"] = f"{rec.get('message') or 'Healthy'} ×{count}"
+        try:
+            rec["ts_first"] = datetime.fromtimestamp(int(run.get("first_ts") or 0)).strftime("%Y-%m-%d %H:%M:%S")
+        except Exception:
+            pass
+    return records
+
+
+def tail_events(
+    limit: int = 30,
+    retention_days: int = RETENTION_DAYS_DEFAULT,
+    service_ids: Optional[Iterable[str]] = None,
+) -> List[Dict[str, Any]]:
+    """最新 limit 条事件：内存环形缓冲能覆盖时直接返回，否则从磁盘倒读。"""
+    cutoff = int(time.time()) - int(retention_days) * 86400
+    scope = scope_service_ids(None, service_ids)
+    recent = _RECENT.latest(int(limit), cutoff, scope)
+    if recent is not None:
+        return _expand(recent)
+    _WRITER.flush()
+    return _expand(_STORE.tail(int(limit), cutoff=cutoff, service_ids=scope))
 
 
 def query_events(
@@ -51,90 +266,56 @@ def query_events(
     page: int = 1,
     page_size: int = 50,
     limit: Optional[int] = None,
+    service_ids: Optional[Iterable[str]] = None,
 ) -> Tuple[List[Dict[str, Any]], int]:
-    if not os.path.exists(EVENT_LOG_PATH):
-        return [], 0
-
+    """
+    页码分页查询（新→旧）。service_ids 为允许的服务集合（普通用户的可见范围），在存储层按索引过滤，total 为过滤后的准确条数。
+    """
+    _WRITER.flush()
     cutoff = int(time.time()) - int(retention_days) * 86400
-    records: List[Dict[str, Any]] = []
-    with open(EVENT_LOG_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                rec = json.loads(line)
-            except Exception:
-                continue
-            ts_epoch = _record_ts_epoch(rec)
-            if ts_epoch < cutoff:
-                continue
-            if service_id and str(rec.get("service_id") or "") != service_id:
-                continue
-            rec["ts_epoch"] = ts_epoch
-            if not rec.get("ts"):
-                rec["ts"] = datetime.fromtimestamp(ts_epoch).strftime("%Y-%m-%d %H:%M:%S")
-            records.append(rec)
-
-    records.sort(key=lambda r: int(r.get("ts_epoch") or 0), reverse=True)
-    total = len(records)
+    service_ids = scope_service_ids(service_id, service_ids)
     if limit is not None:
-        records = records[: int(limit)]
-        return records, min(total, int(limit))
+        records, total = _STORE.query(service_ids=service_ids, cutoff=cutoff, offset=0, limit=int(limit))
+        return _expand(records), min(total, int(limit))
 
     page = max(int(page), 1)
     page_size = max(int(page_size), 1)
     start = (page - 1) * page_size
-    end = start + page_size
-    return records[start:end], total
+    records, total = _STORE.query(service_ids=service_ids, cutoff=cutoff, offset=start, limit=page_size)
+    return _expand(records), total
 
 
-def prune_events(retention_days: int = RETENTION_DAYS_DEFAULT) -> None:
-    if not os.path.exists(EVENT_LOG_PATH):
-        return
+def page_events(
+    service_ids: Optional[Iterable[str]] = None,
+    retention_days: int = RETENTION_DAYS_DEFAULT,
+    limit: int = 30,
+    before: Optional[Tuple[int, int]] = None,
+    after: Optional[Tuple[int, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    游标分页（新→旧）：before 取游标之后更旧的一页，after 取更新的一页；都不传即第一页。
+
+    每条记录带 seq 字段，与 ts_epoch 组成下一页的游标；开销只与返回条数有关，不随翻页深度增长。
+    """
+    _WRITER.flush()
     cutoff = int(time.time()) - int(retention_days) * 86400
-    kept: List[str] = []
-    with open(EVENT_LOG_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            raw = line.strip()
-            if not raw:
-                continue
-            try:
-                rec = json.loads(raw)
-            except Exception:
-                continue
-            if _record_ts_epoch(rec) >= cutoff:
-                kept.append(json.dumps(rec, ensure_ascii=False))
-
-    tmp = EVENT_LOG_PATH + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        for line in kept:
-            f.write(line + "\n")
-    os.replace(tmp, EVENT_LOG_PATH)
-
-
-def _prune_if_needed(retention_days: int) -> None:
-    global _last_prune_day
-    today = datetime.now().strftime("%Y-%m-%d")
-    if _last_prune_day == today:
-        return
-    prune_events(retention_days)
-    _last_prune_day = today
-
-
-def _record_ts_epoch(rec: Dict[str, Any]) -> int:
-    v = rec.get("ts_epoch")
-    if isinstance(v, int):
-        return v
-    if isinstance(v, float):
-        return int(v)
-    if isinstance(v, str) and v.strip().isdigit():
-        return int(v.strip())
-    ts = rec.get("ts")
-    if isinstance(ts, str) and ts.strip():
-        try:
-            return int(datetime.strptime(ts.strip(), "%Y-%m-%d %H:%M:%S").timestamp())
-        except Exception:
-            return 0
-    return 0
+    return _expand(_STORE.page(service_ids=service_ids, cutoff=cutoff, limit=int(limit), before=before, after=after))
+
+
+def count_events(service_ids: Optional[Iterable[str]] = None, retention_days: int = RETENTION_DAYS_DEFAULT) -> int:
+    """近似总数：JSONL 后端按分段摘要统计（保留期边界所在分段整段计入），SQLite 后端为精确值。"""
+    _WRITER.flush()
+    cutoff = int(time.time()) - int(retention_days) * 86400
+    return _STORE.approx_count(service_ids=service_ids, cutoff=cutoff)
+
+
+def prune_events(retention_days: int = RETENTION_DAYS_DEFAULT) -> int:
+    """整段删除过期分段，保留期内的记录不会被重写。返回删除的分段数。"""
+    cutoff = int(time.time()) - int(retention_days) * 86400
+    return _STORE.prune(cutoff)
+
 
+_WRITER.add_maintenance("prune_events", lambda: prune_events(RETENTION_DAYS_DEFAULT), LOG_MAINTENANCE_INTERVAL_S)
+if _COMPACTION:
+    _WRITER.add_maintenance("flush_event_runs", lambda: flush_event_runs(_compaction_window_s()), min(_compaction_window_s(), 60.0))
+    _WRITER.add_close_hook("flush_event_runs", flush_event_runs)
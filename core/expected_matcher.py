@@ -1,12 +1,197 @@
 from __future__ import annotations
 
+import codecs
+import json
 import re
-from typing import Any, Dict, List, Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import requests
+from requests.compat import chardet
 
+from core.probe_timing import PhaseTimer
 
-def match_expected(response: requests.Response, expected: Any) -> Tuple[bool, str]:
+
+MAX_BODY_BYTES_DEFAULT = 1024 * 1024
+EXCERPT_CHARS = 800
+CHUNK_BYTES = 16 * 1024
+DETECT_BYTES = 64 * 1024
+
+
+def max_body_bytes(config: Dict[str, Any]) -> int:
+    """服务配置 max_body_bytes（探测时最多读取的响应体字节数），缺省 1 MiB，非法值回退缺省。"""
+    try:
+        value = int(config.get("max_body_bytes") or MAX_BODY_BYTES_DEFAULT)
+    except Exception:
+        return MAX_BODY_BYTES_DEFAULT
+    return value if value > 0 else MAX_BODY_BYTES_DEFAULT
+
+
+class BodyTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Response body too large (> {max_bytes} bytes)")
+
+
+class ResponseBody:
+    """
+    按需流式读取的响应体（配合 stream=True 的请求使用）。
+
+    - 匹配器只读到能下结论为止：子串找到即停，正则匹配且不会随后续内容改变即停，状态码即可判定时不读正文。
+    - 最多读取 max_bytes 字节；在上限内无法判定时 too_large 置位，由调用方报告 body_too_large。
+    - 响应未声明编码时（与 requests 的 apparent_encoding 相同）按正文前 DETECT_BYTES 字节检测编码，检测前暂不解码。
+    - timeout_s 限制读取正文的总耗时（在分块之间检查），超时抛 requests.exceptions.ReadTimeout。
+    - 作为上下文管理器使用，退出时关闭响应；未读完的连接不会回到连接池。
+      退出时把读取正文的耗时记为 probe_request 计时的 transfer 阶段，读取出错时计时挂到异常上。
+    """
+
+    def __init__(self, response: requests.Response, max_bytes: int = MAX_BODY_BYTES_DEFAULT, timeout_s: Optional[float] = None):
+        self.response = response
+        self.status_code = response.status_code
+        self.max_bytes = max(int(max_bytes), 1)
+        self.too_large = False
+        self._deadline = (time.monotonic() + float(timeout_s)) if timeout_s else None
+        self._raw = bytearray()
+        self._text = ""
+        self._decoder = self._new_decoder(response.encoding) if response.encoding else None
+        self._chunks = None
+        self._eof = False
+        self._created = time.perf_counter()
+
+    def __enter__(self) -> "ResponseBody":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.response.close()
+        timer = getattr(self.response, "probe_timings", None)
+        if isinstance(timer, PhaseTimer):
+            timer.add("transfer", time.perf_counter() - self._created)
+            timer.finish()
+            if exc is not None and getattr(exc, "probe_timings", None) is None:
+                exc.probe_timings = timer
+
+    @property
+    def bytes_read(self) -> int:
+        return len(self._raw)
+
+    @property
+    def complete(self) -> bool:
+        return self._eof
+
+    def find(self, needle: str) -> Optional[bool]:
+        """增量查找子串：True 找到，False 读完未找到，None 达到上限仍未找到。"""
+        start = 0
+        while True:
+            if self._text.find(needle, start) != -1:
+                return True
+            start = max(len(self._text) - len(needle) + 1, 0)
+            if not self._read_chunk():
+                # 读完时才开始解码（或解码器吐出尾部）的文本还要再查一次
+                if self._text.find(needle, start) != -1:
+                    return True
+                return self._undecided()
+
+    def search(self, pattern: "re.Pattern[str]") -> Optional[bool]:
+        """
+        增量正则匹配。表达式不含前瞻/后顾与 $、\\b、\\B、\\Z 时，已读部分中的匹配在完整正文中仍然成立：
+        已读文本每增长一倍重新匹配一次（总扫描量与正文长度成正比），匹配到即返回；
+        否则结果可能取决于后续内容，读完或到上限后再匹配一次。
+        """
+        early = _prefix_stable(pattern)
+        scanned = -1
+        while True:
+            done = self._eof or len(self._raw) >= self.max_bytes
+            if done or (early and len(self._text) >= scanned * 2):
+                scanned = len(self._text)
+                if pattern.search(self._text) is not None:
+                    return True
+                if done:
+                    return self._undecided()
+            self._read_chunk()
+
+    def text(self) -> Optional[str]:
+        """读完整个响应体并返回文本；超过上限返回 None。"""
+        while self._read_chunk():
+            pass
+        return self._text if self._eof else self._mark_too_large()
+
+    def json(self) -> Any:
+        """解析 JSON（只在上限内）；超过上限抛 BodyTooLarge，非 JSON 抛 ValueError。"""
+        length = self.response.headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            self._mark_too_large()
+            raise BodyTooLarge(self.max_bytes)
+        if self.text() is None:
+            raise BodyTooLarge(self.max_bytes)
+        if self.response.encoding:
+            return json.loads(self._text)
+        return json.loads(bytes(self._raw))
+
+    def excerpt(self, chars: int = EXCERPT_CHARS) -> str:
+        """前 chars 个字符；已读不足时再补读少量内容，读取出错时返回已有部分。"""
+        try:
+            while len(self._text) < chars and len(self._raw) < chars * 4 and self._read_chunk():
+                pass
+        except Exception:
+            pass
+        if self._decoder is None:
+            self._start_decoding()
+        return self._text[:chars]
+
+    def _read_chunk(self) -> bool:
+        if self._eof or len(self._raw) >= self.max_bytes:
+            return False
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise requests.exceptions.ReadTimeout("Response body read timed out")
+        if self._chunks is None:
+            self._chunks = self.response.iter_content(chunk_size=CHUNK_BYTES)
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            if self._decoder is None:
+                self._start_decoding()
+            self._text += self._decoder.decode(b"", final=True)
+            return False
+        room = self.max_bytes - len(self._raw)
+        if len(chunk) > room:
+            chunk = chunk[:room]
+        self._raw += chunk
+        if self._decoder is not None:
+            self._text += self._decoder.decode(chunk)
+        elif len(self._raw) >= min(DETECT_BYTES, self.max_bytes):
+            self._start_decoding()
+        return True
+
+    def _start_decoding(self) -> None:
+        """按已读字节检测编码（检测不出时用 utf-8），再把已读部分解码进文本。"""
+        encoding = None
+        try:
+            encoding = chardet.detect(bytes(self._raw))["encoding"] if self._raw else None
+        except Exception:
+            pass
+        self._decoder = self._new_decoder(encoding)
+        self._text = self._decoder.decode(bytes(self._raw))
+
+    @staticmethod
+    def _new_decoder(encoding: Optional[str]) -> "codecs.IncrementalDecoder":
+        return codecs.getincrementaldecoder(_codec(encoding))(errors="replace")
+
+    def _undecided(self) -> Optional[bool]:
+        if self._eof:
+            return False
+        return self._mark_too_large()
+
+    def _mark_too_large(self) -> Optional[bool]:
+        self.too_large = True
+        return None
+
+
+def match_expected(response: Union[requests.Response, ResponseBody], expected: Any) -> Tuple[bool, str]:
+    """
+    按 expected_response 判定响应。response 可为普通 Response 或 ResponseBody；
+    传入 ResponseBody 时按需流式读取正文，上限内无法判定返回 Response body too large。
+    """
+    if not isinstance(response, ResponseBody):
+        response = ResponseBody(response)
     if response.status_code >= 500:
         return False, f"HTTP {response.status_code}"
     if expected is None:
@@ -20,8 +205,11 @@ def match_expected(response: requests.Response, expected: Any) -> Tuple[bool, st
             last_reason = reason
         return False, last_reason or "No expected matched"
     if isinstance(expected, str):
-        if expected in (response.text or ""):
+        found = response.find(expected)
+        if found:
             return True, ""
+        if found is None:
+            return False, _too_large_reason(response)
         return False, f"Expected substring not found: {expected}"
     if isinstance(expected, dict):
         expected_type = str(expected.get("__type") or "").strip().lower()
@@ -31,25 +219,33 @@ def match_expected(response: requests.Response, expected: Any) -> Tuple[bool, st
     return True, ""
 
 
-def _match_text(response: requests.Response, expected: Dict[str, Any]) -> Tuple[bool, str]:
-    text = response.text or ""
+def _match_text(response: ResponseBody, expected: Dict[str, Any]) -> Tuple[bool, str]:
     contains = expected.get("__contains")
     if isinstance(contains, str) and contains:
-        if contains not in text:
+        found = response.find(contains)
+        if found is None:
+            return False, _too_large_reason(response)
+        if not found:
             return False, f"Expected substring not found: {contains}"
     regex = expected.get("__regex")
     if isinstance(regex, str) and regex:
         try:
-            if re.search(regex, text) is None:
-                return False, f"Expected regex not matched: {regex}"
+            pattern = re.compile(regex)
         except Exception as e:
             return False, f"Bad regex: {e}"
+        found = response.search(pattern)
+        if found is None:
+            return False, _too_large_reason(response)
+        if not found:
+            return False, f"Expected regex not matched: {regex}"
     return (200 <= response.status_code < 300), f"HTTP {response.status_code}"
 
 
-def _match_json(response: requests.Response, expected: Dict[str, Any]) -> Tuple[bool, str]:
+def _match_json(response: ResponseBody, expected: Dict[str, Any]) -> Tuple[bool, str]:
     try:
         body = response.json()
+    except BodyTooLarge as e:
+        return False, str(e)
     except Exception:
         return False, "Response is not JSON"
     if "__rules" in expected:
@@ -59,7 +255,7 @@ def _match_json(response: requests.Response, expected: Dict[str, Any]) -> Tuple[
         for i, rule in enumerate(rules):
             if not isinstance(rule, dict):
                 return False, f"Rule {i+1} is not an object"
-            ok, reason = _eval_rule(body, rule, response_text=(response.text or ""))
+            ok, reason = _eval_rule(body, rule, response_text=(response.text() or ""))
             if not ok:
                 return False, reason
         return True, ""
@@ -71,6 +267,25 @@ def _match_json(response: requests.Response, expected: Dict[str, Any]) -> Tuple[
     return True, ""
 
 
+def _too_large_reason(response: ResponseBody) -> str:
+    return str(BodyTooLarge(response.max_bytes))
+
+
+_CONTEXT_TOKENS = ("(?=", "(?!", "(?<=", "(?<!", "$", "\\b", "\\B", "\\Z")
+
+
+def _prefix_stable(pattern: "re.Pattern[str]") -> bool:
+    """表达式是否只看匹配到的文本本身（无前瞻/后顾与依赖后续字符的锚点）；按源码保守判断，[$] 之类也视为不稳定。"""
+    return not any(token in pattern.pattern for token in _CONTEXT_TOKENS)
+
+
+def _codec(encoding: Optional[str]) -> str:
+    try:
+        return codecs.lookup(encoding or "utf-8").name
+    except Exception:
+        return "utf-8"
+
+
 def _eval_rule(body: Any, rule: Dict[str, Any], response_text: str) -> Tuple[bool, str]:
     path = str(rule.get("path") or "").strip()
     op = str(rule.get("op") or "==").strip().lower()
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import os
+import socket
+import sys
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import connection as _u3_connection
+from urllib3 import connectionpool as _u3_pool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family, create_connection
+
+try:
+    from urllib3.exceptions import NameResolutionError
+
+    TIMED_CONNECTIONS = True
+except ImportError:
+    # urllib3 1.x 没有 NameResolutionError：仍走共享连接池，但不挂计时连接，探测不带分阶段耗时
+    TIMED_CONNECTIONS = False
+
+from core.probe_timing import PhaseTimer, bind_timer, current_timer
+
+
+HTTP_POOL_SIZE_DEFAULT = 4
+HTTP_IDLE_S_DEFAULT = 60.0
+EVICT_INTERVAL_S = 30.0
+
+
+class ProbeHttpClient:
+    """
+    探测用的共享 HTTP 客户端：按 scheme://host:port 各建一个 requests.Session（长连接复用）。
+
+    - 每个主机一个连接池，大小 pool_size；超过 idle_s 未使用的会话在后续请求时顺带关闭，不额外起线程。
+    - 会话不保存 Cookie，探测之间互不影响，行为与每次调用 requests.get/post 一致，只是复用 TCP/TLS 连接。
+    - keepalive=False 时不经过连接池，每次新建连接（用于必须观察冷连接的探测）。
+    - 连接经 _TimedHTTPAdapter 建立：由 probe_request 发起的请求记录 DNS/建连/TLS/发送/等待首字节各阶段耗时
+      （需要 urllib3 2.x；1.x 下用普通 HTTPAdapter，只有总耗时与响应体读取耗时）。
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE_DEFAULT, idle_s: float = HTTP_IDLE_S_DEFAULT):
+        self.pool_size = max(int(pool_size), 1)
+        self.idle_s = max(float(idle_s), 1.0)
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Tuple[requests.Session, float]] = {}
+        self._last_evict = time.monotonic()
+
+    def request(self, method: str, url: str, keepalive: bool = True, **kwargs: Any) -> requests.Response:
+        if not keepalive:
+            with self._new_session() as session:
+                return session.request(method, url, **kwargs)
+        try:
+            return self._session(url).request(method, url, **kwargs)
+        finally:
+            self._touch(url)
+
+    def get(self, url: str, keepalive: bool = True, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, keepalive=keepalive, **kwargs)
+
+    def post(self, url: str, keepalive: bool = True, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, keepalive=keepalive, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "pool_size": self.pool_size,
+                "idle_s": self.idle_s,
+                "hosts": {key: round(now - used, 1) for key, (_, used) in self._sessions.items()},
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            sessions = [s for s, _ in self._sessions.values()]
+            self._sessions.clear()
+        for s in sessions:
+            s.close()
+
+    def _session(self, url: str) -> requests.Session:
+        key = _origin(url)
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            if now - self._last_evict >= EVICT_INTERVAL_S:
+                self._last_evict = now
+                for k, (s, used) in list(self._sessions.items()):
+                    if now - used > self.idle_s:
+                        expired.append(s)
+                        del self._sessions[k]
+            entry = self._sessions.get(key)
+            session = entry[0] if entry is not None else self._new_session()
+            self._sessions[key] = (session, now)
+        for s in expired:
+            s.close()
+        return session
+
+    def _touch(self, url: str) -> None:
+        # 请求结束时再记一次使用时间，避免长耗时请求进行中被当作空闲会话关闭
+        key = _origin(url)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None:
+                self._sessions[key] = (entry[0], time.monotonic())
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter_cls = _TimedHTTPAdapter if TIMED_CONNECTIONS else HTTPAdapter
+        adapter = adapter_cls(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+class _TimedConnectionMixin:
+    """
+    在 urllib3 连接上记录分阶段耗时（只在当前线程有 PhaseTimer 时记录，否则行为与原连接一致）。
+
+    DNS 与 TCP 建连分开计时：先自行解析，再按解析出的地址依次建连（保留多地址回退），错误类型与信息同 urllib3。
+    """
+
+    def _new_conn(self) -> socket.socket:
+        timer = current_timer()
+        if timer is None:
+            return super()._new_conn()
+        timer.connections += 1
+        t0 = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        finally:
+            timer.add("dns", time.perf_counter() - t0)
+        t1 = time.perf_counter()
+        addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        try:
+            for i, addr in enumerate(addrs):
+                last = i == len(addrs) - 1
+                try:
+                    sock = create_connection(
+                        (addr, self.port), self.timeout, source_address=self.source_address, socket_options=self.socket_options
+                    )
+                except socket.timeout as e:
+                    if last:
+                        raise ConnectTimeoutError(self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})") from e
+                except OSError as e:
+                    if last:
+                        raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+                else:
+                    sys.audit("http.client.connect", self, self.host, self.port)
+                    return sock
+            raise NewConnectionError(self, "Failed to establish a new connection: no address resolved")
+        finally:
+            timer.add("connect", time.perf_counter() - t1)
+
+    def request(self, *args: Any, **kwargs: Any) -> None:
+        timer = current_timer()
+        if timer is None:
+            return super().request(*args, **kwargs)
+        t0 = time.perf_counter()
+        connect0 = timer.connect_ms()
+        super().request(*args, **kwargs)
+        # HTTP 连接在发送时才建立，扣除期间的建连耗时
+        timer.add("send", time.perf_counter() - t0 - (timer.connect_ms() - connect0) / 1000.0)
+
+    def getresponse(self, *args: Any, **kwargs: Any) -> Any:
+        timer = current_timer()
+        t0 = time.perf_counter()
+        response = super().getresponse(*args, **kwargs)
+        if timer is not None:
+            timer.add("ttfb", time.perf_counter() - t0)
+        return response
+
+
+# 沿用 urllib3 的类名，异常信息（如 "HTTPConnectionPool(host=..., port=...)"）与未计时时一致
+class HTTPConnection(_TimedConnectionMixin, _u3_connection.HTTPConnection):
+    pass
+
+
+class HTTPSConnection(_TimedConnectionMixin, _u3_connection.HTTPSConnection):
+    def connect(self) -> None:
+        timer = current_timer()
+        if timer is None:
+            return super().connect()
+        t0 = time.perf_counter()
+        connect0 = timer.connect_ms()
+        super().connect()
+        timer.add("tls", time.perf_counter() - t0 - (timer.connect_ms() - connect0) / 1000.0)
+
+
+class HTTPConnectionPool(_u3_pool.HTTPConnectionPool):
+    ConnectionCls = HTTPConnection
+
+
+class HTTPSConnectionPool(_u3_pool.HTTPSConnectionPool):
+    ConnectionCls = HTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": HTTPConnectionPool, "https": HTTPSConnectionPool}
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(str(url or ""))
+    return f"{parts.scheme.lower()}://{parts.netloc.lower()}"
+
+
+def probe_request(config: Dict[str, Any], method: str, url: str, **kwargs: Any) -> requests.Response:
+    """
+    按服务配置发起探测请求：http_keepalive 为 false 时不复用连接，其余走共享连接池。
+
+    分阶段耗时（PhaseTimer）挂在返回的响应或抛出的异常的 probe_timings 上，用 timings_detail() 取出。
+    """
+    keepalive = config.get("http_keepalive") is not False
+    timer = PhaseTimer(track_connections=TIMED_CONNECTIONS)
+    prev = bind_timer(timer)
+    try:
+        response = get_http_client().request(method, url, keepalive=keepalive, **kwargs)
+    except Exception as e:
+        timer.finish()
+        e.probe_timings = timer
+        raise
+    finally:
+        bind_timer(prev)
+    response.probe_timings = timer
+    return response
+
+
+_client: Optional[ProbeHttpClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> ProbeHttpClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = ProbeHttpClient(
+                pool_size=_env_int("HBM_HTTP_POOL_SIZE", HTTP_POOL_SIZE_DEFAULT),
+                idle_s=_env_float("HBM_HTTP_IDLE_S", HTTP_IDLE_S_DEFAULT),
+            )
+        return _client
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not str(raw).strip():
+        return int(default)
+    try:
+        return int(str(raw).strip())
+    except Exception:
+        return int(default)
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or not str(raw).strip():
+        return float(default)
+    try:
+        return float(str(raw).strip())
+    except Exception:
+        return float(default)
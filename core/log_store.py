@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Iterable, Optional, Set, Tuple, Union
+
+from core.segment_store import SegmentStore
+from core.sqlite_store import SqliteLogStore
+
+
+LOG_DIR = os.path.join("data", "logs")
+LOG_DB_PATH = os.path.join(LOG_DIR, "logs.db")
+LOG_BACKENDS = ("jsonl", "sqlite")
+
+LogStore = Union[SegmentStore, SqliteLogStore]
+
+
+def log_backend() -> str:
+    """
+    日志存储后端，由环境变量 HBM_LOG_BACKEND 选择：
+    - jsonl（默认）：按小时分段的 JSON Lines + 偏移索引
+    - sqlite：data/logs/logs.db（WAL），已有 JSONL 日志可用 migrate_logs.py 导入
+    """
+    v = str(os.getenv("HBM_LOG_BACKEND") or "").strip().lower()
+    return v if v in LOG_BACKENDS else "jsonl"
+
+
+def create_log_store(name: str, segment_dir: str, legacy_path: Optional[str] = None) -> LogStore:
+    if log_backend() == "sqlite":
+        return SqliteLogStore(LOG_DB_PATH, table=name)
+    return SegmentStore(segment_dir, prefix=name, legacy_path=legacy_path)
+
+
+def scope_service_ids(service_id: Optional[str] = None, service_ids: Optional[Iterable[str]] = None) -> Optional[Set[str]]:
+    """
+    合并“指定单个服务”与“允许的服务集合”两种过滤条件；返回 None 表示不过滤。
+
+    service_ids 为普通用户可见的服务集合，会下推到存储层按索引过滤，而不是读出全部记录后再筛。
+    """
+    if service_ids is None:
+        return {str(service_id)} if service_id else None
+    allowed = {str(x) for x in service_ids}
+    if service_id:
+        return allowed & {str(service_id)}
+    return allowed
+
+
+def parse_cursor(raw: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    解析分页游标 "ts_epoch,seq"；空值返回 None，格式不对抛 ValueError。
+
+    seq 由存储后端给出（分段文件内的字节偏移 / SQLite 行号），只在同一后端内有意义。
+    """
+    s = str(raw or "").strip()
+    if not s:
+        return None
+    parts = s.split(",")
+    if len(parts) != 2:
+        raise ValueError(f"invalid cursor: {s!r}")
+    return int(parts[0].strip()), int(parts[1].strip())
+
+
+def record_cursor(record: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not record or "seq" not in record:
+        return None
+    return f"{int(record.get('ts_epoch') or 0)},{int(record['seq'])}"
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Protocol, Tuple
+
+
+FLUSH_INTERVAL_MS_DEFAULT = 500
+FLUSH_EVERY_DEFAULT = 0
+FSYNC_INTERVAL_S_DEFAULT = 0.0
+MAX_PENDING_DEFAULT = 100000
+LOG_MAINTENANCE_INTERVAL_S = 3600.0
+
+log = logging.getLogger("heartbeat_monitor.log_writer")
+
+
+class LogSink(Protocol):
+    def write_batch(self, records: List[Dict[str, Any]]) -> None: ...
+
+    def flush(self, fsync: bool = False) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class LogWriter:
+    """
+    日志后台写入器。
+
+    - submit() 只把记录放进内存队列，检测线程不做任何磁盘 I/O。
+    - 后台线程按 flush_interval_s 攒批，每个 sink 每批一次 write，文件句柄常开。
+    - 持久化策略：flush_every>0 时积压达到 N 条立即落盘；fsync_interval_s>0 时最多每隔该秒数 fsync 一次。
+    - flush() 等待此前提交的记录全部写出（读接口用它保证“写后可读”）；close() 排空队列后停止线程。
+    - add_maintenance() 注册的维护任务（如按分段清理过期日志）也在该线程内按间隔执行，不占用检测线程。
+    - add_close_hook() 注册的回调在 close() 排空队列前执行。
+    """
+
+    def __init__(
+        self,
+        flush_interval_s: float = FLUSH_INTERVAL_MS_DEFAULT / 1000.0,
+        flush_every: int = FLUSH_EVERY_DEFAULT,
+        fsync_interval_s: float = FSYNC_INTERVAL_S_DEFAULT,
+        max_pending: int = MAX_PENDING_DEFAULT,
+    ):
+        self.flush_interval_s = max(float(flush_interval_s), 0.0)
+        self.flush_every = max(int(flush_every), 0)
+        self.fsync_interval_s = max(float(fsync_interval_s), 0.0)
+        self.max_pending = max(int(max_pending), 1)
+        self._sinks: Dict[str, LogSink] = {}
+        self._cond = threading.Condition()
+        self._pending: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        self._submitted = 0
+        self._written = 0
+        self._dropped = 0
+        self._force = False
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        self._last_fsync = time.monotonic()
+        self._maintenance: Dict[str, List[Any]] = {}
+        self._close_hooks: Dict[str, Callable[[], Any]] = {}
+
+    def register(self, name: str, sink: LogSink) -> None:
+        with self._cond:
+            self._sinks[str(name)] = sink
+
+    def add_maintenance(self, name: str, func: Callable[[], Any], interval_s: float) -> None:
+        """注册维护任务：写入线程启动后先执行一次，之后每 interval_s 秒执行一次。"""
+        with self._cond:
+            self._maintenance[str(name)] = [func, max(float(interval_s), 1.0), 0.0]
+            self._cond.notify_all()
+
+    def add_close_hook(self, name: str, func: Callable[[], Any]) -> None:
+        """注册关闭前回调：close() 排空队列之前执行，用于把内存中尚未提交的记录（如合并中的检测记录）补交进来。"""
+        with self._cond:
+            self._close_hooks[str(name)] = func
+
+    def start(self) -> None:
+        with self._cond:
+            if not self._closing:
+                self._ensure_thread()
+
+    def submit(self, name: str, record: Dict[str, Any]) -> None:
+        with self._cond:
+            if self._closing:
+                self._write_now(str(name), record)
+                return
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self._dropped += 1
+                if self._dropped == 1 or self._dropped % 1000 == 0:
+                    log.warning("log writer queue full, dropped=%s", self._dropped)
+            self._pending.append((str(name), record))
+            self._submitted += 1
+            self._ensure_thread()
+            if self.flush_every and len(self._pending) >= self.flush_every:
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        deadline = None if timeout is None else time.monotonic() + float(timeout)
+        with self._cond:
+            target = self._submitted
+            if self._written >= target:
+                return True
+            if self._thread is None or not self._thread.is_alive():
+                return False
+            self._force = True
+            self._cond.notify_all()
+            while self._written < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        with self._cond:
+            hooks = list(self._close_hooks.items())
+            self._close_hooks.clear()
+        for name, func in hooks:
+            try:
+                func()
+            except Exception:
+                log.exception("log close hook %s failed", name)
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        with self._cond:
+            for sink in self._sinks.values():
+                try:
+                    sink.flush(fsync=self.fsync_interval_s > 0)
+                    sink.close()
+                except Exception:
+                    log.exception("log sink close failed")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "submitted": self._submitted,
+                "written": self._written,
+                "dropped": self._dropped,
+            }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._run_due_maintenance()
+            with self._cond:
+                while not self._pending and not self._closing:
+                    wait_s = self._maintenance_wait_s()
+                    if wait_s is not None and wait_s <= 0:
+                        break
+                    self._cond.wait(wait_s)
+                if not self._pending:
+                    if self._closing:
+                        return
+                    continue
+                deadline = time.monotonic() + self.flush_interval_s
+                while not (self._closing or self._force):
+                    if self.flush_every and len(self._pending) >= self.flush_every:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending
+                self._pending = deque()
+                self._force = False
+                target = self._submitted
+            self._write_batch(batch)
+            with self._cond:
+                self._written = max(self._written, target)
+                self._cond.notify_all()
+
+    def _write_batch(self, batch: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for name, record in batch:
+            grouped.setdefault(name, []).append(record)
+        do_fsync = self.fsync_interval_s > 0 and (time.monotonic() - self._last_fsync) >= self.fsync_interval_s
+        for name, records in grouped.items():
+            sink = self._sinks.get(name)
+            if sink is None:
+                log.warning("log writer: unknown sink %s, dropped %s records", name, len(records))
+                continue
+            try:
+                sink.write_batch(records)
+                sink.flush(fsync=do_fsync)
+            except Exception:
+                log.exception("log writer: write to %s failed, dropped %s records", name, len(records))
+        if do_fsync:
+            self._last_fsync = time.monotonic()
+
+    def _maintenance_wait_s(self) -> Optional[float]:
+        if not self._maintenance:
+            return None
+        return min(task[2] for task in self._maintenance.values()) - time.monotonic()
+
+    def _run_due_maintenance(self) -> None:
+        now = time.monotonic()
+        with self._cond:
+            due = [(name, task) for name, task in self._maintenance.items() if task[2] <= now]
+            for _, task in due:
+                task[2] = now + task[1]
+        for name, task in due:
+            try:
+                task[0]()
+            except Exception:
+                log.exception("log maintenance %s failed", name)
+
+    def _write_now(self, name: str, record: Dict[str, Any]) -> None:
+        # 关闭阶段（如 atexit 之后）仍有零星写入时直接同步落盘，保证不丢。
+        sink = self._sinks.get(name)
+        if sink is None:
+            return
+        try:
+            sink.write_batch([record])
+            sink.flush(fsync=False)
+        except Exception:
+            log.exception("log writer: write to %s failed", name)
+
+
+_writer: Optional[LogWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> LogWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = LogWriter(
+                flush_interval_s=_env_float("HBM_LOG_FLUSH_INTERVAL_MS", FLUSH_INTERVAL_MS_DEFAULT) / 1000.0,
+                flush_every=int(_env_float("HBM_LOG_FLUSH_EVERY", FLUSH_EVERY_DEFAULT)),
+                fsync_interval_s=_env_float("HBM_LOG_FSYNC_INTERVAL_S", FSYNC_INTERVAL_S_DEFAULT),
+                max_pending=int(_env_float("HBM_LOG_MAX_PENDING", MAX_PENDING_DEFAULT)),
+            )
+            atexit.register(_writer.close)
+        return _writer
+
+
+def shutdown_log_writer(timeout: Optional[float] = 10.0) -> None:
+    with _writer_lock:
+        writer = _writer
+    if writer is not None:
+        writer.close(timeout)
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or not str(raw).strip():
+        return float(default)
+    try:
+        return float(str(raw).strip())
+    except Exception:
+        return float(default)
@@ -1,12 +1,28 @@
 from __future__ import annotations
 
+import logging
+import threading
 import time
-from dataclasses import dataclass
-from typing import Any, Dict, Iterable, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
 
+from core.adaptive_schedule import next_interval, parse_adaptive_policy
 from core.base_service import BaseService
+from core.check_executor import CheckTask, check_deadline_s, get_check_executor, service_host
+from core.check_schedule import ScheduleSpec, interval_seconds, job_id_for_service, parse_check_schedule, placement_kwargs
+from core.control_jobs import get_control_jobs
+from core.dependency import blocked_probe_every, dependency_cycles, get_tcp_reachability, parse_dependencies
 from core.error_log import append_error
 from core.event_log import append_event
+from core.probe_pools import POOL_FAST, POOL_HEAVY, current_pool, functional_probe_class, get_probe_pools
+from core.probe_tiers import functional_trigger, latency_degraded, parse_tier_policy, record_cheap_latency, run_cheap
+from core.timer_queue import get_timer_queue
+
+
+log = logging.getLogger("heartbeat_monitor.monitor_engine")
+
+# 自动重启排队与执行的最长等待；重启任务登记复检后改为按复检时间计算
+RESTART_PENDING_MAX_S = 600.0
 
 
 @dataclass(frozen=True)
@@ -15,9 +31,30 @@ class CheckResult:
     message: str
 
 
+@dataclass
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: CheckResult = CheckResult(False, "Unhealthy")
+
+
 class MonitorEngine:
     def __init__(self, services: Iterable[BaseService]):
         self._services: Dict[str, BaseService] = {s.service_id: s for s in services}
+        self.scheduler: Any = None
+        self._adaptive_lock = threading.Lock()
+        self._flight_lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._last_results: Dict[str, Tuple[float, CheckResult]] = {}
+        self._blocked_ticks: Dict[str, int] = {}
+        self._restart_pending: Dict[str, float] = {}
+        self._handoffs: Set[str] = set()
+        graph = {
+            sid: [d.target for d in parse_dependencies(s.config) if d.kind == "service"] for sid, s in self._services.items()
+        }
+        # 循环依赖中的服务互相阻断后谁都不会再探测，因此这些服务之间的依赖不参与阻断
+        self._dependency_cycles = dependency_cycles(graph)
+        if self._dependency_cycles:
+            log.warning("depends_on cycle ignored: %s", ", ".join(sorted(self._dependency_cycles)))
 
     @property
     def services(self) -> Dict[str, BaseService]:
@@ -26,7 +63,12 @@ class MonitorEngine:
     def get(self, service_id: str) -> Optional[BaseService]:
         return self._services.get(service_id)
 
-    def check_one(self, service_id: str, allow_fix: bool = True) -> CheckResult:
+    def check_one(self, service_id: str, allow_fix: bool = True, force: bool = False) -> CheckResult:
+        """
+        检测单个服务。同一服务同时只进行一次探测：检测进行中到达的调用（定时任务、多人手工检测、控制后复检）
+        等待并共用这次的结果；配置了 check_fresh_s 时，距上次完成不足该秒数的调用直接返回上次结果。
+        force=True 时不用缓存结果，也不共用启动前就已开始的探测，而是等它结束后重新探测一次。
+        """
         service = self.get(service_id)
         if not service:
             return CheckResult(False, "Service not found")
@@ -34,68 +76,100 @@ class MonitorEngine:
             append_event(service.service_id, service.name, "warn", "check", "Disabled")
             return CheckResult(False, "Disabled")
 
+        sid = service.service_id
+        fresh_s = _fresh_window_s(service.config)
+        while True:
+            with self._flight_lock:
+                last = self._last_results.get(sid)
+                if not force and fresh_s > 0 and last is not None and time.monotonic() - last[0] < fresh_s:
+                    return last[1]
+                flight = self._flights.get(sid)
+                leader = flight is None
+                if leader:
+                    flight = _Flight()
+                    self._flights[sid] = flight
+            if leader or not force:
+                break
+            if not flight.done.wait(self._check_deadline(service)):
+                return CheckResult(False, "Check still in progress")
+        if not leader:
+            if not flight.done.wait(self._check_deadline(service)):
+                return CheckResult(False, "Check still in progress")
+            return flight.result
+
+        result = CheckResult(False, "Unhealthy")
         try:
-            ok, msg, detail = service.check_health()
+            result = self._probe(service, allow_fix)
         except Exception as e:
-            ok, msg, detail = False, f"check_exception: {type(e).__name__}: {e}", {"exception": str(e), "type": type(e).__name__}
+            result = CheckResult(False, f"check_exception: {type(e).__name__}: {e}")
+            raise
+        finally:
+            with self._flight_lock:
+                self._flights.pop(sid, None)
+                self._last_results[sid] = (time.monotonic(), result)
+            flight.result = result
+            flight.done.set()
+        return result
+
+    def _probe(self, service: BaseService, allow_fix: bool) -> CheckResult:
+        blocked = self._blocked_by(service)
+        if blocked is not None and not (self._is_handoff_run(service.service_id) or self._blocked_probe_due(service)):
+            return self._mark_blocked(service, *blocked)
+        prev_status = service.status
+        ok, msg, detail, tier = self._tiered_health(service)
+        if tier is not None and tier.get("handoff"):
+            return self._hand_off_functional(service, tier, allow_fix)
+        if not ok and blocked is not None:
+            # 阻断期间的定期真实探测仍失败：继续记为 Blocked，不写错误日志、不自动重启
+            return self._mark_blocked(service, *blocked)
+        if not ok:
+            ok, msg, detail = self._confirm_failure(service, msg, detail)
+        if tier is not None:
+            self._record_tier(service, tier, ok)
+            detail = {**(detail or {}), "probe_tier": tier}
 
-        auto_detail: Dict[str, Any] = {}
+        if not ok and self._restart_pending_for(service.service_id):
+            # 自动重启已在进行或等待复检：不重复计失败、不再次重启，结论以重启后的复检为准
+            return CheckResult(False, f"{msg or 'Unhealthy'}; restart pending")
+
+        auto_restart: Optional[bool] = None
         if not ok:
             on_failure = str(service.config.get("on_failure") or "alert").lower()
             ops_enabled = bool(getattr(service, "config", {}).get("_ops_enabled", False))
             if allow_fix and ops_enabled and on_failure == "restart" and bool(service.config.get("auto_fix", True)):
-                can_restart = bool(service.get_info().get("can_restart"))
-                if can_restart:
-                    try:
-                        r_ok, r_msg = service.restart_service()
-                        auto_detail = {"auto_action": "restart", "auto_ok": r_ok, "auto_message": r_msg}
-                    except Exception as e:
-                        auto_detail = {
-                            "auto_action": "restart",
-                            "auto_ok": False,
-                            "auto_message": f"restart_exception: {type(e).__name__}: {e}",
-                            "exception": str(e),
-                            "type": type(e).__name__,
-                        }
-                else:
-                    auto_detail = {"auto_action": "restart", "auto_ok": False, "auto_message": "restart not configured"}
+                auto_restart = bool(service.get_info().get("can_restart"))
 
         service.update_status(ok, msg, detail)
+        self._adapt_schedule(service, ok)
+        if ok and prev_status != "Running":
+            self._recheck_blocked_children(service.service_id)
         if not ok:
             append_error(service.service_id, service.name, msg)
-            if auto_detail.get("auto_action") == "restart":
-                append_error(service.service_id, service.name, f"Auto-restart: {auto_detail.get('auto_message')}")
             append_event(service.service_id, service.name, "error", "check", msg or "Unhealthy", detail=detail or {})
-            if auto_detail.get("auto_action") == "restart":
-                append_event(
+            if auto_restart is False:
+                auto_detail = {"auto_action": "restart", "auto_ok": False, "auto_message": "restart not configured"}
+                append_error(service.service_id, service.name, "Auto-restart: restart not configured")
+                append_event(service.service_id, service.name, "warn", "auto_restart", "restart not configured", detail=auto_detail)
+            elif auto_restart:
+                # 重启交给控制任务队列（ops 线程池），与手工启停按服务串行，检测线程不等待 SSH 命令
+                self._set_restart_pending(service.service_id, RESTART_PENDING_MAX_S)
+                get_control_jobs().submit(
                     service.service_id,
-                    service.name,
-                    "warn" if not bool(auto_detail.get("auto_ok")) else "info",
                     "auto_restart",
-                    str(auto_detail.get("auto_message") or ""),
-                    detail=auto_detail,
+                    lambda step: self._auto_restart(service, step),
+                    submitted_by="auto",
                 )
-                if bool(auto_detail.get("auto_ok")):
-                    wait_s = self._post_auto_restart_delay(service)
-                    append_event(
-                        service.service_id,
-                        service.name,
-                        "info",
-                        "restart_wait",
-                        f"wait {wait_s:.1f}s before re-check",
-                        detail={"delay_s": wait_s},
-                    )
-                    if wait_s > 0:
-                        time.sleep(wait_s)
-                    post_restart_ok, post_restart_message = self._check_after_restart(service)
-                    if post_restart_ok:
-                        return CheckResult(True, post_restart_message)
-                    return CheckResult(False, post_restart_message)
+                return CheckResult(False, f"{msg or 'Unhealthy'}; auto-restart queued")
         else:
             append_event(service.service_id, service.name, "info", "check", "Healthy", detail=detail or {})
         return CheckResult(ok, msg or ("Healthy" if ok else "Unhealthy"))
 
     def check_all(self) -> None:
+        """
+        并行检测全部参与自动检测的服务（全局并发与单主机并发受限，见 core/check_executor.py）。
+        首轮状态的耗时约等于最慢的一次检测，而不是所有检测耗时之和。
+        """
+        tasks = []
         for service_id in list(self._services.keys()):
             s = self._services.get(service_id)
             if not s:
@@ -104,9 +178,27 @@ class MonitorEngine:
                 continue
             if not bool(s.config.get("auto_check", True)):
                 continue
-            self.check_one(service_id, allow_fix=True)
+            tasks.append(
+                CheckTask(
+                    key=service_id,
+                    host=service_host(s.config) or f"service:{service_id}",
+                    deadline_s=self._check_deadline(s),
+                    func=lambda sid=service_id: self.check_one(sid, allow_fix=True),
+                )
+            )
+        # 上游服务先发起检测，下游检测时更可能拿到上游的最新状态
+        tasks.sort(key=lambda t: self._dependency_depth(t.key))
+        get_check_executor().run(tasks, on_deadline=lambda t: self._record_deadline_exceeded(t.key, t.deadline_s))
 
-    def control(self, service_id: str, action: str, allow_fix: bool = True) -> Tuple[bool, str]:
+    def control(
+        self,
+        service_id: str,
+        action: str,
+        allow_fix: bool = True,
+        step: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[bool, str]:
+        """执行启停/重启/检测；step(name) 在每个阶段开始时回调（控制任务据此记录步骤耗时）。"""
+        step = step or _no_step
         service = self.get(service_id)
         if not service:
             return False, "Service not found"
@@ -116,23 +208,21 @@ class MonitorEngine:
         if action in ("start", "stop", "restart") and not bool(getattr(service, "config", {}).get("_ops_enabled", False)):
             append_event(service.service_id, service.name, "warn", action, "Ops disabled")
             return False, "Ops disabled"
+        if action in ("start", "stop", "restart"):
+            # 启停后服务状态已变，之前缓存的检测结果不再可信
+            self._forget_result(service.service_id)
         if action == "start":
+            step("start")
             try:
                 ok, msg = service.start_service()
             except Exception as e:
                 ok, msg = False, f"start_exception: {type(e).__name__}: {e}"
             append_event(service.service_id, service.name, "info" if ok else "error", "start", msg)
             if ok:
-                delay_s = service.config.get("post_control_check_delay_s")
-                if delay_s is not None:
-                    try:
-                        time.sleep(min(float(delay_s), 10.0))
-                    except Exception:
-                        pass
-                r = self.check_one(service_id, allow_fix=False)
-                return True, f"{msg}; status={'Healthy' if r.ok else 'Unhealthy'}; {r.message}".strip("; ")
+                return True, self._check_after_control(service, msg, step)
             return ok, msg
         if action == "stop":
+            step("stop")
             try:
                 ok, msg = service.stop_service()
             except Exception as e:
@@ -146,39 +236,386 @@ class MonitorEngine:
                 return True, msg
             return ok, msg
         if action == "restart":
+            step("restart")
             try:
                 ok, msg = service.restart_service()
             except Exception as e:
                 ok, msg = False, f"restart_exception: {type(e).__name__}: {e}"
             append_event(service.service_id, service.name, "info" if ok else "error", "restart", msg)
             if ok:
-                delay_s = service.config.get("post_control_check_delay_s")
-                if delay_s is not None:
-                    try:
-                        time.sleep(min(float(delay_s), 10.0))
-                    except Exception:
-                        pass
-                r = self.check_one(service_id, allow_fix=False)
-                return True, f"{msg}; status={'Healthy' if r.ok else 'Unhealthy'}; {r.message}".strip("; ")
+                return True, self._check_after_control(service, msg, step)
             return ok, msg
         if action == "check":
+            step("check")
             r = self.check_one(service_id, allow_fix=allow_fix)
             append_event(service.service_id, service.name, "info" if r.ok else "error", "check_manual", r.message)
             return True, f"Check complete: {'Healthy' if r.ok else 'Unhealthy'}; {r.message}".strip("; ")
         return False, "Unsupported action"
 
-    def _check_after_restart(self, service: BaseService) -> Tuple[bool, str]:
+    def _auto_restart(self, service: BaseService, step: Callable[[str], None]) -> Tuple[bool, str]:
+        """自动重启任务：执行重启、记录事件，成功后按 post_auto_restart_check_delay_s 复检。"""
+        step("restart")
         try:
-            ok, msg, detail = service.check_health()
+            r_ok, r_msg = service.restart_service()
+            auto_detail: Dict[str, Any] = {"auto_action": "restart", "auto_ok": r_ok, "auto_message": r_msg}
         except Exception as e:
-            ok, msg, detail = False, f"check_exception: {type(e).__name__}: {e}", {"exception": str(e), "type": type(e).__name__}
-        service.update_status(ok, msg, detail)
-        if ok:
-            append_event(service.service_id, service.name, "info", "check_after_restart", "Healthy", detail=detail or {})
+            r_ok, r_msg = False, f"restart_exception: {type(e).__name__}: {e}"
+            auto_detail = {
+                "auto_action": "restart",
+                "auto_ok": False,
+                "auto_message": r_msg,
+                "exception": str(e),
+                "type": type(e).__name__,
+            }
+        append_error(service.service_id, service.name, f"Auto-restart: {r_msg}")
+        append_event(service.service_id, service.name, "info" if r_ok else "warn", "auto_restart", str(r_msg or ""), detail=auto_detail)
+        if not r_ok:
+            self._set_restart_pending(service.service_id, None)
+            return False, r_msg
+        wait_s = self._post_auto_restart_delay(service)
+        append_event(
+            service.service_id,
+            service.name,
+            "info",
+            "restart_wait",
+            f"wait {wait_s:.1f}s before re-check",
+            detail={"delay_s": wait_s},
+        )
+        if wait_s > 0:
+            # 复检登记为延时任务，任务线程立即返回，不再 sleep 等待；等待期间定时检测不再触发重启
+            self._set_restart_pending(service.service_id, wait_s + self._check_deadline(service))
+            get_timer_queue().call_later(wait_s, self._check_after_restart, service, key=f"check_after_restart:{service.service_id}")
+            return True, f"{r_msg}; re-check in {wait_s:.1f}s".strip("; ")
+        step("check")
+        return self._check_after_restart(service)
+
+    def _check_after_control(self, service: BaseService, msg: str, step: Callable[[str], None]) -> str:
+        """
+        启动/重启成功后的复检：配置了 post_control_check_delay_s 时登记为延时任务（上限 10 秒），
+        请求线程不再 sleep；未配置时立即复检并把结果带回。
+        """
+        delay_s = 0.0
+        try:
+            delay_s = min(max(float(service.config.get("post_control_check_delay_s") or 0), 0.0), 10.0)
+        except Exception:
+            pass
+        if delay_s > 0:
+            get_timer_queue().call_later(
+                delay_s, self.check_one, service.service_id, False, key=f"check_after_control:{service.service_id}"
+            )
+            return f"{msg}; re-check in {delay_s:.1f}s".strip("; ")
+        step("check")
+        r = self.check_one(service.service_id, allow_fix=False)
+        return f"{msg}; status={'Healthy' if r.ok else 'Unhealthy'}; {r.message}".strip("; ")
+
+    def _check_after_restart(self, service: BaseService) -> Tuple[bool, str]:
+        """重启后的复检：走 check_one（与定时检测共用单飞与状态更新），结束重启等待期；复检失败不再自动重启。"""
+        self._set_restart_pending(service.service_id, None)
+        self._forget_result(service.service_id)
+        r = self.check_one(service.service_id, allow_fix=False, force=True)
+        if r.ok:
+            append_event(service.service_id, service.name, "info", "check_after_restart", "Healthy")
             return True, "Healthy after restart"
-        append_error(service.service_id, service.name, f"Post-restart check failed: {msg}")
-        append_event(service.service_id, service.name, "error", "check_after_restart", msg or "Unhealthy", detail=detail or {})
-        return False, msg or "Unhealthy"
+        # 失败原因已由 check_one 写入错误日志，这里只记复检结论
+        append_event(service.service_id, service.name, "error", "check_after_restart", r.message or "Unhealthy")
+        return False, r.message or "Unhealthy"
+
+    def _set_restart_pending(self, service_id: str, seconds: Optional[float]) -> None:
+        with self._flight_lock:
+            if seconds is None:
+                self._restart_pending.pop(service_id, None)
+            else:
+                self._restart_pending[service_id] = time.monotonic() + seconds
+
+    def _restart_pending_for(self, service_id: str) -> bool:
+        with self._flight_lock:
+            until = self._restart_pending.get(service_id)
+            if until is not None and time.monotonic() >= until:
+                self._restart_pending.pop(service_id, None)
+                until = None
+        return until is not None
+
+    def _dependency_depth(self, service_id: str) -> int:
+        depth, seen, frontier = 0, {service_id}, [service_id]
+        while frontier:
+            parents = []
+            for sid in frontier:
+                svc = self.get(sid)
+                for d in parse_dependencies(svc.config) if svc else []:
+                    if d.kind == "service" and d.target not in seen and d.target in self._services:
+                        seen.add(d.target)
+                        parents.append(d.target)
+            if not parents:
+                break
+            depth += 1
+            frontier = parents
+        return depth
+
+    def _forget_result(self, service_id: str) -> None:
+        with self._flight_lock:
+            self._last_results.pop(service_id, None)
+        # 启停后下一次检测做完整功能探测，不只看端口是否通
+        service = self.get(service_id)
+        state = service.config.get("_probe_tiers") if service else None
+        if isinstance(state, dict):
+            service.config["_probe_tiers"] = {k: v for k, v in state.items() if k != "last_functional_ts"}
+
+    def _blocked_by(self, service: BaseService) -> Optional[Tuple[str, str]]:
+        """
+        返回第一个处于故障状态的上游依赖 (名称, 原因)；没有则返回 None。
+        不存在、被禁用、关闭了自动检测（状态不会再更新）或处于循环依赖中的上游服务不计入。
+        """
+        for dep in parse_dependencies(service.config):
+            if dep.kind == "service":
+                parent = self.get(dep.target)
+                if parent is None or parent is service or dep.target in self._dependency_cycles:
+                    continue
+                if bool(parent.config.get("_disabled", False)) or not bool(parent.config.get("auto_check", True)):
+                    continue
+                if parent.status in ("Error", "Blocked"):
+                    return dep.label, parent.last_error or parent.status
+            else:
+                ok, reason = get_tcp_reachability().check(dep.target, dep.port, dep.timeout_s)
+                if not ok:
+                    return dep.label, reason
+        return None
+
+    def _blocked_probe_due(self, service: BaseService) -> bool:
+        """被阻断时每 blocked_probe_every 次检测做一次真实探测，上游状态过时或判断有误时服务仍能自行恢复。"""
+        every = blocked_probe_every(service.config)
+        sid = service.service_id
+        with self._flight_lock:
+            ticks = self._blocked_ticks.get(sid, 0) + 1 if service.status == "Blocked" else 0
+            self._blocked_ticks[sid] = ticks
+        return every > 0 and ticks > 0 and ticks % every == 0
+
+    def _mark_blocked(self, service: BaseService, parent: str, reason: str) -> CheckResult:
+        """上游故障时跳过探测：状态记为 Blocked，只在刚进入该状态时记一条事件，不写错误日志、不自动重启。"""
+        msg = f"Blocked by {parent}: {reason}"
+        detail = {"ok": False, "reason": "blocked_by_parent", "parent": parent, "parent_reason": reason}
+        if service.mark_blocked(msg, detail) != "Blocked":
+            append_event(service.service_id, service.name, "warn", "check", msg, detail=detail)
+        return CheckResult(False, msg)
+
+    def _recheck_blocked_children(self, service_id: str) -> None:
+        """上游恢复后立即复检被它阻断的服务，而不是等各自的下一次定时检测。"""
+        for child in list(self._services.values()):
+            if child.status != "Blocked":
+                continue
+            if any(d.kind == "service" and d.target == service_id for d in parse_dependencies(child.config)):
+                get_timer_queue().call_later(0, self.check_one, child.service_id, key=f"check_after_parent:{child.service_id}")
+
+    def _tiered_health(self, service: BaseService) -> Tuple[bool, str, Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        按 probe_tiers 分级探测（见 core/probe_tiers.py）：未到功能探测间隔时只做轻量探测；
+        轻量探测失败或明显变慢、上次功能探测失败、启停后首次检测时立即做完整功能探测（check_health）。
+        第四个返回值是本次的分级归因（tier/trigger/轻量探测摘要），未启用分级时为 None。
+        """
+        policy = parse_tier_policy(service.config)
+        if policy is None:
+            ok, msg, detail = _health(service)
+            return ok, msg, detail, None
+        state = dict(service.config.get("_probe_tiers") or {})
+        escalated = state.get("escalate") or {}
+        trigger = escalated.get("trigger") or functional_trigger(policy, state, time.time())
+        cheap: Optional[Dict[str, Any]] = escalated.get("cheap")
+        # fast 池里只做轻量探测；昂贵的功能探测转交 heavy 池，不占用轻量检测的线程
+        handoff = current_pool() == POOL_FAST and functional_probe_class(service.config) == POOL_HEAVY
+        if trigger is not None and handoff:
+            return True, "", {}, {"tier": "functional", "trigger": trigger, "handoff": POOL_HEAVY}
+        if trigger is None:
+            c_ok, c_msg, c_detail = run_cheap(service.config, policy.cheap)
+            cheap = {**_attempt_summary(c_ok, c_msg, c_detail), "target": policy.cheap.label}
+            elapsed_ms = float(c_detail.get("elapsed_ms") or 0)
+            if not c_ok:
+                trigger = "cheap_failed"
+            elif latency_degraded(policy, state, elapsed_ms):
+                trigger = "latency_degraded"
+            else:
+                age_s = int(time.time() - float(state["last_functional_ts"]))
+                tier = {"tier": "cheap", "cheap": cheap, "functional_age_s": age_s, "functional_interval_s": policy.functional_s}
+                return True, "", c_detail, tier
+            if handoff:
+                return c_ok, c_msg, c_detail, {"tier": "cheap", "trigger": trigger, "cheap": cheap, "handoff": POOL_HEAVY}
+        ok, msg, detail = _health(service)
+        tier: Dict[str, Any] = {"tier": "functional", "trigger": trigger, "functional_interval_s": policy.functional_s}
+        if cheap is not None:
+            tier["cheap"] = cheap
+        return ok, msg, detail, tier
+
+    def _hand_off_functional(self, service: BaseService, tier: Dict[str, Any], allow_fix: bool) -> CheckResult:
+        """
+        把功能探测转交 heavy 池：记下触发原因（与轻量探测摘要），由 heavy 池里的 check_one 完成探测并更新状态；
+        本次不改变服务状态。同一服务已有转交在排队时不再重复提交。
+        """
+        sid = service.service_id
+        state = dict(service.config.get("_probe_tiers") or {})
+        state["escalate"] = {"trigger": tier.get("trigger"), "cheap": tier.get("cheap")}
+        service.config["_probe_tiers"] = state
+        with self._flight_lock:
+            queued = sid in self._handoffs
+            self._handoffs.add(sid)
+        if not queued:
+            try:
+                get_probe_pools().submit(POOL_HEAVY, self._run_handoff, sid, allow_fix)
+            except RuntimeError:
+                with self._flight_lock:
+                    self._handoffs.discard(sid)
+                log.warning("functional probe for %s not queued: pool is shut down", sid)
+        return CheckResult(service.status == "Running", f"functional probe queued ({tier.get('trigger')})")
+
+    def _is_handoff_run(self, service_id: str) -> bool:
+        """当前是否为转交到 heavy 池的功能探测（被阻断时也照常探测，否则转交出去的探测会被丢弃）。"""
+        with self._flight_lock:
+            return service_id in self._handoffs and current_pool() == POOL_HEAVY
+
+    def _run_handoff(self, service_id: str, allow_fix: bool) -> None:
+        try:
+            self.check_one(service_id, allow_fix=allow_fix, force=True)
+        finally:
+            with self._flight_lock:
+                self._handoffs.discard(service_id)
+
+    def _record_tier(self, service: BaseService, tier: Dict[str, Any], ok: bool) -> None:
+        """记录分级探测状态到 config["_probe_tiers"]（上次功能探测时间与结果、轻量探测耗时基线），由 get_info 展示。"""
+        state = dict(service.config.get("_probe_tiers") or {})
+        cheap = tier.get("cheap") or {}
+        # 变慢触发的功能探测仍正常时也计入基线，让基线跟上新的常态，不会每次都升级
+        if cheap.get("ok") and (tier["tier"] == "cheap" or (tier.get("trigger") == "latency_degraded" and ok)):
+            record_cheap_latency(state, float(cheap.get("elapsed_ms") or 0))
+            state["cheap_target"] = cheap.get("target")
+        if tier["tier"] == "functional":
+            state["last_functional_ts"] = round(time.time(), 3)
+            state["last_functional_ok"] = bool(ok)
+            state.pop("escalate", None)
+        state["functional_interval_s"] = tier.get("functional_interval_s")
+        service.config["_probe_tiers"] = state
+
+    def _confirm_failure(self, service: BaseService, msg: str, detail: Dict[str, Any]) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        按 confirm_failures 策略确认失败：首次失败后以 interval_s 间隔快速重试（每次超时 timeout_s），
+        共 attempts 次中至少 failures 次失败才判定失败；否则按最近一次成功的结果判定健康。
+        能提前确定结论时不再继续重试。各次结果以摘要形式记入 detail["confirm"]。
+        """
+        policy = _confirm_policy(service.config)
+        if policy is None:
+            return False, msg, detail
+        attempts = [_attempt_summary(False, msg, detail)]
+        failures = 1
+        last_ok: Optional[Tuple[str, Dict[str, Any]]] = None
+        last_fail = (msg, detail)
+        while failures < policy.failures and failures + (policy.attempts - len(attempts)) >= policy.failures:
+            time.sleep(policy.interval_s)
+            with service.probe_timeout(policy.timeout_s):
+                r_ok, r_msg, r_detail = _health(service)
+            attempts.append(_attempt_summary(r_ok, r_msg, r_detail))
+            if r_ok:
+                last_ok = (r_msg, r_detail)
+            else:
+                failures += 1
+                last_fail = (r_msg, r_detail)
+        confirmed = failures >= policy.failures
+        summary = {"attempts": attempts, "failures": failures, "required": policy.failures, "confirmed": confirmed}
+        if confirmed or last_ok is None:
+            return False, last_fail[0], {**(last_fail[1] or {}), "confirm": summary}
+        return True, last_ok[0], {**(last_ok[1] or {}), "confirm": summary}
+
+    def _check_deadline(self, service: BaseService) -> float:
+        deadline = check_deadline_s(service.config)
+        tiers = parse_tier_policy(service.config)
+        if tiers is not None:
+            deadline += tiers.cheap.timeout_s
+        policy = _confirm_policy(service.config)
+        if policy is not None:
+            retry_timeout = policy.timeout_s if policy.timeout_s is not None else deadline
+            deadline += (policy.attempts - 1) * (retry_timeout + policy.interval_s)
+        return deadline
+
+    def _record_deadline_exceeded(self, service_id: str, deadline_s: float) -> None:
+        service = self.get(service_id)
+        if not service:
+            return
+        msg = f"Check deadline exceeded ({deadline_s:.0f}s)"
+        service.update_status(False, msg, {"ok": False, "reason": "deadline_exceeded", "deadline_s": deadline_s})
+        self._adapt_schedule(service, False)
+        append_error(service.service_id, service.name, msg)
+        append_event(service.service_id, service.name, "error", "check", msg, detail={"reason": "deadline_exceeded", "deadline_s": deadline_s})
+
+    def _adapt_schedule(self, service: BaseService, ok: bool) -> None:
+        """
+        按服务的 adaptive_schedule 策略调整定时检测间隔（见 core/adaptive_schedule.py）。
+
+        只对 interval 类 check_schedule 生效；状态写入 config["_adaptive_schedule"]，由 get_info 展示。
+        """
+        config = getattr(service, "config", None)
+        if not isinstance(config, dict) or not config.get("adaptive_schedule"):
+            return
+        base_s = interval_seconds(parse_check_schedule(config.get("check_schedule")))
+        policy = parse_adaptive_policy(config.get("adaptive_schedule"), base_s or 1)
+        if not base_s or policy is None:
+            config.pop("_adaptive_schedule", None)
+            return
+        with self._adaptive_lock:
+            state = dict(config.get("_adaptive_schedule") or {})
+            current_s = self._job_interval_s(service.service_id)
+            if current_s is not None and state.get("interval_s") not in (None, current_s):
+                # 定时任务已按基础间隔重新登记（改频率、解除禁用等），之前的加密/退避状态作废，从基础间隔重新开始
+                state = {}
+            new_s = next_interval(policy, state, base_s, ok)
+            state.update({"fast_s": policy.fast_s, "max_s": policy.max_s, "stable_checks": policy.stable_checks})
+            config["_adaptive_schedule"] = state
+            prev_s = self._reschedule_interval(service.service_id, new_s)
+        if prev_s is not None:
+            append_event(
+                service.service_id,
+                service.name,
+                "info",
+                "adaptive_schedule",
+                f"check interval {prev_s}s -> {new_s}s",
+                detail={"from_s": prev_s, "to_s": new_s, "mode": state.get("mode")},
+            )
+
+    def reset_adaptive_schedule(self, service_id: str) -> None:
+        """服务的定时任务被重新登记后调用：清掉自适应间隔状态，服务详情不再显示已失效的间隔。"""
+        service = self.get(service_id)
+        if service is None:
+            return
+        with self._adaptive_lock:
+            service.config.pop("_adaptive_schedule", None)
+
+    def _job_interval_s(self, service_id: str) -> Optional[int]:
+        """服务定时任务当前实际的间隔秒数；没有调度器、未登记或非 interval 任务时返回 None。"""
+        scheduler = self.scheduler
+        if scheduler is None:
+            return None
+        try:
+            job = scheduler.get_job(job_id_for_service(service_id))
+        except Exception:
+            return None
+        current = getattr(getattr(job, "trigger", None), "interval", None)
+        if job is None or current is None:
+            return None
+        return int(current.total_seconds())
+
+    def _reschedule_interval(self, service_id: str, seconds: int) -> Optional[int]:
+        """
+        把服务的定时任务改为 seconds 间隔（保持哈希错峰），返回原间隔秒数；
+        未登记定时任务（如关闭了自动检测）、非 interval 任务或间隔未变时返回 None。
+        """
+        scheduler = self.scheduler
+        prev_s = self._job_interval_s(service_id)
+        if scheduler is None or prev_s is None:
+            return None
+        job_id = job_id_for_service(service_id)
+        if prev_s == int(seconds):
+            return None
+        spec = ScheduleSpec("interval", {"seconds": int(seconds)})
+        try:
+            scheduler.reschedule_job(job_id, trigger="interval", **spec.kwargs, **placement_kwargs(service_id, spec))
+        except Exception:
+            log.exception("reschedule %s failed", job_id)
+            return None
+        return prev_s
 
     def _post_auto_restart_delay(self, service: BaseService) -> float:
         raw = getattr(service, "config", {}).get("post_auto_restart_check_delay_s", 5)
@@ -186,3 +623,61 @@ class MonitorEngine:
             return min(max(float(raw), 0.0), 120.0)
         except Exception:
             return 5.0
+
+
+@dataclass(frozen=True)
+class ConfirmPolicy:
+    attempts: int
+    failures: int
+    interval_s: float
+    timeout_s: Optional[float]
+
+
+def _confirm_policy(config: Dict[str, Any]) -> Optional[ConfirmPolicy]:
+    """
+    解析 confirm_failures：整数 N 表示共 N 次、过半失败才判定失败；字典支持 attempts/failures/interval_s/timeout_s。
+    未配置或 attempts <= 1 时返回 None（首次失败即判定失败）。
+    """
+    raw = config.get("confirm_failures")
+    if raw is None or raw is False:
+        return None
+    cfg: Dict[str, Any] = raw if isinstance(raw, dict) else {"attempts": raw}
+    try:
+        attempts = min(int(cfg.get("attempts") or 3), 10)
+        if attempts <= 1:
+            return None
+        failures = min(max(int(cfg.get("failures") or attempts // 2 + 1), 1), attempts)
+        interval_s = min(max(float(cfg.get("interval_s") if cfg.get("interval_s") is not None else 1.0), 0.0), 30.0)
+        timeout_s = float(cfg["timeout_s"]) if cfg.get("timeout_s") is not None else None
+    except Exception:
+        return None
+    return ConfirmPolicy(attempts=attempts, failures=failures, interval_s=interval_s, timeout_s=timeout_s)
+
+
+def _health(service: BaseService) -> Tuple[bool, str, Dict[str, Any]]:
+    try:
+        return service.check_health()
+    except Exception as e:
+        return False, f"check_exception: {type(e).__name__}: {e}", {"exception": str(e), "type": type(e).__name__}
+
+
+def _attempt_summary(ok: bool, msg: str, detail: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    detail = detail or {}
+    out: Dict[str, Any] = {"ok": bool(ok)}
+    for key in ("reason", "status_code", "elapsed_ms"):
+        if detail.get(key) is not None:
+            out[key] = detail[key]
+    if not ok and msg:
+        out["message"] = str(msg)[:120]
+    return out
+
+
+def _fresh_window_s(config: Dict[str, Any]) -> float:
+    try:
+        return max(float(config.get("check_fresh_s") or 0), 0.0)
+    except Exception:
+        return 0.0
+
+
+def _no_step(name: str) -> None:
+    return None
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+POOL_FAST = "fast"
+POOL_HEAVY = "heavy"
+POOL_OPS = "ops"
+
+POOL_SIZES_DEFAULT = {POOL_FAST: 10, POOL_HEAVY: 2, POOL_OPS: 4}
+POOL_ENV = {POOL_FAST: "HBM_POOL_FAST", POOL_HEAVY: "HBM_POOL_HEAVY", POOL_OPS: "HBM_POOL_OPS"}
+WAIT_SAMPLES_MAX = 1000
+HEAVY_TIMEOUT_S = 30.0
+HEAVY_PLUGINS = ("mineru",)
+
+
+_local = threading.local()
+
+
+def current_pool() -> Optional[str]:
+    """当前线程所属的线程池名称（fast/heavy/ops）；不在 ProbePool 工作线程中时返回 None。"""
+    return getattr(_local, "pool", None)
+
+
+def bind_pool(name: Optional[str]) -> None:
+    """把当前线程标记为属于 name 线程池；用作外部线程池（如 APScheduler 执行器）的 initializer。"""
+    _local.pool = name
+
+
+class ProbePool:
+    """
+    带统计的线程池：记录排队数、执行中数量与排队等待时间（提交到开始执行）。
+
+    用于把慢探测（文件上传、GPU 推理）、运维动作（SSH 启停）与轻量 /health 探测隔离，互不占用工作线程。
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = str(name)
+        self.workers = max(int(workers), 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"pool-{self.name}")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES_MAX)
+        self._wait_max = 0.0
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            self._queued += 1
+        return self._executor.submit(self._call, time.monotonic(), func, args)
+
+    def _call(self, submitted: float, func: Callable[..., Any], args: tuple) -> Any:
+        wait = time.monotonic() - submitted
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._waits.append(wait)
+            self._wait_max = max(self._wait_max, wait)
+        _local.pool = self.name
+        try:
+            return func(*args)
+        finally:
+            _local.pool = None
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "wait_ms_avg": round(sum(waits) / len(waits) * 1000.0, 1) if waits else None,
+                "wait_ms_p95": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)] * 1000.0, 1) if waits else None,
+                "wait_ms_max": round(self._wait_max * 1000.0, 1),
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+class ProbePools:
+    """按探测类别（fast/heavy/ops）划分的线程池集合；未知类别归入 fast。"""
+
+    def __init__(self, sizes: Optional[Dict[str, int]] = None):
+        sizes = dict(POOL_SIZES_DEFAULT, **(sizes or {}))
+        self._pools: Dict[str, ProbePool] = {name: ProbePool(name, n) for name, n in sizes.items()}
+
+    def get(self, name: Optional[str]) -> ProbePool:
+        return self._pools.get(str(name or "")) or self._pools[POOL_FAST]
+
+    def submit(self, name: Optional[str], func: Callable[..., Any], *args: Any) -> Future:
+        return self.get(name).submit(func, *args)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [p.stats() for p in self._pools.values()]
+
+    def shutdown(self, wait: bool = False) -> None:
+        for p in self._pools.values():
+            p.shutdown(wait=wait)
+
+
+def probe_class(config: Dict[str, Any]) -> str:
+    """
+    服务的探测类别：YAML probe_class（fast/heavy）优先；
+    否则文件上传探测、mineru 等插件或 timeout_s 超过 30 秒的服务归为 heavy，其余为 fast。
+    启用 probe_tiers 的服务定时检测只做轻量探测，归为 fast；需要功能探测时按 functional_probe_class 转交。
+    """
+    explicit = str(config.get("probe_class") or "").strip().lower()
+    if explicit in (POOL_FAST, POOL_HEAVY):
+        return explicit
+    if config.get("probe_tiers"):
+        return POOL_FAST
+    return functional_probe_class(config)
+
+
+def functional_probe_class(config: Dict[str, Any]) -> str:
+    """服务完整功能探测（check_health）本身的类别，不考虑 probe_tiers；规则同 probe_class。"""
+    explicit = str(config.get("probe_class") or "").strip().lower()
+    if explicit in (POOL_FAST, POOL_HEAVY):
+        return explicit
+    if str(config.get("plugin") or "").strip().lower() in HEAVY_PLUGINS:
+        return POOL_HEAVY
+    if str(config.get("test_file") or "").strip():
+        return POOL_HEAVY
+    try:
+        if float(config.get("timeout_s") or 0) > HEAVY_TIMEOUT_S:
+            return POOL_HEAVY
+    except Exception:
+        pass
+    return POOL_FAST
+
+
+_pools: Optional[ProbePools] = None
+_pools_lock = threading.Lock()
+
+
+def get_probe_pools() -> ProbePools:
+    global _pools
+    with _pools_lock:
+        if _pools is None:
+            _pools = ProbePools({name: _env_int(env, POOL_SIZES_DEFAULT[name]) for name, env in POOL_ENV.items()})
+        return _pools
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not str(raw).strip():
+        return int(default)
+    try:
+        return int(str(raw).strip())
+    except Exception:
+        return int(default)
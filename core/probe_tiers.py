@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import socket
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+from core.check_schedule import interval_seconds, parse_check_schedule
+from core.expected_matcher import ResponseBody, match_expected, max_body_bytes
+from core.http_client import probe_request
+from core.probe_timing import timings_detail
+
+
+CHEAP_TIMEOUT_DEFAULT_S = 3.0
+FUNCTIONAL_FACTOR_DEFAULT = 10
+FUNCTIONAL_MIN_S = 60
+FUNCTIONAL_FALLBACK_S = 1800
+LATENCY_FACTOR_DEFAULT = 3.0
+BASELINE_SAMPLES = 20
+BASELINE_MIN_SAMPLES = 5
+
+
+@dataclass(frozen=True)
+class CheapProbe:
+    """轻量探测：kind=tcp 时只建 TCP 连接；kind=http 时 GET url，按 expected（默认 2xx）判定。"""
+
+    kind: str
+    host: str = ""
+    port: int = 0
+    url: str = ""
+    expected: Any = None
+    timeout_s: float = CHEAP_TIMEOUT_DEFAULT_S
+
+    @property
+    def label(self) -> str:
+        return f"tcp://{self.host}:{self.port}" if self.kind == "tcp" else self.url
+
+
+@dataclass(frozen=True)
+class TierPolicy:
+    cheap: CheapProbe
+    functional_s: int
+    latency_factor: float
+    latency_ms: Optional[float]
+
+
+def parse_tier_policy(config: Dict[str, Any]) -> Optional[TierPolicy]:
+    """
+    解析 probe_tiers（分级探测）。写 true 用默认值，或写成字典：
+    - cheap：轻量探测，"tcp"（默认，连接 test_api 的主机端口）、"http"（GET test_api），
+      或 {tcp: "host:port"} / {url: "..."} / {path: "/health"}（相对 test_api 的主机），可带 expected_response、timeout_s
+    - functional_interval：完整功能探测（服务自身的 check_health）的间隔，默认 check_schedule 间隔的 10 倍（至少 60s）
+    - latency_factor / latency_ms：轻量探测耗时超过近期中位数的倍数或绝对毫秒数时，视为变慢并立即做功能探测
+    未启用或无法确定轻量探测目标时返回 None。
+    """
+    raw = config.get("probe_tiers")
+    if not raw:
+        return None
+    cfg: Dict[str, Any] = raw if isinstance(raw, dict) else {}
+    cheap = _parse_cheap(cfg.get("cheap") or "tcp", str(config.get("test_api") or "").strip())
+    if cheap is None:
+        return None
+    base_s = interval_seconds(parse_check_schedule(config.get("check_schedule")))
+    functional_s = interval_seconds(parse_check_schedule(cfg.get("functional_interval"))) if cfg.get("functional_interval") else None
+    if not functional_s:
+        functional_s = max(base_s * FUNCTIONAL_FACTOR_DEFAULT, FUNCTIONAL_MIN_S) if base_s else FUNCTIONAL_FALLBACK_S
+    try:
+        latency_factor = max(float(cfg.get("latency_factor") or LATENCY_FACTOR_DEFAULT), 1.0)
+        latency_ms = float(cfg["latency_ms"]) if cfg.get("latency_ms") is not None else None
+    except Exception:
+        latency_factor, latency_ms = LATENCY_FACTOR_DEFAULT, None
+    return TierPolicy(cheap=cheap, functional_s=int(functional_s), latency_factor=latency_factor, latency_ms=latency_ms)
+
+
+def _parse_cheap(raw: Any, test_api: str) -> Optional[CheapProbe]:
+    item: Dict[str, Any] = raw if isinstance(raw, dict) else {str(raw).strip().lower(): True}
+    try:
+        timeout_s = min(max(float(item.get("timeout_s") or CHEAP_TIMEOUT_DEFAULT_S), 0.1), 60.0)
+    except Exception:
+        timeout_s = CHEAP_TIMEOUT_DEFAULT_S
+    parts = urlsplit(test_api)
+    if item.get("url") or item.get("path") or item.get("http"):
+        url = str(item.get("url") or "").strip()
+        if not url and parts.netloc:
+            path = str(item.get("path") or "").strip()
+            url = urlunsplit((parts.scheme, parts.netloc, path, "", "")) if path else test_api
+        if not url:
+            return None
+        return CheapProbe("http", url=url, expected=item.get("expected_response"), timeout_s=timeout_s)
+    if isinstance(item.get("tcp"), str):
+        host, _, port = item["tcp"].rpartition(":")
+        host = host.strip("[]")
+    else:
+        host, port = parts.hostname or "", str(parts.port or {"https": 443, "http": 80}.get(parts.scheme, ""))
+    try:
+        return CheapProbe("tcp", host=host, port=int(port), timeout_s=timeout_s) if host else None
+    except Exception:
+        return None
+
+
+def run_cheap(config: Dict[str, Any], cheap: CheapProbe) -> Tuple[bool, str, Dict[str, Any]]:
+    """执行轻量探测，返回与 check_health 相同形式的 (ok, message, detail)。"""
+    start = time.perf_counter()
+    if cheap.kind == "tcp":
+        try:
+            with socket.create_connection((cheap.host, cheap.port), timeout=cheap.timeout_s):
+                ok, msg = True, ""
+        except socket.timeout:
+            ok, msg = False, "Timeout"
+        except OSError as e:
+            ok, msg = False, str(e) or type(e).__name__
+        detail: Dict[str, Any] = {"ok": ok, "target": cheap.label, "elapsed_ms": int((time.perf_counter() - start) * 1000)}
+        if not ok:
+            detail["reason"] = "timeout" if msg == "Timeout" else "connect_failed"
+        return ok, msg, detail
+    try:
+        r = probe_request(config, "GET", cheap.url, timeout=cheap.timeout_s, stream=True)
+        with ResponseBody(r, max_body_bytes(config), cheap.timeout_s) as body:
+            ok, reason = match_expected(body, cheap.expected)
+            detail = {
+                "ok": ok,
+                "target": cheap.label,
+                "status_code": r.status_code,
+                "elapsed_ms": int((time.perf_counter() - start) * 1000),
+                "response_excerpt": body.excerpt(200),
+            }
+        detail.update(timings_detail(r))
+        return ok, reason, detail
+    except requests.exceptions.Timeout as e:
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return False, "Timeout", {"ok": False, "target": cheap.label, "reason": "timeout", "elapsed_ms": elapsed_ms, **timings_detail(e)}
+    except Exception as e:
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        return False, str(e), {"ok": False, "target": cheap.label, "exception": str(e), "elapsed_ms": elapsed_ms, **timings_detail(e)}
+
+
+def functional_trigger(policy: TierPolicy, state: Dict[str, Any], now: float) -> Optional[str]:
+    """本次是否直接做功能探测：从未做过、上次失败或已到间隔时返回原因，否则返回 None（先做轻量探测）。"""
+    last_ts = state.get("last_functional_ts")
+    if last_ts is None:
+        return "first"
+    if not state.get("last_functional_ok", False):
+        return "recovering"
+    if now - float(last_ts) >= policy.functional_s:
+        return "scheduled"
+    return None
+
+
+def latency_degraded(policy: TierPolicy, state: Dict[str, Any], elapsed_ms: float) -> bool:
+    """轻量探测是否明显变慢：超过 latency_ms，或（样本足够时）超过近期中位数的 latency_factor 倍。"""
+    if policy.latency_ms is not None and elapsed_ms > policy.latency_ms:
+        return True
+    samples: List[float] = sorted(state.get("cheap_ms") or [])
+    if len(samples) < BASELINE_MIN_SAMPLES:
+        return False
+    median = samples[len(samples) // 2]
+    # 基线只有几毫秒时，几毫秒的抖动不算变慢
+    return elapsed_ms > max(median * policy.latency_factor, median + 5.0)
+
+
+def record_cheap_latency(state: Dict[str, Any], elapsed_ms: float) -> None:
+    samples = list(state.get("cheap_ms") or [])
+    samples.append(int(elapsed_ms))
+    state["cheap_ms"] = samples[-BASELINE_SAMPLES:]
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+PHASES = ("dns", "connect", "tls", "send", "ttfb", "transfer")
+STATS_WINDOW = 100
+
+
+class PhaseTimer:
+    """
+    单次 HTTP 探测的分阶段耗时（毫秒，同一阶段多次发生时累加，如跟随重定向）：
+    - dns / connect / tls：域名解析、TCP 建连、TLS 握手；复用长连接时没有这三项
+    - send：发送请求（含请求体，文件上传时主要耗在这里）
+    - ttfb：请求发送完到收到响应头，即服务端处理时间
+    - transfer：收到响应头到读完（或停止读取）响应体
+    track_connections=False 时（连接未计时，如 urllib3 1.x）不输出 reused。
+    """
+
+    def __init__(self, track_connections: bool = True) -> None:
+        self.started = time.perf_counter()
+        self.ended: Optional[float] = None
+        self.ms: Dict[str, float] = {}
+        self.connections = 0
+        self.track_connections = bool(track_connections)
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.ms[phase] = self.ms.get(phase, 0.0) + max(seconds, 0.0) * 1000.0
+
+    def connect_ms(self) -> float:
+        return self.ms.get("dns", 0.0) + self.ms.get("connect", 0.0) + self.ms.get("tls", 0.0)
+
+    def finish(self) -> None:
+        if self.ended is None:
+            self.ended = time.perf_counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {f"{p}_ms": round(self.ms[p], 1) for p in PHASES if p in self.ms}
+        out["total_ms"] = round(((self.ended or time.perf_counter()) - self.started) * 1000.0, 1)
+        if self.track_connections:
+            out["reused"] = self.connections == 0
+        return out
+
+
+_local = threading.local()
+
+
+def current_timer() -> Optional[PhaseTimer]:
+    """当前线程正在进行的探测计时（由 probe_request 设置），没有时返回 None。"""
+    return getattr(_local, "timer", None)
+
+
+def bind_timer(timer: Optional[PhaseTimer]) -> Optional[PhaseTimer]:
+    prev = current_timer()
+    _local.timer = timer
+    return prev
+
+
+def timings_detail(obj: Any) -> Dict[str, Any]:
+    """从响应或异常上取出分阶段耗时，返回可直接并入 detail 的 {"timings": {...}}；没有时返回空字典。"""
+    timer = getattr(obj, "probe_timings", None)
+    if not isinstance(timer, PhaseTimer):
+        return {}
+    timer.finish()
+    return {"timings": timer.as_dict()}
+
+
+class PhaseStats:
+    """每个服务最近 window 次 HTTP 探测的分阶段耗时统计（平均、p95、最大），供 get_info 展示。"""
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: Deque[Dict[str, Any]] = deque(maxlen=max(int(window), 1))
+
+    def add(self, timings: Dict[str, Any]) -> None:
+        with self._lock:
+            self._samples.append(dict(timings))
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return None
+        tracked = [s for s in samples if "reused" in s]
+        out: Dict[str, Any] = {
+            "samples": len(samples),
+            "reused_pct": round(sum(1 for s in tracked if s["reused"]) * 100.0 / len(tracked), 1) if tracked else None,
+        }
+        for key in [f"{p}_ms" for p in PHASES] + ["total_ms"]:
+            values = sorted(float(s[key]) for s in samples if isinstance(s.get(key), (int, float)))
+            if not values:
+                continue
+            out[key] = {
+                "n": len(values),
+                "avg": round(sum(values) / len(values), 1),
+                "p95": round(values[min(int(len(values) * 0.95), len(values) - 1)], 1),
+                "max": round(values[-1], 1),
+            }
+        return out
@@ -0,0 +1,652 @@
+from __future__ import annotations
+
+import bisect
+import calendar
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+SEGMENT_SECONDS_DEFAULT = 3600
+INDEX_SUFFIX = ".idx"
+LEGACY_SEGMENT_KEY = -1
+
+_INDEX_VERSION = 1
+_INDEX_CACHE_SIZE = 48
+_SEALED_GRACE_S = 120
+_SEGMENT_TIME_FMT = "%Y%m%d-%H%M"
+_REVERSE_BLOCK_SIZE = 64 * 1024
+_OPEN_HANDLES_MAX = 2
+
+
+@dataclass(frozen=True)
+class _Segment:
+    key: int
+    path: str
+
+
+@dataclass
+class _SegmentSummary:
+    size: int
+    count: int
+    min_ts: int
+    max_ts: int
+    services: Dict[str, int] = field(default_factory=dict)
+
+
+class _SegmentIndex:
+    """
+    单个分段文件的偏移索引。
+
+    offsets/ts 按写入顺序保存每条记录的字节偏移与时间戳；
+    positions 按 service_id 记录其在 offsets 中的下标，用于按服务直接定位记录。
+    """
+
+    __slots__ = ("size", "offsets", "ts", "positions", "min_ts", "max_ts")
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.offsets = array("q")
+        self.ts = array("q")
+        self.positions: Dict[str, array] = {}
+        self.min_ts = 0
+        self.max_ts = 0
+
+    def scan(self, path: str) -> None:
+        """从 self.size 开始增量扫描，只收录以换行结尾的完整记录。"""
+        with open(path, "rb") as f:
+            f.seek(self.size)
+            pos = self.size
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                offset = pos
+                pos += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    continue
+                if not isinstance(rec, dict):
+                    continue
+                self._add(offset, record_ts_epoch(rec), str(rec.get("service_id") or ""))
+            self.size = pos
+
+    def _add(self, offset: int, ts_epoch: int, service_id: str) -> None:
+        if not self.offsets:
+            self.min_ts = self.max_ts = ts_epoch
+        else:
+            self.min_ts = min(self.min_ts, ts_epoch)
+            self.max_ts = max(self.max_ts, ts_epoch)
+        self.positions.setdefault(service_id, array("l")).append(len(self.offsets))
+        self.offsets.append(offset)
+        self.ts.append(ts_epoch)
+
+    def summary(self) -> _SegmentSummary:
+        return _SegmentSummary(
+            size=self.size,
+            count=len(self.offsets),
+            min_ts=self.min_ts,
+            max_ts=self.max_ts,
+            services={sid: len(p) for sid, p in self.positions.items()},
+        )
+
+    def iter_positions(
+        self,
+        service_ids: Optional[Set[str]],
+        cutoff: int,
+        descending: bool = True,
+        below: Optional[int] = None,
+        above: Optional[int] = None,
+    ) -> Iterator[int]:
+        """
+        遍历匹配记录的下标，默认按“新→旧”（写入顺序倒序）。
+
+        below/above 为字节偏移的开区间边界，用于游标分页从某条记录之后/之前继续。
+        """
+        lo = 0 if above is None else bisect.bisect_right(self.offsets, int(above))
+        hi = len(self.offsets) if below is None else bisect.bisect_left(self.offsets, int(below))
+        if lo >= hi:
+            return iter(())
+        if service_ids is None:
+            it: Iterable[int] = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+        else:
+            lists = []
+            for sid in service_ids:
+                p = self.positions.get(sid)
+                if not p:
+                    continue
+                if lo > 0 or hi < len(self.offsets):
+                    p = p[bisect.bisect_left(p, lo) : bisect.bisect_left(p, hi)]
+                if p:
+                    lists.append(p)
+            if not lists:
+                return iter(())
+            if len(lists) == 1:
+                it = reversed(lists[0]) if descending else iter(lists[0])
+            elif descending:
+                it = heapq.merge(*[reversed(p) for p in lists], reverse=True)
+            else:
+                it = heapq.merge(*lists)
+        if self.min_ts >= cutoff:
+            return iter(it)
+        ts = self.ts
+        return (p for p in it if ts[p] >= cutoff)
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "offsets": self.offsets.tolist(),
+            "ts": self.ts.tolist(),
+            "positions": {sid: p.tolist() for sid, p in self.positions.items()},
+        }
+
+    @classmethod
+    def load(cls, size: int, summary: _SegmentSummary, data: Dict[str, Any]) -> "_SegmentIndex":
+        idx = cls()
+        idx.size = int(size)
+        idx.offsets = array("q", [int(x) for x in data.get("offsets") or []])
+        idx.ts = array("q", [int(x) for x in data.get("ts") or []])
+        idx.positions = {str(sid): array("l", [int(x) for x in p]) for sid, p in (data.get("positions") or {}).items()}
+        idx.min_ts = int(summary.min_ts)
+        idx.max_ts = int(summary.max_ts)
+        if len(idx.offsets) != len(idx.ts):
+            raise ValueError("corrupted segment index")
+        return idx
+
+
+class SegmentStore:
+    """
+    按时间分段的 JSON Lines 日志存储。
+
+    - 记录按自身 ts_epoch 落到 <root_dir>/<prefix>-YYYYMMDD-HHMM.jsonl（UTC 分段起点）。
+    - 每个分段旁边有一个 .idx 索引文件：第一行是摘要（条数、min/max ts_epoch、各服务条数），
+      第二行是偏移索引（service_id → 字节偏移）。分页查询只读取摘要并按偏移 seek 需要的记录。
+    - 索引只是缓存，以分段文件为准：文件比索引长时增量补扫，索引缺失或不一致时重建。
+    - legacy_path 为旧版单文件日志，作为最旧的一个分段只读参与查询，整体过期后删除。
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        prefix: str,
+        legacy_path: Optional[str] = None,
+        segment_seconds: int = SEGMENT_SECONDS_DEFAULT,
+    ):
+        self.root_dir = root_dir
+        self.prefix = prefix
+        self.legacy_path = legacy_path
+        self.segment_seconds = max(int(segment_seconds), 60)
+        self._lock = threading.RLock()
+        self._summaries: Dict[str, _SegmentSummary] = {}
+        self._indexes: "OrderedDict[str, _SegmentIndex]" = OrderedDict()
+        self._write_lock = threading.Lock()
+        self._handles: "OrderedDict[str, Any]" = OrderedDict()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.write_batch([record])
+        self.flush()
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        """按分段分组，每个分段一次 write；最近使用的分段句柄保持打开。"""
+        grouped: Dict[str, List[str]] = {}
+        for record in records:
+            path = self.segment_path_for(record_ts_epoch(record))
+            grouped.setdefault(path, []).append(json.dumps(record, ensure_ascii=False) + "\n")
+        with self._write_lock:
+            for path, lines in grouped.items():
+                self._handle(path).write("".join(lines))
+
+    def flush(self, fsync: bool = False) -> None:
+        with self._write_lock:
+            for fh in self._handles.values():
+                fh.flush()
+                if fsync:
+                    os.fsync(fh.fileno())
+
+    def close(self) -> None:
+        with self._write_lock:
+            while self._handles:
+                _, fh = self._handles.popitem(last=False)
+                try:
+                    fh.close()
+                except Exception:
+                    pass
+
+    def _handle(self, path: str):
+        fh = self._handles.get(path)
+        if fh is not None:
+            self._handles.move_to_end(path)
+            return fh
+        os.makedirs(self.root_dir, exist_ok=True)
+        fh = open(path, "a", encoding="utf-8")
+        self._handles[path] = fh
+        while len(self._handles) > _OPEN_HANDLES_MAX:
+            _, old = self._handles.popitem(last=False)
+            try:
+                old.close()
+            except Exception:
+                pass
+        return fh
+
+    def segment_path_for(self, ts_epoch: int) -> str:
+        return self._segment_path(int(ts_epoch) // self.segment_seconds)
+
+    def query(
+        self,
+        service_ids: Optional[Iterable[str]] = None,
+        cutoff: int = 0,
+        offset: int = 0,
+        limit: Optional[int] = 50,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        按“新→旧”分页查询。
+
+        service_ids=None 表示不过滤服务；total 由各分段摘要累加，只有跨越 cutoff 的分段需要逐条判断。
+        """
+        sids = None if service_ids is None else {str(x) for x in service_ids}
+        skip = max(int(offset), 0)
+        want = None if limit is None else max(int(limit), 0)
+        picks: List[Tuple[_Segment, List[int]]] = []
+        total = 0
+        with self._lock:
+            for seg in self._list_segments():
+                summary = self._summary(seg)
+                if summary is None or summary.count == 0 or summary.max_ts < cutoff:
+                    continue
+                if sids is not None and not any(summary.services.get(sid) for sid in sids):
+                    continue
+                if summary.min_ts >= cutoff:
+                    if sids is None:
+                        n = summary.count
+                    else:
+                        n = sum(summary.services.get(sid, 0) for sid in sids)
+                    idx = None
+                else:
+                    idx = self._index(seg)
+                    n = sum(1 for _ in idx.iter_positions(sids, cutoff))
+                total += n
+                if want is not None and sum(len(p) for _, p in picks) >= want:
+                    continue
+                if skip >= n:
+                    skip -= n
+                    continue
+                if idx is None:
+                    idx = self._index(seg)
+                room = None if want is None else want - sum(len(p) for _, p in picks)
+                stop = None if room is None else skip + room
+                chosen = [idx.offsets[p] for p in itertools.islice(idx.iter_positions(sids, cutoff), skip, stop)]
+                skip = 0
+                if chosen:
+                    picks.append((seg, chosen))
+        items: List[Dict[str, Any]] = []
+        for seg, offsets in picks:
+            items.extend(self._read_at(seg, offsets))
+        return items, total
+
+    def page(
+        self,
+        service_ids: Optional[Iterable[str]] = None,
+        cutoff: int = 0,
+        limit: int = 50,
+        before: Optional[Tuple[int, int]] = None,
+        after: Optional[Tuple[int, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        游标分页：before=(ts_epoch, seq) 取更旧的一页，after=(ts_epoch, seq) 取更新的一页；结果始终按“新→旧”返回。
+
+        seq 为记录在所属分段内的字节偏移（旧版单文件日志记为 -(偏移+1)），
+        分段由 ts_epoch 直接算出，因此只需打开游标所在及相邻的分段，开销与翻页深度无关。
+        """
+        sids = None if service_ids is None else {str(x) for x in service_ids}
+        limit = max(int(limit), 0)
+        picks: List[Tuple[_Segment, List[int]]] = []
+        if limit <= 0:
+            return []
+        cursor = before if before is not None else after
+        ckey, coff = self._cursor_position(cursor) if cursor is not None else (None, None)
+        newer_first = after is None
+        with self._lock:
+            segments = self._list_segments()
+            if not newer_first:
+                segments.reverse()
+            got = 0
+            for seg in segments:
+                if ckey is not None and (seg.key > ckey if newer_first else seg.key < ckey):
+                    continue
+                summary = self._summary(seg)
+                if summary is None or summary.count == 0 or summary.max_ts < cutoff:
+                    continue
+                if sids is not None and not any(summary.services.get(sid) for sid in sids):
+                    continue
+                idx = self._index(seg)
+                bound = coff if seg.key == ckey else None
+                it = idx.iter_positions(
+                    sids,
+                    cutoff,
+                    descending=newer_first,
+                    below=bound if newer_first else None,
+                    above=None if newer_first else bound,
+                )
+                chosen = [idx.offsets[p] for p in itertools.islice(it, limit - got)]
+                if chosen:
+                    picks.append((seg, chosen))
+                    got += len(chosen)
+                if got >= limit:
+                    break
+        items: List[Dict[str, Any]] = []
+        for seg, offsets in picks:
+            items.extend(self._read_at(seg, offsets))
+        if not newer_first:
+            items.reverse()
+        return items
+
+    def approx_count(self, service_ids: Optional[Iterable[str]] = None, cutoff: int = 0) -> int:
+        """按分段摘要估算条数：跨越 cutoff 的分段整段计入，不逐条判断。"""
+        sids = None if service_ids is None else {str(x) for x in service_ids}
+        total = 0
+        with self._lock:
+            for seg in self._list_segments():
+                summary = self._summary(seg)
+                if summary is None or summary.max_ts < cutoff:
+                    continue
+                if sids is None:
+                    total += summary.count
+                else:
+                    total += sum(summary.services.get(sid, 0) for sid in sids)
+        return total
+
+    def tail(
+        self,
+        limit: int,
+        cutoff: int = 0,
+        service_ids: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        取最新 limit 条记录：从最新分段末尾按块倒读，凑够即停，开销与返回条数成正比而不是与文件大小成正比。
+        """
+        sids = None if service_ids is None else {str(x) for x in service_ids}
+        out: List[Dict[str, Any]] = []
+        if int(limit) <= 0:
+            return out
+        with self._lock:
+            segments = self._list_segments()
+        for seg in segments:
+            if seg.key != LEGACY_SEGMENT_KEY and (seg.key + 1) * self.segment_seconds <= cutoff:
+                break
+            for off, rec in iter_jsonl_reverse(seg.path):
+                if record_ts_epoch(rec) < cutoff:
+                    if seg.key == LEGACY_SEGMENT_KEY:
+                        return out
+                    continue
+                if sids is not None and str(rec.get("service_id") or "") not in sids:
+                    continue
+                rec["seq"] = _seq_for(seg, off)
+                out.append(normalize_record(rec))
+                if len(out) >= int(limit):
+                    return out
+        return out
+
+    def prune(self, cutoff: int) -> int:
+        """删除整体早于 cutoff 的分段（连同索引），不重写任何仍在保留期内的记录。返回删除的分段数。"""
+        removed = 0
+        with self._lock:
+            for seg in self._list_segments():
+                if seg.key == LEGACY_SEGMENT_KEY:
+                    summary = self._summary(seg)
+                    expired = summary is not None and summary.max_ts < cutoff
+                else:
+                    expired = (seg.key + 1) * self.segment_seconds <= cutoff
+                if not expired:
+                    continue
+                self._close_handle(seg.path)
+                for path in (seg.path, seg.path + INDEX_SUFFIX):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                self._forget(seg.path)
+                removed += 1
+        return removed
+
+    def _close_handle(self, path: str) -> None:
+        with self._write_lock:
+            fh = self._handles.pop(path, None)
+        if fh is not None:
+            try:
+                fh.close()
+            except Exception:
+                pass
+
+    def _segment_path(self, key: int) -> str:
+        start = int(key) * self.segment_seconds
+        name = f"{self.prefix}-{time.strftime(_SEGMENT_TIME_FMT, time.gmtime(start))}.jsonl"
+        return os.path.join(self.root_dir, name)
+
+    def _parse_segment_key(self, name: str) -> Optional[int]:
+        head = self.prefix + "-"
+        if not name.startswith(head) or not name.endswith(".jsonl"):
+            return None
+        stamp = name[len(head) : -len(".jsonl")]
+        try:
+            start = calendar.timegm(time.strptime(stamp, _SEGMENT_TIME_FMT))
+        except Exception:
+            return None
+        return int(start) // self.segment_seconds
+
+    def _list_segments(self) -> List[_Segment]:
+        """返回所有分段，按“新→旧”排序；旧版单文件日志排在最后。"""
+        segments: List[_Segment] = []
+        try:
+            names = os.listdir(self.root_dir)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            key = self._parse_segment_key(name)
+            if key is not None:
+                segments.append(_Segment(key, os.path.join(self.root_dir, name)))
+        segments.sort(key=lambda s: s.key, reverse=True)
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            segments.append(_Segment(LEGACY_SEGMENT_KEY, self.legacy_path))
+        return segments
+
+    def _is_sealed(self, seg: _Segment) -> bool:
+        if seg.key == LEGACY_SEGMENT_KEY:
+            return True
+        return (seg.key + 1) * self.segment_seconds + _SEALED_GRACE_S <= int(time.time())
+
+    def _summary(self, seg: _Segment) -> Optional[_SegmentSummary]:
+        try:
+            size = os.path.getsize(seg.path)
+        except OSError:
+            self._forget(seg.path)
+            return None
+        cached = self._summaries.get(seg.path)
+        if cached is not None and cached.size == size:
+            return cached
+        if cached is None and self._is_sealed(seg):
+            sidecar = self._read_sidecar(seg.path, summary_only=True)
+            if sidecar is not None and sidecar[0].size == size:
+                self._summaries[seg.path] = sidecar[0]
+                return sidecar[0]
+        summary = self._index(seg, size=size).summary()
+        self._summaries[seg.path] = summary
+        return summary
+
+    def _index(self, seg: _Segment, size: Optional[int] = None) -> _SegmentIndex:
+        if size is None:
+            size = os.path.getsize(seg.path)
+        idx = self._indexes.get(seg.path)
+        if idx is not None:
+            self._indexes.move_to_end(seg.path)
+            if idx.size == size:
+                return idx
+            if idx.size > size:
+                idx = None
+        if idx is None and self._is_sealed(seg):
+            sidecar = self._read_sidecar(seg.path, summary_only=False)
+            if sidecar is not None and sidecar[0].size == size and sidecar[1] is not None:
+                idx = sidecar[1]
+        if idx is None:
+            idx = _SegmentIndex()
+        if idx.size < size:
+            idx.scan(seg.path)
+            if self._is_sealed(seg):
+                self._write_sidecar(seg.path, idx)
+        self._indexes[seg.path] = idx
+        self._indexes.move_to_end(seg.path)
+        while len(self._indexes) > _INDEX_CACHE_SIZE:
+            self._indexes.popitem(last=False)
+        return idx
+
+    def _forget(self, path: str) -> None:
+        self._summaries.pop(path, None)
+        self._indexes.pop(path, None)
+
+    def _read_sidecar(self, path: str, summary_only: bool) -> Optional[Tuple[_SegmentSummary, Optional[_SegmentIndex]]]:
+        try:
+            with open(path + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+                head = json.loads(f.readline() or "{}")
+                if int(head.get("v") or 0) != _INDEX_VERSION:
+                    return None
+                summary = _SegmentSummary(
+                    size=int(head.get("size") or 0),
+                    count=int(head.get("count") or 0),
+                    min_ts=int(head.get("min_ts") or 0),
+                    max_ts=int(head.get("max_ts") or 0),
+                    services={str(k): int(v) for k, v in (head.get("services") or {}).items()},
+                )
+                if summary_only:
+                    return summary, None
+                idx = _SegmentIndex.load(summary.size, summary, json.loads(f.readline() or "{}"))
+                return summary, idx
+        except Exception:
+            return None
+
+    def _write_sidecar(self, path: str, idx: _SegmentIndex) -> None:
+        summary = idx.summary()
+        head = {
+            "v": _INDEX_VERSION,
+            "size": summary.size,
+            "count": summary.count,
+            "min_ts": summary.min_ts,
+            "max_ts": summary.max_ts,
+            "services": summary.services,
+        }
+        tmp = path + INDEX_SUFFIX + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(head, ensure_ascii=False) + "\n")
+                f.write(json.dumps(idx.dump(), ensure_ascii=False) + "\n")
+            os.replace(tmp, path + INDEX_SUFFIX)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except Exception:
+                pass
+
+    def _cursor_position(self, cursor: Tuple[int, int]) -> Tuple[int, int]:
+        ts_epoch, seq = int(cursor[0]), int(cursor[1])
+        if seq < 0:
+            return LEGACY_SEGMENT_KEY, -seq - 1
+        return ts_epoch // self.segment_seconds, seq
+
+    def _read_at(self, seg: _Segment, offsets: List[int]) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        try:
+            f = open(seg.path, "rb")
+        except OSError:
+            return out
+        with f:
+            for off in offsets:
+                f.seek(off)
+                try:
+                    rec = json.loads(f.readline())
+                except Exception:
+                    continue
+                if isinstance(rec, dict):
+                    rec["seq"] = _seq_for(seg, off)
+                    out.append(normalize_record(rec))
+        return out
+
+
+def _seq_for(seg: _Segment, offset: int) -> int:
+    return -(int(offset) + 1) if seg.key == LEGACY_SEGMENT_KEY else int(offset)
+
+
+def iter_jsonl_reverse(path: str, block_size: int = _REVERSE_BLOCK_SIZE) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    从文件末尾按块倒序读取 JSON Lines，逐条产出 (字节偏移, 记录)。
+
+    末尾未写完（无换行）或无法解析的行会被跳过。
+    """
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return
+    with f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        carry = b""
+        while pos > 0:
+            step = min(int(block_size), pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + carry
+            lines = buf.split(b"\n")
+            carry = lines[0]
+            end = pos + len(buf)
+            for raw in reversed(lines[1:]):
+                start = end - len(raw)
+                end = start - 1
+                rec = _decode_line(raw)
+                if rec is not None:
+                    yield start, rec
+        rec = _decode_line(carry)
+        if rec is not None:
+            yield 0, rec
+
+
+def _decode_line(raw: bytes) -> Optional[Dict[str, Any]]:
+    raw = raw.strip()
+    if not raw:
+        return None
+    try:
+        rec = json.loads(raw)
+    except Exception:
+        return None
+    return rec if isinstance(rec, dict) else None
+
+
+def normalize_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    ts_epoch = record_ts_epoch(rec)
+    rec["ts_epoch"] = ts_epoch
+    if not rec.get("ts"):
+        rec["ts"] = datetime.fromtimestamp(ts_epoch).strftime("%Y-%m-%d %H:%M:%S")
+    return rec
+
+
+def record_ts_epoch(rec: Dict[str, Any]) -> int:
+    v = rec.get("ts_epoch")
+    if isinstance(v, int):
+        return v
+    if isinstance(v, float):
+        return int(v)
+    if isinstance(v, str) and v.strip().isdigit():
+        return int(v.strip())
+    ts = rec.get("ts")
+    if isinstance(ts, str) and ts.strip():
+        try:
+            return int(datetime.strptime(ts.strip(), "%Y-%m-%d %H:%M:%S").timestamp())
+        except Exception:
+            return 0
+    return 0
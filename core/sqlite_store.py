@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.segment_store import normalize_record, record_ts_epoch
+
+
+_IN_LIST_MAX = 500
+
+
+class SqliteLogStore:
+    """
+    基于标准库 sqlite3 的日志存储（WAL 模式）。
+
+    - 每种日志一张表：(id, ts_epoch, service_id, level, record)，record 保存完整 JSON。
+    - 索引：(service_id, ts_epoch)、(level, ts_epoch)、(ts_epoch)，按服务查询与过期清理都走索引。
+    - 写入按批一个事务；WAL 允许多个 Web 进程并发读取，同时监控进程写入。
+    - page() 为键集分页（按 (ts_epoch, id) 定位），不依赖 COUNT/OFFSET；query() 保留页码分页语义以兼容旧接口。
+    """
+
+    def __init__(self, db_path: str, table: str):
+        if not table.replace("_", "").isalnum():
+            raise ValueError(f"invalid table name: {table!r}")
+        self.db_path = db_path
+        self.table = table
+        self._local = threading.local()
+        # 每个线程一个连接，按线程登记：close() 时全部关闭（写入线程、Web 请求线程打开的连接也不遗漏），
+        # 新建连接时顺带关闭已退出线程留下的连接（Web 服务每个请求一个线程，不清理会越积越多）
+        self._conns: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._conns_lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.write_batch([record])
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> None:
+        if not records:
+            return
+        rows = [_row(r) for r in records]
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {self.table} (ts_epoch, service_id, level, record) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def flush(self, fsync: bool = False) -> None:
+        if fsync:
+            self._conn().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self) -> None:
+        """关闭所有线程打开的连接；之后仍有调用时按需重新连接。"""
+        with self._conns_lock:
+            conns = list(self._conns.values())
+            self._conns.clear()
+        self._local.conn = None
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def query(
+        self,
+        service_ids: Optional[Iterable[str]] = None,
+        cutoff: int = 0,
+        offset: int = 0,
+        limit: Optional[int] = 50,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        where, params = self._where(service_ids, cutoff)
+        conn = self._conn()
+        total = int(conn.execute(f"SELECT COUNT(*) FROM {self.table} WHERE {where}", params).fetchone()[0])
+        sql = f"SELECT id, record FROM {self.table} WHERE {where} ORDER BY ts_epoch DESC, id DESC LIMIT ? OFFSET ?"
+        rows = conn.execute(sql, [*params, -1 if limit is None else max(int(limit), 0), max(int(offset), 0)]).fetchall()
+        return _decode_rows(rows), total
+
+    def page(
+        self,
+        service_ids: Optional[Iterable[str]] = None,
+        cutoff: int = 0,
+        limit: int = 50,
+        before: Optional[Tuple[int, int]] = None,
+        after: Optional[Tuple[int, int]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        键集分页：before=(ts_epoch, id) 取更旧的一页，after=(ts_epoch, id) 取更新的一页；结果始终按“新→旧”返回。
+        """
+        where, params = self._where(service_ids, cutoff)
+        order = "DESC"
+        if before is not None:
+            where += " AND (ts_epoch < ? OR (ts_epoch = ? AND id < ?))"
+            params += [int(before[0]), int(before[0]), int(before[1])]
+        elif after is not None:
+            where += " AND (ts_epoch > ? OR (ts_epoch = ? AND id > ?))"
+            params += [int(after[0]), int(after[0]), int(after[1])]
+            order = "ASC"
+        sql = f"SELECT id, record FROM {self.table} WHERE {where} ORDER BY ts_epoch {order}, id {order} LIMIT ?"
+        rows = self._conn().execute(sql, [*params, max(int(limit), 0)]).fetchall()
+        if order == "ASC":
+            rows.reverse()
+        return _decode_rows(rows)
+
+    def tail(
+        self,
+        limit: int,
+        cutoff: int = 0,
+        service_ids: Optional[Iterable[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        return self.page(service_ids=service_ids, cutoff=cutoff, limit=limit)
+
+    def approx_count(self, service_ids: Optional[Iterable[str]] = None, cutoff: int = 0) -> int:
+        where, params = self._where(service_ids, cutoff)
+        return int(self._conn().execute(f"SELECT COUNT(*) FROM {self.table} WHERE {where}", params).fetchone()[0])
+
+    def prune(self, cutoff: int) -> int:
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(f"DELETE FROM {self.table} WHERE ts_epoch < ?", [int(cutoff)])
+        return int(cur.rowcount or 0)
+
+    def import_jsonl(self, path: str, batch_size: int = 5000) -> int:
+        """
+        把 JSON Lines 文件导入本表，返回导入条数。
+
+        已导入的位置记录在 _imports 表中：重复执行只会补导文件新增的部分，不会重复插入。
+        """
+        conn = self._conn()
+        key = f"{self.table}:{os.path.abspath(path)}"
+        row = conn.execute("SELECT size FROM _imports WHERE source = ?", [key]).fetchone()
+        start = int(row[0]) if row else 0
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        if size < start:
+            start = 0
+        imported = 0
+        pos = start
+        batch: List[Dict[str, Any]] = []
+        with open(path, "rb") as f:
+            f.seek(start)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                pos += len(raw)
+                try:
+                    rec = json.loads(raw)
+                except Exception:
+                    continue
+                if not isinstance(rec, dict):
+                    continue
+                batch.append(rec)
+                if len(batch) >= batch_size:
+                    imported += self._import_batch(key, batch, pos)
+                    batch = []
+        imported += self._import_batch(key, batch, pos)
+        return imported
+
+    def _import_batch(self, key: str, records: List[Dict[str, Any]], pos: int) -> int:
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {self.table} (ts_epoch, service_id, level, record) VALUES (?, ?, ?, ?)",
+                [_row(r) for r in records],
+            )
+            conn.execute(
+                "INSERT INTO _imports (source, size) VALUES (?, ?) ON CONFLICT(source) DO UPDATE SET size = excluded.size",
+                [key, int(pos)],
+            )
+        return len(records)
+
+    def _where(self, service_ids: Optional[Iterable[str]], cutoff: int) -> Tuple[str, List[Any]]:
+        where = "ts_epoch >= ?"
+        params: List[Any] = [int(cutoff)]
+        if service_ids is None:
+            return where, params
+        sids = sorted({str(x) for x in service_ids})
+        if not sids:
+            return where + " AND 0", params
+        if len(sids) == 1:
+            return where + " AND service_id = ?", params + sids
+        if len(sids) <= _IN_LIST_MAX:
+            return where + f" AND service_id IN ({', '.join('?' for _ in sids)})", params + sids
+        return where + " AND service_id IN (SELECT value FROM json_each(?))", params + [json.dumps(sids, ensure_ascii=False)]
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with self._conns_lock:
+                if self._conns.get(threading.current_thread()) is conn:
+                    return conn
+        parent = os.path.dirname(self.db_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        # 连接只在打开它的线程里使用；check_same_thread=False 仅为了 close() 能从其他线程关闭它
+        conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=10000")
+        self._ensure_schema(conn)
+        self._local.conn = conn
+        with self._conns_lock:
+            dead = [t for t in self._conns if not t.is_alive()]
+            stale = [self._conns.pop(t) for t in dead]
+            self._conns[threading.current_thread()] = conn
+        for old in stale:
+            try:
+                old.close()
+            except Exception:
+                pass
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection) -> None:
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            t = self.table
+            with conn:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {t} ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                    "ts_epoch INTEGER NOT NULL, "
+                    "service_id TEXT NOT NULL DEFAULT '', "
+                    "level TEXT NOT NULL DEFAULT '', "
+                    "record TEXT NOT NULL)"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_service_ts ON {t} (service_id, ts_epoch)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_level_ts ON {t} (level, ts_epoch)")
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{t}_ts ON {t} (ts_epoch)")
+                conn.execute("CREATE TABLE IF NOT EXISTS _imports (source TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+            self._schema_ready = True
+
+
+def _row(record: Dict[str, Any]) -> Tuple[int, str, str, str]:
+    level = str(record.get("level") or ("error" if "reason" in record else "")).lower()
+    return (
+        record_ts_epoch(record),
+        str(record.get("service_id") or ""),
+        level,
+        json.dumps(record, ensure_ascii=False),
+    )
+
+
+def _decode_rows(rows: Sequence[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for row_id, raw in rows:
+        try:
+            rec = json.loads(raw)
+        except Exception:
+            continue
+        if isinstance(rec, dict):
+            rec["seq"] = int(row_id)
+            out.append(normalize_record(rec))
+    return out
@@ -5,4 +5,5 @@ import os
 
 def ensure_dirs() -> None:
     os.makedirs(os.path.join("data", "logs"), exist_ok=True)
-
+    os.makedirs(os.path.join("data", "logs", "events"), exist_ok=True)
+    os.makedirs(os.path.join("data", "logs", "errors"), exist_ok=True)
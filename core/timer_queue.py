@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+TIMER_WORKERS_DEFAULT = 4
+
+log = logging.getLogger("heartbeat_monitor.timer_queue")
+
+
+class TimerQueue:
+    """
+    一次性延时任务队列（最小堆 + 单个调度线程）。
+
+    - call_later() 立即返回，到期后把回调交给小线程池执行，调度线程本身不跑业务逻辑。
+    - 传入 key 时同一 key 只保留最后一次登记（例如同一服务的重启后复检），旧的自动取消。
+    - 用来替代检测/控制流程里的 time.sleep，避免等待期间占住调度器或 Web 的工作线程。
+    """
+
+    def __init__(self, max_workers: int = TIMER_WORKERS_DEFAULT):
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int]] = []
+        self._entries: Dict[int, Tuple[Callable[..., Any], Tuple[Any, ...], Optional[str]]] = {}
+        self._keys: Dict[str, int] = {}
+        self._seq = itertools.count(1)
+        self._pool = ThreadPoolExecutor(max_workers=max(int(max_workers), 1), thread_name_prefix="timer")
+        self._thread: Optional[threading.Thread] = None
+        self._closing = False
+
+    def call_later(self, delay_s: float, func: Callable[..., Any], *args: Any, key: Optional[str] = None) -> int:
+        due = time.monotonic() + max(float(delay_s), 0.0)
+        with self._cond:
+            handle = next(self._seq)
+            if key is not None:
+                old = self._keys.pop(key, None)
+                if old is not None:
+                    self._entries.pop(old, None)
+                self._keys[key] = handle
+            self._entries[handle] = (func, args, key)
+            heapq.heappush(self._heap, (due, handle))
+            self._ensure_thread()
+            self._cond.notify_all()
+        return handle
+
+    def cancel(self, handle: int) -> bool:
+        with self._cond:
+            entry = self._entries.pop(int(handle), None)
+            if entry is None:
+                return False
+            if entry[2] is not None and self._keys.get(entry[2]) == handle:
+                del self._keys[entry[2]]
+            return True
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._entries)
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closing = True
+            self._entries.clear()
+            self._keys.clear()
+            self._cond.notify_all()
+        self._pool.shutdown(wait=False)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="timer-queue", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closing:
+                    # 已取消的条目留在堆里，到堆顶时丢弃
+                    while self._heap and self._heap[0][1] not in self._entries:
+                        heapq.heappop(self._heap)
+                    if self._heap and self._heap[0][0] <= time.monotonic():
+                        break
+                    self._cond.wait(None if not self._heap else self._heap[0][0] - time.monotonic())
+                if self._closing:
+                    return
+                _, handle = heapq.heappop(self._heap)
+                func, args, key = self._entries.pop(handle)
+                if key is not None and self._keys.get(key) == handle:
+                    del self._keys[key]
+            try:
+                self._pool.submit(_call, func, args)
+            except RuntimeError:
+                return
+
+
+def _call(func: Callable[..., Any], args: Tuple[Any, ...]) -> None:
+    try:
+        func(*args)
+    except Exception:
+        log.exception("timer callback failed: %s", getattr(func, "__name__", func))
+
+
+_queue: Optional[TimerQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_timer_queue() -> TimerQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = TimerQueue()
+        return _queue
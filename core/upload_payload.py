@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import binascii
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from urllib3.fields import RequestField
+
+
+SEND_SLICE_BYTES = 1024 * 1024
+CACHE_MAX_FILES = 64
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FilePayload:
+    """测试文件内容快照（整读进内存的 bytes）；buffer 为 memoryview，切片不复制。"""
+
+    path: str
+    mtime_ns: int
+    size: int
+    buffer: memoryview
+
+    @property
+    def key(self) -> Tuple[str, int, int]:
+        return (self.path, self.mtime_ns, self.size)
+
+
+class FilePayloadCache:
+    """
+    上传探测用的测试文件缓存，按 (path, mtime, size) 命中：每次只 stat 一次，文件未变时不再打开和读取。
+
+    - 多个服务共用同一个文件时只保留一份；文件被修改（mtime 或大小变化）后下次检测重新加载。
+    - 内容整读为 bytes，不用 mmap：映射中的文件被截断时访问越界页会触发 SIGBUS，直接终止进程。
+    - 最多缓存 max_files 个文件、合计 max_bytes 字节（LRU，最近使用的一个总会保留）；
+      被替换的旧内容在正在进行的上传结束后随引用释放。
+    """
+
+    def __init__(self, max_files: int = CACHE_MAX_FILES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_files = max(int(max_files), 1)
+        self.max_bytes = max(int(max_bytes), 0)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, FilePayload]" = OrderedDict()
+        self._hits = 0
+        self._loads = 0
+
+    def get(self, path: str) -> FilePayload:
+        """返回文件内容；文件不存在时抛 FileNotFoundError。"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.key == (path, st.st_mtime_ns, st.st_size):
+                self._entries.move_to_end(path)
+                self._hits += 1
+                return entry
+        entry = self._load(path)
+        with self._lock:
+            self._loads += 1
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            total = sum(e.size for e in self._entries.values())
+            while len(self._entries) > 1 and (len(self._entries) > self.max_files or total > self.max_bytes):
+                total -= self._entries.popitem(last=False)[1].size
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": sum(e.size for e in self._entries.values()),
+                "hits": self._hits,
+                "loads": self._loads,
+            }
+
+    def _load(self, path: str) -> FilePayload:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+        return FilePayload(path, st.st_mtime_ns, len(data), memoryview(data))
+
+
+class MultipartBody:
+    """
+    预先编码好的 multipart/form-data 请求体：表单字段与文件头、结尾在构建时编码一次，
+    文件内容直接引用 FilePayload 的缓冲区。作为 requests 的 data= 传入（需同时带上 content_type 请求头），
+    按 1 MiB 切片交给 socket.sendall，不再把整个文件复制进请求体；可并发、重复迭代。
+    编码结果与 requests 的 files= / data= 相同（表单字段在前，文件在后）。
+    """
+
+    def __init__(self, signature: Tuple[Any, ...], head: bytes, payload: FilePayload, tail: bytes, boundary: str):
+        self.signature = signature
+        self.payload = payload
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self._head = head
+        self._tail = tail
+
+    def __len__(self) -> int:
+        return len(self._head) + self.payload.size + len(self._tail)
+
+    def __iter__(self) -> Iterator[Any]:
+        yield self._head
+        buf = self.payload.buffer
+        for offset in range(0, len(buf), SEND_SLICE_BYTES):
+            yield buf[offset : offset + SEND_SLICE_BYTES]
+        yield self._tail
+
+
+def multipart_body(
+    cached: Optional[MultipartBody],
+    payload: FilePayload,
+    field: str,
+    filename: str,
+    content_type: str,
+    form: List[Tuple[str, str]],
+) -> MultipartBody:
+    """文件与表单都没变时复用服务上次构建的请求体，否则重新编码。"""
+    signature = (payload.key, field, filename, content_type, tuple(form))
+    if cached is not None and cached.signature == signature and cached.payload is payload:
+        return cached
+    boundary = binascii.hexlify(os.urandom(16)).decode("ascii")
+    head = bytearray()
+    for name, value in form:
+        part = RequestField(name=name, data=value)
+        part.make_multipart()
+        head += f"--{boundary}\r\n".encode("latin-1")
+        head += part.render_headers().encode("utf-8")
+        head += value.encode("utf-8") + b"\r\n"
+    part = RequestField(name=field, data=b"", filename=filename)
+    part.make_multipart(content_type=content_type)
+    head += f"--{boundary}\r\n".encode("latin-1")
+    head += part.render_headers().encode("utf-8")
+    tail = f"\r\n--{boundary}--\r\n".encode("latin-1")
+    return MultipartBody(signature, bytes(head), payload, tail, boundary)
+
+
+def multipart_form_items(extra_form: Any) -> List[Tuple[str, str]]:
+    """把 file_extra_form（字典、键值对列表或单值）展开为表单字段列表；列表值展开为同名多字段，字典值转 JSON，None 跳过。"""
+    if not extra_form:
+        return []
+    if isinstance(extra_form, list):
+        return [(str(k), str(v)) for k, v in extra_form]
+    if not isinstance(extra_form, dict):
+        return [("value", str(extra_form))]
+    items = []
+    for k, v in extra_form.items():
+        key = str(k)
+        if isinstance(v, list):
+            for one in v:
+                items.append((key, str(one)))
+            continue
+        if isinstance(v, (dict, tuple)):
+            items.append((key, json.dumps(v, ensure_ascii=False)))
+            continue
+        if v is None:
+            continue
+        items.append((key, str(v)))
+    return items
+
+
+_cache: Optional[FilePayloadCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_payload_cache() -> FilePayloadCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FilePayloadCache()
+        return _cache
@@ -60,10 +60,13 @@ if __name__ == "__main__":
     from apscheduler.schedulers.background import BackgroundScheduler
 
     from core.auto_check_store import get_auto_check_enabled_map, seed_auto_check_enabled, set_auto_check_enabled
-    from core.check_schedule import job_id_for_service, parse_check_schedule
+    from core.check_schedule import add_check_job
+    from core.check_scheduler import CheckScheduler
     from core.disabled_service_store import get_disabled_map
     from core.failure_policy_store import get_policies
+    from core.log_writer import get_log_writer, shutdown_log_writer
     from core.monitor_engine import MonitorEngine
+    from core.probe_pools import POOL_SIZES_DEFAULT, bind_pool, get_probe_pools, probe_class
     from core.ops_mode_store import get_ops_enabled_map, seed_ops_enabled, set_ops_enabled
     from core.runtime_state import (
         apply_runtime_service_flags,
@@ -79,12 +82,26 @@ if __name__ == "__main__":
     ensure_dirs()
     _setup_logging()
     log = logging.getLogger("heartbeat_monitor")
+    get_log_writer().start()
 
     services = load_services_from_dir()
     engine = MonitorEngine(services)
     log.info("Loaded services: %s", len(services))
 
-    scheduler = BackgroundScheduler()
+    # 默认使用专用检测调度器（core/check_scheduler.py）；HBM_SCHEDULER=apscheduler 可回退到 APScheduler
+    if str(os.getenv("HBM_SCHEDULER") or "").strip().lower() == "apscheduler":
+        from apscheduler.executors.pool import ThreadPoolExecutor
+
+        sizes = {p["name"]: p["workers"] for p in get_probe_pools().stats()}
+        # 执行器线程标记所属类别（current_pool），fast 池里的分级探测才会把功能探测转交 heavy 池
+        executors = {
+            name: ThreadPoolExecutor(sizes.get(name, n), pool_kwargs={"initializer": bind_pool, "initargs": (name,)})
+            for name, n in POOL_SIZES_DEFAULT.items()
+        }
+        executors["default"] = executors["fast"]
+        scheduler = BackgroundScheduler(executors=executors)
+    else:
+        scheduler = CheckScheduler()
     overrides = get_overrides()
     disabled_map = get_disabled_map()
     initial_ops = build_initial_ops_map(engine.services)
@@ -108,18 +125,7 @@ if __name__ == "__main__":
         if not bool(getattr(svc, "config", {}).get("auto_check", True)):
             continue
         schedule_value = overrides.get(str(service_id)) or getattr(svc, "config", {}).get("check_schedule")
-        spec = parse_check_schedule(schedule_value, default_minutes=30)
-        job_id = job_id_for_service(service_id)
-        scheduler.add_job(
-            func=engine.check_one,
-            trigger=spec.trigger,
-            id=job_id,
-            args=[service_id],
-            max_instances=1,
-            coalesce=True,
-            misfire_grace_time=60,
-            **spec.kwargs,
-        )
+        add_check_job(scheduler, engine.check_one, service_id, schedule_value, executor=probe_class(svc.config))
     scheduler.start()
     log.info("Scheduler started: per-service jobs=%s", len(scheduler.get_jobs()))
 
@@ -131,4 +137,8 @@ if __name__ == "__main__":
     display_host = host if host not in ("0.0.0.0", "::") else "127.0.0.1"
     log.info("Web UI: http://%s:%s/", display_host, port)
     threading.Thread(target=engine.check_all, daemon=True).start()
-    app.run(host=host, port=port, debug=debug, use_reloader=False)
+    try:
+        app.run(host=host, port=port, debug=debug, use_reloader=False)
+    finally:
+        scheduler.shutdown(wait=False)
+        shutdown_log_writer()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import sys
+from typing import List
+
+
+def _sources(legacy_path: str, segment_dir: str, prefix: str) -> List[str]:
+    paths: List[str] = []
+    if os.path.exists(legacy_path):
+        paths.append(legacy_path)
+    paths.extend(sorted(glob.glob(os.path.join(segment_dir, f"{prefix}-*.jsonl"))))
+    return paths
+
+
+def main(argv: List[str]) -> int:
+    from core.error_log import ERROR_LOG_PATH, ERROR_SEGMENT_DIR
+    from core.event_log import EVENT_LOG_PATH, EVENT_SEGMENT_DIR
+    from core.log_store import LOG_DB_PATH
+    from core.sqlite_store import SqliteLogStore
+
+    parser = argparse.ArgumentParser(description="把 JSONL 事件/错误日志导入 SQLite 日志库（可重复执行，只补导新增部分）")
+    parser.add_argument("--db", default=LOG_DB_PATH, help=f"SQLite 文件路径（默认 {LOG_DB_PATH}）")
+    args = parser.parse_args(argv)
+
+    print("Heartbeat Monitor 日志迁移")
+    print(f"目标：{args.db}")
+    print("")
+    total = 0
+    for table, legacy_path, segment_dir in (
+        ("events", EVENT_LOG_PATH, EVENT_SEGMENT_DIR),
+        ("errors", ERROR_LOG_PATH, ERROR_SEGMENT_DIR),
+    ):
+        store = SqliteLogStore(args.db, table=table)
+        for path in _sources(legacy_path, segment_dir, table):
+            n = store.import_jsonl(path)
+            total += n
+            print(f"[{table}] {path}: +{n}")
+        store.close()
+
+    print("")
+    print(f"共导入 {total} 条。启用方式：设置环境变量 HBM_LOG_BACKEND=sqlite 后重启 main.py")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
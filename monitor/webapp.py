@@ -1,22 +1,28 @@
 from __future__ import annotations
 
+import json
 from pathlib import Path
 from typing import Dict
 
-from flask import Flask, jsonify, redirect, render_template, request, session, url_for
+from flask import Flask, Response, jsonify, redirect, render_template, request, session, stream_with_context, url_for
 
 from core.app_secrets import load_or_create_secret_key
 from core.acl_store import allowed_service_ids, get_bindings, set_service_users
 from core.auto_check_store import get_auto_check_enabled_map, seed_auto_check_enabled, set_auto_check_enabled
-from core.check_schedule import job_id_for_service, parse_check_schedule
+from core.check_schedule import add_check_job, job_id_for_service, parse_check_schedule
+from core.control_jobs import get_control_jobs
 from core.failure_policy_store import get_policies, set_policy
+from core.http_client import get_http_client
 from core.schedule_override_store import get_overrides, set_override
 from core.disabled_service_store import get_disabled_map, set_disabled
 from core.ops_mode_store import get_ops_enabled_map, seed_ops_enabled, set_ops_enabled
 from core.user_store import create_user, delete_user, ensure_default_admin, get_user, list_users, set_can_control, set_password, verify_login
-from core.error_log import query_errors, tail_errors
-from core.event_log import query_events, tail_events
+from core.event_bus import get_event_bus
+from core.error_log import count_errors, page_errors, query_errors, tail_errors
+from core.event_log import count_events, page_events, query_events, tail_events
+from core.log_store import parse_cursor, record_cursor, scope_service_ids
 from core.monitor_engine import MonitorEngine
+from core.probe_pools import get_probe_pools, probe_class
 from core.runtime_state import (
     apply_runtime_service_flags,
     backfill_bool_store,
@@ -83,6 +89,28 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
             return default
         return min(max(val, minimum), maximum)
 
+    def _cursor_page(key: str, page_fn, count_fn, service_ids, retention_days: int, page_size: int):
+        """
+        游标分页：before=<ts_epoch,seq> 取更旧一页，after=<ts_epoch,seq> 取更新一页（参数为空表示第一页）。
+        返回 next_cursor（更旧方向，没有更多时为 null）与 prev_cursor；with_total=1 时附带近似总数 total_approx。
+        """
+        try:
+            before = parse_cursor(request.args.get("before"))
+            after = parse_cursor(request.args.get("after"))
+        except Exception:
+            return jsonify({"error": "invalid_cursor"}), 400
+        items = page_fn(service_ids=service_ids, retention_days=retention_days, limit=page_size, before=before, after=after)
+        has_more = len(items) >= page_size or (after is not None and bool(items))
+        out = {
+            key: items,
+            "page_size": page_size,
+            "next_cursor": record_cursor(items[-1]) if items and has_more else None,
+            "prev_cursor": record_cursor(items[0]) if items else (request.args.get("after") or None),
+        }
+        if str(request.args.get("with_total") or "").strip() in ("1", "true", "yes"):
+            out["total_approx"] = count_fn(service_ids=service_ids, retention_days=retention_days)
+        return jsonify(out)
+
     def _mark_for_action_state(state: str) -> str:
         s = str(state or "").strip().lower()
         if s == "ok":
@@ -120,7 +148,7 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
     def index():
         username, role, can_control = _current_user()
         allowed = set(allowed_service_ids(username, role, list(engine.services.keys())))
-        errors = [e for e in tail_errors(10) if str(e.get("service_id") or "") in allowed] if role != "admin" else tail_errors(10)
+        errors = tail_errors(10, service_ids=None if role == "admin" else allowed)
         return render_template(
             "index.html",
             services=[],
@@ -377,20 +405,14 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
                 if v.lower() in ("off", "pause", "paused", "disabled", "disable"):
                     enabled_now = False
                 if enabled_now:
-                    spec = parse_check_schedule(
+                    add_check_job(
+                        scheduler,
+                        engine.check_one,
+                        sid,
                         overrides_now.get(sid) or getattr(svc, "config", {}).get("check_schedule"),
-                        default_minutes=30,
-                    )
-                    scheduler.add_job(
-                        func=engine.check_one,
-                        trigger=spec.trigger,
-                        id=job_id,
-                        args=[sid],
-                        max_instances=1,
-                        coalesce=True,
-                        misfire_grace_time=60,
-                        **spec.kwargs,
+                        executor=probe_class(svc.config),
                     )
+            engine.reset_adaptive_schedule(sid)
 
         return jsonify({"success": True, "message": "ok"})
 
@@ -411,6 +433,22 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
             svc.config["auto_fix"] = True if mode == "restart" else False
         return jsonify({"success": True, "message": "ok"})
 
+    @app.get("/api/admin/pools")
+    def api_admin_pools():
+        """各探测线程池的排队数、执行中数量与排队等待时间，内置调度器的派发统计，以及探测 HTTP 连接池。"""
+        if not _is_admin():
+            return jsonify({"error": "forbidden"}), 403
+        stats = getattr(scheduler, "stats", None)
+        classes: Dict[str, str] = {str(sid): probe_class(getattr(svc, "config", {}) or {}) for sid, svc in engine.services.items()}
+        return jsonify(
+            {
+                "pools": get_probe_pools().stats(),
+                "scheduler": stats() if callable(stats) else None,
+                "classes": classes,
+                "http": get_http_client().stats(),
+            }
+        )
+
     @app.get("/api/admin/disabled")
     def api_admin_disabled():
         if not _is_admin():
@@ -441,17 +479,8 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
             if (not disabled) and bool(getattr(svc, "config", {}).get("auto_check", True)):
                 overrides = get_overrides()
                 schedule_value = overrides.get(str(sid)) or getattr(svc, "config", {}).get("check_schedule")
-                spec = parse_check_schedule(schedule_value, default_minutes=30)
-                scheduler.add_job(
-                    func=engine.check_one,
-                    trigger=spec.trigger,
-                    id=job_id,
-                    args=[sid],
-                    max_instances=1,
-                    coalesce=True,
-                    misfire_grace_time=60,
-                    **spec.kwargs,
-                )
+                add_check_job(scheduler, engine.check_one, sid, schedule_value, executor=probe_class(svc.config))
+            engine.reset_adaptive_schedule(sid)
         return jsonify({"success": True, "message": "ok"})
 
     @app.get("/api/services")
@@ -512,7 +541,7 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
         if on_failure and on_failure != "all":
             services = [s for s in services if str(s.get("on_failure") or "").lower() == on_failure]
         if status and status != "all":
-            mapping = {"running": "Running", "error": "Error", "disabled": "Disabled", "unknown": "Unknown"}
+            mapping = {"running": "Running", "error": "Error", "blocked": "Blocked", "disabled": "Disabled", "unknown": "Unknown"}
             want = mapping.get(status, status)
             services = [s for s in services if str(s.get("status") or "") == want]
         if only_failed:
@@ -548,36 +577,65 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
                 nn = min(max(int(str(n).strip()), 1), 200)
             except Exception:
                 nn = 10
-            items = tail_errors(nn, retention_days=retention_days)
-            if role != "admin":
-                items = [e for e in items if str(e.get("service_id") or "") in allowed]
+            scope = scope_service_ids(service_id, None if role == "admin" else allowed)
+            items = tail_errors(nn, retention_days=retention_days, service_ids=scope)
             return jsonify({"errors": items, "total": len(items), "page": 1, "page_size": len(items), "pages": 1})
 
         if role != "admin" and service_id and service_id not in allowed:
             return jsonify({"error": "forbidden"}), 403
 
-        if role != "admin" and not service_id:
-            all_items, _ = query_errors(
-                service_id=None,
-                retention_days=retention_days,
-                page=1,
-                page_size=2000,
-            )
-            all_items = [e for e in all_items if str(e.get("service_id") or "") in allowed]
-            total = len(all_items)
-            start = (page - 1) * page_size
-            end = start + page_size
-            items = all_items[start:end]
-        else:
-            items, total = query_errors(
-                service_id=service_id,
-                retention_days=retention_days,
-                page=page,
-                page_size=page_size,
-            )
+        if "before" in request.args or "after" in request.args:
+            scope = scope_service_ids(service_id, None if role == "admin" else allowed)
+            return _cursor_page("errors", page_errors, count_errors, scope, retention_days, page_size)
+
+        items, total = query_errors(
+            service_id=service_id,
+            retention_days=retention_days,
+            page=page,
+            page_size=page_size,
+            service_ids=None if role == "admin" else allowed,
+        )
         pages = (total + page_size - 1) // page_size if page_size else 1
         return jsonify({"errors": items, "total": total, "page": page, "page_size": page_size, "pages": pages})
 
+    @app.get("/api/stream")
+    def api_stream():
+        """
+        SSE 推送：event（新事件日志）与 status（服务状态变化），按用户可见服务过滤。
+        每 15 秒发一次注释行保活，并顺带刷新可见服务集合；订阅队列溢出时推送 resync，前端整体重新拉取一次。
+        """
+        username, role, _ = _current_user()
+
+        def _allowed():
+            return None if role == "admin" else set(allowed_service_ids(username, role, list(engine.services.keys())))
+
+        bus = get_event_bus()
+
+        def _gen():
+            allowed = _allowed()
+            sub = bus.subscribe()
+            try:
+                yield "retry: 3000\nevent: hello\ndata: {}\n\n"
+                while True:
+                    msg = sub.get(timeout=15.0)
+                    if sub.overflowed:
+                        sub.overflowed = False
+                        yield "event: resync\ndata: {}\n\n"
+                    if msg is None:
+                        allowed = _allowed()
+                        yield ": ping\n\n"
+                        continue
+                    topic, payload = msg
+                    if allowed is not None and str(payload.get("service_id") or "") not in allowed:
+                        continue
+                    yield f"event: {topic}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            finally:
+                bus.unsubscribe(sub)
+
+        resp = Response(stream_with_context(_gen()), mimetype="text/event-stream")
+        resp.headers["X-Accel-Buffering"] = "no"
+        return resp
+
     @app.get("/api/events")
     def api_events():
         username, role, _ = _current_user()
@@ -592,33 +650,24 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
                 nn = min(max(int(str(n).strip()), 1), 500)
             except Exception:
                 nn = 30
-            items = tail_events(nn, retention_days=retention_days)
-            if role != "admin":
-                items = [e for e in items if str(e.get("service_id") or "") in allowed]
+            scope = scope_service_ids(service_id, None if role == "admin" else allowed)
+            items = tail_events(nn, retention_days=retention_days, service_ids=scope)
             return jsonify({"events": items, "total": len(items), "page": 1, "page_size": len(items), "pages": 1})
 
         if role != "admin" and service_id and service_id not in allowed:
             return jsonify({"error": "forbidden"}), 403
 
-        if role != "admin" and not service_id:
-            all_items, _ = query_events(
-                service_id=None,
-                retention_days=retention_days,
-                page=1,
-                page_size=5000,
-            )
-            all_items = [e for e in all_items if str(e.get("service_id") or "") in allowed]
-            total = len(all_items)
-            start = (page - 1) * page_size
-            end = start + page_size
-            items = all_items[start:end]
-        else:
-            items, total = query_events(
-                service_id=service_id,
-                retention_days=retention_days,
-                page=page,
-                page_size=page_size,
-            )
+        if "before" in request.args or "after" in request.args:
+            scope = scope_service_ids(service_id, None if role == "admin" else allowed)
+            return _cursor_page("events", page_events, count_events, scope, retention_days, page_size)
+
+        items, total = query_events(
+            service_id=service_id,
+            retention_days=retention_days,
+            page=page,
+            page_size=page_size,
+            service_ids=None if role == "admin" else allowed,
+        )
         pages = (total + page_size - 1) // page_size if page_size else 1
         return jsonify({"events": items, "total": total, "page": page, "page_size": page_size, "pages": pages})
 
@@ -634,9 +683,37 @@ def create_app(engine: MonitorEngine, scheduler=None) -> Flask:
         if action in ("start", "stop", "restart") and role != "admin" and not can_control:
             return jsonify({"success": False, "message": "control_not_authorized"}), 403
         allow_fix = True if role == "admin" or can_control else False
-        ok, msg = engine.control(service_id, action, allow_fix=allow_fix)
-        if not ok and msg == "Service not found":
+        if engine.get(service_id) is None:
             return jsonify({"success": False, "message": "service_not_found"}), 404
-        return jsonify({"success": ok, "message": msg}), (200 if ok else 400)
+        # 动作交给控制任务队列执行，请求立即返回 job_id；同一服务同一动作、allow_fix 相同的重复提交合并到进行中的任务。
+        # 脚本可传 wait=<秒> 同步等待结果（返回与旧版相同的 success/message）。
+        jobs = get_control_jobs()
+        job, created = jobs.submit(
+            service_id,
+            action,
+            lambda step: engine.control(service_id, action, allow_fix=allow_fix, step=step),
+            submitted_by=username,
+            options={"allow_fix": allow_fix},
+        )
+        if job.finished and job.started_at is None:
+            # 任务未能交给线程池（服务正在退出）
+            return jsonify({"success": False, "message": job.message, "job_id": job.id, "job": job.to_dict()}), 503
+        wait_s = _parse_int_arg("wait", default=0, minimum=0, maximum=120)
+        if wait_s > 0 and jobs.wait(job, wait_s):
+            return jsonify({"success": job.ok, "message": job.message, "job_id": job.id, "job": job.to_dict()}), (200 if job.ok else 400)
+        return (
+            jsonify({"success": True, "message": "queued" if created else "coalesced", "job_id": job.id, "job": job.to_dict()}),
+            202,
+        )
+
+    @app.get("/api/jobs/<job_id>")
+    def api_job(job_id: str):
+        username, role, _ = _current_user()
+        job = get_control_jobs().get(job_id)
+        if job is None:
+            return jsonify({"error": "job_not_found"}), 404
+        if role != "admin" and job.service_id not in set(allowed_service_ids(username, role, list(engine.services.keys()))):
+            return jsonify({"error": "job_not_found"}), 404
+        return jsonify({"job": job.to_dict()})
 
     return app
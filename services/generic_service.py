@@ -8,8 +8,11 @@ from typing import Any, Dict, List, Optional, Tuple
 import requests
 
 from core.base_service import BaseService
-from core.expected_matcher import match_expected
+from core.expected_matcher import ResponseBody, match_expected, max_body_bytes
+from core.http_client import probe_request
+from core.probe_timing import timings_detail
 from core.ssh_manager import SSHManager
+from core.upload_payload import MultipartBody, get_payload_cache, multipart_body, multipart_form_items
 
 
 class GenericService(BaseService):
@@ -39,6 +42,7 @@ class GenericService(BaseService):
             private_key_path=str(private_key_path) if private_key_path else None,
             private_key_passphrase=str(private_key_passphrase) if private_key_passphrase else None,
         )
+        self._upload_body: Optional[MultipartBody] = None
 
     def check_health(self) -> Tuple[bool, str, Dict[str, Any]]:
         test_api = str(self.config.get("test_api") or "").strip()
@@ -48,7 +52,7 @@ class GenericService(BaseService):
         method = str(self.config.get("test_method") or "").upper().strip()
         test_payload = self.config.get("test_payload")
         expected = self.config.get("expected_response")
-        timeout_s = float(self.config.get("timeout_s") or 30)
+        timeout_s = self.probe_timeout_s(30)
         max_elapsed_ms = self.config.get("max_elapsed_ms")
 
         start = time.time()
@@ -66,19 +70,24 @@ class GenericService(BaseService):
 
             request_method = method or ("POST" if test_payload is not None else "GET")
             if request_method in ("POST", "PUT", "PATCH"):
-                r = requests.request(request_method, test_api, json=test_payload or {}, timeout=timeout_s)
+                r = probe_request(self.config, request_method, test_api, json=test_payload or {}, timeout=timeout_s, stream=True)
             elif request_method == "DELETE":
-                r = requests.request(request_method, test_api, timeout=timeout_s)
+                r = probe_request(self.config, request_method, test_api, timeout=timeout_s, stream=True)
             else:
-                r = requests.get(test_api, timeout=timeout_s)
-
-            ok, reason = match_expected(r, expected)
-            detail = {
-                "ok": ok,
-                "status_code": r.status_code,
-                "elapsed_ms": int((time.time() - start) * 1000),
-                "response_excerpt": (r.text or "")[:800],
-            }
+                r = probe_request(self.config, "GET", test_api, timeout=timeout_s, stream=True)
+
+            with ResponseBody(r, max_body_bytes(self.config), timeout_s) as body:
+                ok, reason = match_expected(body, expected)
+                detail = {
+                    "ok": ok,
+                    "status_code": r.status_code,
+                    "elapsed_ms": int((time.time() - start) * 1000),
+                    "response_excerpt": body.excerpt(),
+                    "body_bytes": body.bytes_read,
+                }
+            detail.update(timings_detail(r))
+            if not ok and body.too_large:
+                detail["reason"] = "body_too_large"
             if max_elapsed_ms is not None:
                 try:
                     if int(detail["elapsed_ms"]) > int(max_elapsed_ms):
@@ -88,10 +97,10 @@ class GenericService(BaseService):
             if not ok:
                 return False, reason, detail
             return True, "", detail
-        except requests.exceptions.Timeout:
-            return False, "Timeout", {"ok": False, "reason": "timeout", "elapsed_ms": int((time.time() - start) * 1000)}
+        except requests.exceptions.Timeout as e:
+            return False, "Timeout", {"ok": False, "reason": "timeout", "elapsed_ms": int((time.time() - start) * 1000), **timings_detail(e)}
         except Exception as e:
-            return False, str(e), {"ok": False, "exception": str(e), "elapsed_ms": int((time.time() - start) * 1000)}
+            return False, str(e), {"ok": False, "exception": str(e), "elapsed_ms": int((time.time() - start) * 1000), **timings_detail(e)}
 
     def start_service(self) -> Tuple[bool, str]:
         cmds = self._get_cmds("start_cmd", "start_cmds")
@@ -172,26 +181,40 @@ class GenericService(BaseService):
             return False, "Missing test_file", {"ok": False, "reason": "missing_test_file"}
         if not os.path.isabs(local_path):
             local_path = os.path.join(os.getcwd(), local_path)
-        if not os.path.exists(local_path):
+        try:
+            payload = get_payload_cache().get(local_path)
+        except FileNotFoundError:
             return False, f"Test file not found: {local_path}", {"ok": False, "reason": "file_not_found"}
 
         field = str(self.config.get("file_field") or "file")
-        extra = self.config.get("file_extra_form") or {}
-        with open(local_path, "rb") as f:
-            files = {field: (os.path.basename(local_path), f, "application/pdf")}
-            r = requests.post(url, files=files, data=extra, timeout=timeout_s)
-        ok, reason = self._match_expected(r, expected)
-        detail = {
-            "ok": ok,
-            "status_code": r.status_code,
-            "response_excerpt": (r.text or "")[:800],
-            "file": os.path.basename(local_path),
-        }
+        extra = multipart_form_items(self.config.get("file_extra_form"))
+        self._upload_body = multipart_body(self._upload_body, payload, field, os.path.basename(local_path), "application/pdf", extra)
+        r = probe_request(
+            self.config,
+            "POST",
+            url,
+            data=self._upload_body,
+            headers={"Content-Type": self._upload_body.content_type},
+            timeout=timeout_s,
+            stream=True,
+        )
+        with ResponseBody(r, max_body_bytes(self.config), timeout_s) as body:
+            ok, reason = self._match_expected(body, expected)
+            detail = {
+                "ok": ok,
+                "status_code": r.status_code,
+                "response_excerpt": body.excerpt(),
+                "body_bytes": body.bytes_read,
+                "file": os.path.basename(local_path),
+            }
+        detail.update(timings_detail(r))
+        if not ok and body.too_large:
+            detail["reason"] = "body_too_large"
         if not ok:
             return False, reason, detail
         return True, "", detail
 
-    def _match_expected(self, response: requests.Response, expected: Any) -> Tuple[bool, str]:
+    def _match_expected(self, response: ResponseBody, expected: Any) -> Tuple[bool, str]:
         return match_expected(response, expected)
 
 
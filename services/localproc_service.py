@@ -11,7 +11,9 @@ from typing import Any, Dict, List, Optional, Tuple
 import requests
 
 from core.base_service import BaseService
-from core.expected_matcher import match_expected
+from core.expected_matcher import ResponseBody, match_expected, max_body_bytes
+from core.http_client import probe_request
+from core.probe_timing import timings_detail
 
 
 class LocalProcService(BaseService):
@@ -51,23 +53,28 @@ class LocalProcService(BaseService):
             return False, "Missing test_api", {"ok": False, "reason": "missing_test_api"}
 
         expected = self.config.get("expected_response")
-        timeout_s = float(self.config.get("timeout_s") or 5)
+        timeout_s = self.probe_timeout_s(5)
         method = str(self.config.get("test_method") or "GET").strip().upper()
         payload = self.config.get("test_payload") if isinstance(self.config.get("test_payload"), dict) else None
         max_elapsed_ms = self.config.get("max_elapsed_ms")
         start = time.time()
         try:
             if method == "POST" or payload:
-                r = requests.post(test_api, json=(payload or {}), timeout=timeout_s)
+                r = probe_request(self.config, "POST", test_api, json=(payload or {}), timeout=timeout_s, stream=True)
             else:
-                r = requests.get(test_api, timeout=timeout_s)
-            ok, reason = match_expected(r, expected)
-            detail = {
-                "ok": ok,
-                "status_code": r.status_code,
-                "elapsed_ms": int((time.time() - start) * 1000),
-                "response_excerpt": (r.text or "")[:800],
-            }
+                r = probe_request(self.config, "GET", test_api, timeout=timeout_s, stream=True)
+            with ResponseBody(r, max_body_bytes(self.config), timeout_s) as body:
+                ok, reason = match_expected(body, expected)
+                detail = {
+                    "ok": ok,
+                    "status_code": r.status_code,
+                    "elapsed_ms": int((time.time() - start) * 1000),
+                    "response_excerpt": body.excerpt(),
+                    "body_bytes": body.bytes_read,
+                }
+            detail.update(timings_detail(r))
+            if not ok and body.too_large:
+                detail["reason"] = "body_too_large"
             if max_elapsed_ms is not None:
                 try:
                     if int(detail["elapsed_ms"]) > int(max_elapsed_ms):
@@ -77,10 +84,10 @@ class LocalProcService(BaseService):
             if not ok:
                 return False, reason, detail
             return True, "", detail
-        except requests.exceptions.Timeout:
-            return False, "Timeout", {"ok": False, "reason": "timeout", "elapsed_ms": int((time.time() - start) * 1000)}
+        except requests.exceptions.Timeout as e:
+            return False, "Timeout", {"ok": False, "reason": "timeout", "elapsed_ms": int((time.time() - start) * 1000), **timings_detail(e)}
         except Exception as e:
-            return False, str(e), {"ok": False, "exception": str(e), "elapsed_ms": int((time.time() - start) * 1000)}
+            return False, str(e), {"ok": False, "exception": str(e), "elapsed_ms": int((time.time() - start) * 1000), **timings_detail(e)}
 
     def start_service(self) -> Tuple[bool, str]:
         restart_on_running = False
@@ -437,7 +444,7 @@ class LocalProcService(BaseService):
         return self._is_pid_running_nolock(pid)
 
 
-def _match_expected(response: requests.Response, expected: Any) -> Tuple[bool, str]:
+def _match_expected(response: ResponseBody, expected: Any) -> Tuple[bool, str]:
     return match_expected(response, expected)
 
 
@@ -4,10 +4,12 @@ import requests
 import logging
 import os
 import time
-import json
 from typing import Any, Dict, List, Optional, Tuple
 
-from core.expected_matcher import match_expected
+from core.expected_matcher import ResponseBody, match_expected, max_body_bytes
+from core.http_client import probe_request
+from core.probe_timing import timings_detail
+from core.upload_payload import MultipartBody, get_payload_cache, multipart_body, multipart_form_items
 
 class MineruService(BaseService):
     def __init__(self, service_id: str, config: Dict[str, Any], config_path: Optional[str] = None):
@@ -35,6 +37,7 @@ class MineruService(BaseService):
         self.container_name = str(config.get("container_name") or "mineru_container")
         
         self.test_pdf_path = str(config.get("test_file") or os.path.join("data", "test.pdf"))
+        self._upload_body: Optional[MultipartBody] = None
 
     def check_health(self) -> Tuple[bool, str, Dict[str, Any]]:
         test_api = str(self.config.get("test_api") or "").strip()
@@ -44,38 +47,48 @@ class MineruService(BaseService):
         test_file_path = self.test_pdf_path
         if not os.path.isabs(test_file_path):
             test_file_path = os.path.join(os.getcwd(), test_file_path)
-        if not os.path.exists(test_file_path):
+        try:
+            payload = get_payload_cache().get(test_file_path)
+        except FileNotFoundError:
             return False, f"Test file not found: {test_file_path}", {"ok": False, "reason": "file_not_found"}
+        except OSError as e:
+            return False, str(e), {"ok": False, "exception": str(e)}
 
         try:
+            # file_field_as_list 只影响 requests 里 files 参数的写法，编码结果相同，预编码请求体后不再需要区分
             field = str(self.config.get("file_field") or "files")
-            field_as_list = self.config.get("file_field_as_list")
-            if field_as_list is None:
-                field_as_list = (field == "files")
             expected = self.config.get("expected_response")
-            timeout_s = float(self.config.get("timeout_s") or 60)
+            timeout_s = self.probe_timeout_s(60)
             max_elapsed_ms = self.config.get("max_elapsed_ms")
             extra_form = self.config.get("file_extra_form") or {}
 
             start = time.time()
-            with open(test_file_path, "rb") as f:
-                filename = os.path.basename(test_file_path)
-                if field_as_list:
-                    files = [(field, (filename, f, "application/pdf"))]
-                else:
-                    files = {field: (filename, f, "application/pdf")}
-
-                data = self._normalize_multipart_form(extra_form)
-                r = requests.post(test_api, files=files, data=data, timeout=timeout_s)
-
-            ok, reason = match_expected(r, expected)
-            detail = {
-                "ok": ok,
-                "status_code": r.status_code,
-                "elapsed_ms": int((time.time() - start) * 1000),
-                "response_excerpt": (r.text or "")[:800],
-                "file": filename,
-            }
+            filename = os.path.basename(test_file_path)
+            data = self._normalize_multipart_form(extra_form)
+            self._upload_body = multipart_body(self._upload_body, payload, field, filename, "application/pdf", data)
+            r = probe_request(
+                self.config,
+                "POST",
+                test_api,
+                data=self._upload_body,
+                headers={"Content-Type": self._upload_body.content_type},
+                timeout=timeout_s,
+                stream=True,
+            )
+
+            with ResponseBody(r, max_body_bytes(self.config), timeout_s) as body:
+                ok, reason = match_expected(body, expected)
+                detail = {
+                    "ok": ok,
+                    "status_code": r.status_code,
+                    "elapsed_ms": int((time.time() - start) * 1000),
+                    "response_excerpt": body.excerpt(),
+                    "body_bytes": body.bytes_read,
+                    "file": filename,
+                }
+            detail.update(timings_detail(r))
+            if not ok and body.too_large:
+                detail["reason"] = "body_too_large"
             if max_elapsed_ms is not None:
                 try:
                     if int(detail["elapsed_ms"]) > int(max_elapsed_ms):
@@ -86,10 +99,10 @@ class MineruService(BaseService):
                 return False, reason, detail
             return True, "", detail
 
-        except requests.exceptions.Timeout:
-            return False, "Timeout", {"ok": False, "reason": "timeout"}
+        except requests.exceptions.Timeout as e:
+            return False, "Timeout", {"ok": False, "reason": "timeout", **timings_detail(e)}
         except Exception as e:
-            return False, str(e), {"ok": False, "exception": str(e)}
+            return False, str(e), {"ok": False, "exception": str(e), **timings_detail(e)}
 
     def start_service(self):
         cmds = self._get_cmds("start_cmd", "start_cmds")
@@ -200,31 +213,11 @@ class MineruService(BaseService):
                 return False, err
         return True, "OK"
 
-    def _match_expected(self, response: requests.Response, expected: Any) -> Tuple[bool, str]:
+    def _match_expected(self, response: ResponseBody, expected: Any) -> Tuple[bool, str]:
         return match_expected(response, expected)
 
     def _normalize_multipart_form(self, extra_form: Any):
-        if not extra_form:
-            return []
-        if isinstance(extra_form, list):
-            return [(str(k), str(v)) for k, v in extra_form]
-        if not isinstance(extra_form, dict):
-            return [("value", str(extra_form))]
-        items = []
-        for k, v in extra_form.items():
-            key = str(k)
-            if isinstance(v, list):
-                for one in v:
-                    items.append((key, str(one)))
-                continue
-            if isinstance(v, (dict, tuple)):
-                items.append((key, json.dumps(v, ensure_ascii=False)))
-                continue
-            if v is None:
-                continue
-            items.append((key, str(v)))
-        return items
-
+        return multipart_form_items(extra_form)
 
 def create_service(service_id: str, cfg: Dict[str, Any], config_path: str) -> MineruService:
     return MineruService(service_id, cfg, config_path=config_path)